@@ -1,10 +1,24 @@
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException
+from fastapi import FastAPI, UploadFile, File, Form, Query, HTTPException, Request
 from fastapi.responses import JSONResponse, PlainTextResponse
-from typing import Optional
+from starlette.concurrency import run_in_threadpool
+from typing import List, Optional
+from contextlib import asynccontextmanager
 import os
+import time
+import asyncio
 import tempfile
+import threading
 import logging
-from ocr_pdf import PDFOCRHandler
+import json
+import hashlib
+from collections import defaultdict
+import pypdfium2 as pdfium
+from ocr_pdf import (PDFOCRHandler, OUTPUT_FORMATS, get_output_path,
+                     LocalOCREngine, SupervisedOCREngine, MicroBatchEngine, StubOCREngine,
+                     ENGINE_PROFILES, resolve_engine_options, parse_engine_option_args, load_tuning_config,
+                     MemoryBudget, RenderCache, estimate_document_memory, AUTO_MODEL, AUTO_BASE_MODEL, AUTO_STRUCTURE_MODEL,
+                     DEFAULT_QUERY_ORDER, compile_query_targets, resolve_page_order, stop_log_listeners)
+from search_index import SearchIndex
 
 # 配置日志级别映射
 LOG_LEVELS = {
@@ -19,10 +33,8 @@ LOG_LEVELS = {
 DEFAULT_LOG_LEVEL = os.environ.get('LOG_LEVEL', 'info').lower()
 log_level = LOG_LEVELS.get(DEFAULT_LOG_LEVEL, logging.INFO)
 
-# 设置日志配置
-logging.basicConfig(level=log_level,
-                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-                    handlers=[logging.StreamHandler()])
+# 设置日志级别（处理器由 ocr_pdf 统一配置：记录经队列交给后台线程写入控制台与滚动日志文件）
+logging.getLogger().setLevel(log_level)
 logger = logging.getLogger(__name__)
 
 # 设置paddleocr相关日志器的级别
@@ -31,11 +43,299 @@ for logger_name in ['paddleocr', 'paddle', 'ppocr', 'paddlex']:
 
 logger.info(f"日志级别已设置为：{DEFAULT_LOG_LEVEL}")
 
+# 默认识别时间预算（秒），超时的页面在结果中标记，避免单个异常页面长时间占用服务
+DEFAULT_PAGE_TIMEOUT = float(os.environ['OCR_PAGE_TIMEOUT']) if os.environ.get('OCR_PAGE_TIMEOUT') else None
+DEFAULT_DOC_TIMEOUT = float(os.environ['OCR_DOC_TIMEOUT']) if os.environ.get('OCR_DOC_TIMEOUT') else None
+# 受监管推理：在子进程中推理，超时可终止并重建；配置了默认时间预算或 OCR_SUPERVISED_ENGINE=1 时开启，
+# 只有开启时才接受请求级的时间预算（进程内推理无法中断，超时的推理会继续占用所有请求共享的微批线程）
+SUPERVISED_ENGINE = bool(DEFAULT_PAGE_TIMEOUT or DEFAULT_DOC_TIMEOUT or os.environ.get('OCR_SUPERVISED_ENGINE') == '1')
+
+# 微批处理：在时间窗口内合并并发请求的页面，一次批量推理
+BATCH_MAX_SIZE = int(os.environ.get('OCR_BATCH_SIZE', '8'))
+BATCH_MAX_WAIT = float(os.environ.get('OCR_BATCH_WAIT_MS', '20')) / 1000
+
+DEFAULT_MODEL = "pp-ocrv5"
+VALID_MODELS = ["pp-ocrv5", "pp-structurev3", "paddleocr-vl", "pp-chatocrv4", AUTO_MODEL]
+VALID_OPTIMIZE_LEVELS = ["low", "medium", "high"]
+
+# 作业调度：同时处理的文档数、等待老化速度（每秒折算的页数）、大文档每次最多连续处理的页数
+# 未配置时使用针对默认模型的自动调优得到的并行度
+_tuning = load_tuning_config(DEFAULT_MODEL)
+MAX_RUNNING_JOBS = int(os.environ.get('OCR_MAX_JOBS') or (_tuning['workers'] if _tuning else 4))
+AGING_PAGES_PER_SECOND = float(os.environ.get('OCR_AGING_RATE', '1.0'))
+PREEMPT_SLICE_PAGES = int(os.environ.get('OCR_PREEMPT_PAGES', '16'))
+FAIR_SCHEDULING = os.environ.get('OCR_FAIR_SCHEDULING', '1') != '0'
+
+# 排队上限：等待中的作业数达到上限时返回429，并通过Retry-After提示客户端稍后重试（0表示不限制）
+MAX_WAITING_JOBS = int(os.environ.get('OCR_MAX_QUEUE', '0'))
+RETRY_AFTER_SECONDS = int(os.environ.get('OCR_RETRY_AFTER', '5'))
+
+# 内存预算（MB）：在途页面的估算内存总量不超过预算，作业的最大页放不下时暂缓启动（未设置时不限制）
+MEMORY_BUDGET_MB = int(os.environ['OCR_MEMORY_BUDGET_MB']) if os.environ.get('OCR_MEMORY_BUDGET_MB') else None
+memory_budget = MemoryBudget(MEMORY_BUDGET_MB * 1024 * 1024) if MEMORY_BUDGET_MB else None
+
+# 逐页日志采样：每N页输出一次逐页info日志，其余页降为debug（0表示全部为debug）
+PAGE_LOG_SAMPLE = int(os.environ.get('OCR_PAGE_LOG_SAMPLE', '1'))
+
+# 渲染缓存目录：各请求共用，同一文件换模型或参数重新识别时跳过渲染与缩放（未设置时不缓存）
+RENDER_CACHE_DIR = os.environ.get('OCR_RENDER_CACHE')
+# 上传的文件每次保存在新的临时路径，按内容哈希标识文档（接收上传时顺带计算，不再重新读取文件）
+render_cache = (RenderCache(RENDER_CACHE_DIR, int(os.environ.get('OCR_RENDER_CACHE_MB', '4096')) * 1024 * 1024,
+                            content_hash=True)
+                if RENDER_CACHE_DIR else None)
+
+# 全文索引文件（由 ocr_pdf.py --index 或 search_index.py --reindex 写入），未设置时 /search 不可用
+INDEX_PATH = os.environ.get('OCR_INDEX_PATH')
+_search_index = None
+_search_index_lock = threading.Lock()
+
+# 桩推理引擎：不加载模型，每页返回固定文本，用于在没有paddle的环境中联调客户端（值为每页模拟耗时，单位毫秒）
+STUB_ENGINE_DELAY = os.environ.get('OCR_STUB_ENGINE')
+
+# 每个模型（及引擎选项组合）只加载一次，所有请求共享同一个微批推理引擎
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def get_engine(model, engine_options=None):
+    """获取（必要时创建）指定模型与引擎选项的共享微批推理引擎"""
+    engine_options = engine_options or {}
+    key = (model, tuple(sorted(engine_options.items())))
+    with _engines_lock:
+        if key not in _engines:
+            logger.info(f"正在初始化{model}模型...")
+            # 开启受监管推理时在子进程中推理，超时可终止并重建
+            if STUB_ENGINE_DELAY is not None:
+                logger.warning("使用桩推理引擎（OCR_STUB_ENGINE），识别结果为固定文本")
+                engine = StubOCREngine(model, delay=float(STUB_ENGINE_DELAY or 0) / 1000)
+            elif SUPERVISED_ENGINE:
+                engine = SupervisedOCREngine(model, **engine_options)
+            else:
+                engine = LocalOCREngine(model, **engine_options)
+            _engines[key] = MicroBatchEngine(engine, max_batch_size=BATCH_MAX_SIZE, max_wait=BATCH_MAX_WAIT)
+            logger.info(f"{model}模型初始化完成，微批大小: {BATCH_MAX_SIZE}，等待窗口: {BATCH_MAX_WAIT * 1000:.0f}毫秒")
+        return _engines[key]
+
+class OCRJob:
+    """一个待识别的PDF文档，页数与最大页的估算内存在提交时读取"""
+    def __init__(self, name, client, total_pages, peak_memory=0):
+        self.name = name
+        self.client = client
+        self.total_pages = total_pages
+        self.peak_memory = peak_memory
+        self.done_pages = 0
+        self.slice_pages = 0
+        self.enqueued_at = time.time()
+
+    @property
+    def remaining_pages(self):
+        return max(1, self.total_pages - self.done_pages)
+
+
+class JobScheduler:
+    """
+    按文档大小调度API作业
+    
+    - 短作业优先：剩余页数越少越先处理
+    - 等待老化：每等待1秒优先级提升 aging_rate 页，大文档不会被无限期饿死
+    - 按客户端公平（可选）：同一客户端正在处理的页数计入其排队作业的代价
+    - 页边界抢占：大文档连续处理 slice_pages 页后，如有更优先的作业在等待则让出并重新排队，
+      已完成的页保留在进度日志中，再次调度时从断点继续
+    - 内存准入（可选）：最优先作业的最大页在内存预算中放不下时，暂缓启动新作业直到在途页面释放内存
+    """
+    def __init__(self, max_running=4, aging_rate=1.0, slice_pages=16, fair=True, max_waiting=0, memory_budget=None):
+        self.max_running = max(1, max_running)
+        self.max_waiting = max_waiting
+        self.memory_budget = memory_budget
+        self.aging_rate = aging_rate
+        self.slice_pages = max(1, slice_pages)
+        self.fair = fair
+        self._cond = threading.Condition()
+        self._waiting = []
+        self._running = []
+        self._client_running_pages = defaultdict(int)
+        self._closed = False
+
+    def _priority(self, job, now):
+        priority = job.remaining_pages - self.aging_rate * (now - job.enqueued_at)
+        if self.fair:
+            priority += self._client_running_pages[job.client]
+        return priority
+
+    def _next_job(self):
+        now = time.time()
+        return min(self._waiting, key=lambda job: self._priority(job, now))
+
+    def acquire(self, job):
+        """排队直到轮到该作业（阻塞调用，应在线程池中执行）"""
+        with self._cond:
+            job.enqueued_at = time.time()
+            self._waiting.append(job)
+            self._cond.notify_all()
+            # 优先级随等待时间变化，定期重新评估
+            while (self._closed or len(self._running) >= self.max_running or self._next_job() is not job
+                   or (self.memory_budget is not None and not self.memory_budget.fits(job.peak_memory))):
+                if self._closed:
+                    self._waiting.remove(job)
+                    self._cond.notify_all()
+                    raise HTTPException(status_code=503, detail="服务正在停止，作业未开始处理",
+                                        headers={"Retry-After": str(RETRY_AFTER_SECONDS)})
+                self._cond.wait(timeout=1.0)
+            self._waiting.remove(job)
+            self._running.append(job)
+            job.slice_pages = 0
+            self._client_running_pages[job.client] += job.remaining_pages
+            self._cond.notify_all()
+        logger.info(f"开始处理作业: {job.name}（客户端: {job.client}，剩余 {job.remaining_pages} 页，"
+                    f"排队 {time.time() - job.enqueued_at:.2f}秒）")
+
+    def release(self, job, reserved_pages):
+        """作业完成或让出时释放处理名额"""
+        with self._cond:
+            self._running.remove(job)
+            self._client_running_pages[job.client] -= reserved_pages
+            if self._client_running_pages[job.client] <= 0:
+                del self._client_running_pages[job.client]
+            self._cond.notify_all()
+
+    def should_yield(self, job, done_pages):
+        """页边界回调：记录已处理的页数，连续处理足够多的页后，如有更优先的作业在等待则让出"""
+        # 已处理页数由处理方给出（含续跑前已完成的页），不按回调次数累计
+        job.done_pages = done_pages
+        job.slice_pages += 1
+        if job.slice_pages < self.slice_pages:
+            return False
+        with self._cond:
+            if not self._waiting or len(self._running) < self.max_running:
+                return False
+            return self._priority(self._next_job(), time.time()) < job.remaining_pages
+
+    def run(self, job, process):
+        """
+        按调度处理作业，让出后重新排队直到完成
+        
+        Args:
+            job (OCRJob): 作业
+            process (callable): 接收 should_yield 回调（参数为已处理的页数），返回处理结果；让出时返回None
+        """
+        while True:
+            self.acquire(job)
+            reserved_pages = job.remaining_pages
+            try:
+                result = process(lambda done_pages: self.should_yield(job, done_pages))
+            finally:
+                self.release(job, reserved_pages)
+            if result is not None:
+                job.done_pages = job.total_pages
+                return result
+            logger.info(f"作业 {job.name} 让出，剩余 {job.remaining_pages} 页重新排队")
+
+    def close(self):
+        """服务停止：不再启动新作业，排队中的作业以503结束（正在处理的作业不受影响）"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def is_full(self, incoming=1):
+        """再加入 incoming 个作业后是否超过排队上限"""
+        if not self.max_waiting:
+            return False
+        with self._cond:
+            return len(self._waiting) + incoming > self.max_waiting
+
+    def stats(self):
+        with self._cond:
+            return {"running": len(self._running), "waiting": len(self._waiting)}
+
+
+scheduler = JobScheduler(
+    max_running=MAX_RUNNING_JOBS,
+    aging_rate=AGING_PAGES_PER_SECOND,
+    slice_pages=PREEMPT_SLICE_PAGES,
+    fair=FAIR_SCHEDULING,
+    max_waiting=MAX_WAITING_JOBS,
+    memory_budget=memory_budget
+)
+
+
+async def save_upload(file, path, chunk_size=1024 * 1024):
+    """分块保存上传的文件，避免大文件整体读入内存；开启渲染缓存时同时计算内容哈希并登记"""
+    sha256 = hashlib.sha256() if render_cache is not None else None
+    with open(path, "wb") as buffer:
+        while True:
+            chunk = await file.read(chunk_size)
+            if not chunk:
+                break
+            buffer.write(chunk)
+            if sha256 is not None:
+                sha256.update(chunk)
+    if sha256 is not None:
+        render_cache.remember_content_hash(path, sha256.hexdigest())
+
+
+def check_queue_capacity(incoming=1):
+    """排队作业已满时返回429，并通过Retry-After提示客户端稍后重试"""
+    if scheduler.is_full(incoming):
+        raise HTTPException(status_code=429, detail="服务繁忙，排队作业已满，请稍后重试",
+                            headers={"Retry-After": str(RETRY_AFTER_SECONDS)})
+
+
+def get_client_id(request):
+    """公平调度的客户端标识：优先使用 X-API-Key / X-Client-Id 请求头，否则使用客户端地址"""
+    return (request.headers.get('x-api-key') or request.headers.get('x-client-id')
+            or (request.client.host if request.client else 'anonymous'))
+
+
+def inspect_pdf(pdf_path, model, render_scale=1.0, grayscale=False):
+    """
+    提交时读取页数与最大页的估算内存用于调度，文件无法解析时抛出400错误
+    
+    Returns:
+        tuple: (页数, 最大页的估算内存（字节），未设置内存预算时为0)
+    """
+    try:
+        pdf = pdfium.PdfDocument(pdf_path)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"PDF文件无法解析: {str(e)}")
+    try:
+        peak_memory = 0
+        if memory_budget is not None:
+            peak_memory = estimate_document_memory(pdf, model, render_scale=render_scale, grayscale=grayscale)
+        return len(pdf), peak_memory
+    finally:
+        pdf.close()
+
+
+def close_engines():
+    """释放共享推理引擎与全文索引"""
+    with _engines_lock:
+        for engine in _engines.values():
+            engine.close()
+        _engines.clear()
+    global _search_index
+    with _search_index_lock:
+        if _search_index is not None:
+            _search_index.close()
+            _search_index = None
+
+
+@asynccontextmanager
+async def lifespan(app):
+    """服务生命周期：停止时先让排队中的作业放弃等待，再释放共享推理引擎与全文索引，最后写完日志队列"""
+    yield
+    scheduler.close()
+    # 关闭受监管引擎需要等待子进程退出，不阻塞事件循环
+    await run_in_threadpool(close_engines)
+    logger.info("服务已停止")
+    stop_log_listeners()
+
+
 # 创建FastAPI应用
 app = FastAPI(
     title="PDF OCR API服务",
     description="提供PDF文档的OCR识别服务，支持多种模型",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # 根路径
@@ -46,7 +346,10 @@ def root():
         "version": "1.0.0",
         "endpoints": [
             "/health",
-            "/ocr/pdf"
+            "/ocr/pdf",
+            "/ocr/batch",
+            "/ocr/query",
+            "/search"
         ]
     }
 
@@ -56,27 +359,160 @@ def health_check():
     return {
         "status": "healthy",
         "service": "PDF OCR API",
-        "models": ["pp-ocrv5", "pp-structurev3", "paddleocr-vl", "pp-chatocrv4"]
+        "models": VALID_MODELS,
+        "profiles": list(ENGINE_PROFILES),
+        "queue": scheduler.stats(),
+        "memory": memory_budget.stats() if memory_budget is not None else None
     }
 
+
+def get_search_index():
+    """打开全文索引（所有请求共享一个连接），未配置时返回503"""
+    global _search_index
+    if not INDEX_PATH:
+        raise HTTPException(status_code=503, detail="未配置全文索引，请设置环境变量 OCR_INDEX_PATH")
+    with _search_index_lock:
+        if _search_index is None:
+            _search_index = SearchIndex(INDEX_PATH)
+        return _search_index
+
+
+# 全文检索接口
+@app.get("/search")
+def search(
+    q: str = Query(..., min_length=1, description="检索词，多个词用空格分隔（且关系）"),
+    limit: int = Query(default=20, ge=1, le=200, description="返回的最大结果数"),
+    offset: int = Query(default=0, ge=0, description="结果偏移量（分页）")
+):
+    """
+    在已索引的OCR识别结果中按页检索
+    
+    Returns:
+        按相关度排序的命中页面（文件名、源文件、结果文件、页码、片段与得分）
+    """
+    search_index = get_search_index()
+    start_time = time.time()
+    results = search_index.search(q, limit=limit, offset=offset)
+    return {
+        "query": q,
+        "total": len(results),
+        "elapsed_ms": round((time.time() - start_time) * 1000, 2),
+        "results": results
+    }
+
+
+def validate_options(model, optimize_level, output_format, profile=None, engine_options=None,
+                     page_timeout=None, doc_timeout=None):
+    """
+    校验请求参数，不合法时抛出400错误
+    
+    Returns:
+        dict: 合并性能档位、环境变量与请求参数后的引擎选项
+    """
+    # 验证模型选择
+    if model not in VALID_MODELS:
+        raise HTTPException(status_code=400, detail=f"模型选择错误，请选择以下模型之一: {', '.join(VALID_MODELS)}")
+    
+    # 验证优化级别
+    if optimize_level not in VALID_OPTIMIZE_LEVELS:
+        raise HTTPException(status_code=400, detail=f"优化级别选择错误，请选择以下级别之一: {', '.join(VALID_OPTIMIZE_LEVELS)}")
+    
+    # 验证输出格式
+    if output_format not in OUTPUT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"输出格式选择错误，请选择以下格式之一: {', '.join(OUTPUT_FORMATS)}")
+    
+    # 验证时间预算：进程内推理无法在超时后中断，只在受监管推理（或桩引擎）下接受
+    if (page_timeout or doc_timeout) and not SUPERVISED_ENGINE and STUB_ENGINE_DELAY is None:
+        raise HTTPException(status_code=400, detail="服务未开启受监管推理，不支持请求级时间预算，"
+                                                    "请设置环境变量 OCR_PAGE_TIMEOUT、OCR_DOC_TIMEOUT 或 OCR_SUPERVISED_ENGINE=1")
+    
+    # 验证性能档位与引擎选项（逗号分隔的 key=value）
+    try:
+        overrides = parse_engine_option_args([option for option in (engine_options or '').split(',') if option.strip()])
+        return resolve_engine_options(profile, overrides, model)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def create_handler(output_dir, model, **handler_options):
+    """创建使用共享推理引擎的OCR处理器"""
+    engine_options = handler_options.get('engine_options')
+    if model == AUTO_MODEL:
+        # 自动路由：普通页面与复杂页面分别使用共享的PP-OCRv5与PP-StructureV3引擎
+        engine = get_engine(AUTO_BASE_MODEL, engine_options)
+        structure_engine = get_engine(AUTO_STRUCTURE_MODEL, engine_options)
+    else:
+        engine = get_engine(model, engine_options)
+        structure_engine = None
+    return PDFOCRHandler(output_dir, model, engine=engine, structure_engine=structure_engine,
+                         memory_budget=memory_budget, render_cache=render_cache, page_log_sample=PAGE_LOG_SAMPLE,
+                         **handler_options)
+
+
+def run_ocr(job, pdf_path, output_dir, model, **handler_options):
+    """
+    按调度使用共享推理引擎识别单个PDF文件（同步执行，应在线程池中调用）
+    
+    Returns:
+        tuple: (是否全部成功, 识别结果)，没有生成结果时识别结果为None
+    """
+    output_format = handler_options.get('output_format', 'txt')
+    ocr_handler = create_handler(output_dir, model, **handler_options)
+    try:
+        # 部分页面超时时 process_pdf 返回 PROCESS_PARTIAL，只有全部页面完成才计为成功
+        success = scheduler.run(job, lambda should_yield: ocr_handler.process_pdf(pdf_path, should_yield=should_yield)) is True
+    finally:
+        ocr_handler.close()
+    
+    # 读取识别结果（部分页面识别超时时仍返回已识别的内容）
+    result_path = get_output_path(output_dir, pdf_path, output_format)
+    if not os.path.exists(result_path):
+        return success, None
+    
+    with open(result_path, "r", encoding="utf-8") as f:
+        if output_format == "jsonl":
+            # 逐页记录解析为列表返回
+            return success, [json.loads(line) for line in f if line.strip()]
+        return success, f.read()
+
+def run_query(job, pdf_path, output_dir, model, targets, page_order, max_pages, **handler_options):
+    """按调度在单个PDF文件中查找目标，找齐后立即停止识别（同步执行，应在线程池中调用）"""
+    ocr_handler = create_handler(output_dir, model, **handler_options)
+    try:
+        # 查询只识别少量页面，不参与页边界抢占
+        return scheduler.run(job, lambda should_yield: ocr_handler.query_pdf(pdf_path, targets, page_order, max_pages))
+    finally:
+        ocr_handler.close()
+
 # OCR处理接口
 @app.post("/ocr/pdf")
 async def ocr_pdf(
+    request: Request,
     file: UploadFile = File(...),
-    model: Optional[str] = Form(default="pp-ocrv5", description="OCR模型选择: pp-ocrv5, pp-structurev3, paddleocr-vl, pp-chatocrv4"),
+    model: Optional[str] = Form(default=DEFAULT_MODEL, description="OCR模型选择: pp-ocrv5, pp-structurev3, paddleocr-vl, pp-chatocrv4, auto"),
     optimize_pdf: Optional[bool] = Form(default=False, description="是否优化PDF文件"),
     optimize_level: Optional[str] = Form(default="medium", description="PDF优化级别: low, medium, high"),
-    grayscale: Optional[bool] = Form(default=False, description="是否使用灰度渲染")
+    grayscale: Optional[bool] = Form(default=False, description="是否使用灰度渲染"),
+    output_format: Optional[str] = Form(default="txt", description="输出格式: txt, jsonl, md"),
+    page_timeout: Optional[float] = Form(default=DEFAULT_PAGE_TIMEOUT, description="单页识别时间预算（秒）"),
+    doc_timeout: Optional[float] = Form(default=DEFAULT_DOC_TIMEOUT, description="单个文档识别时间预算（秒）"),
+    profile: Optional[str] = Form(default=None, description="性能档位: fast, balanced, accurate"),
+    engine_options: Optional[str] = Form(default=None, description="引擎选项覆盖，逗号分隔的 key=value")
 ):
     """
     处理PDF文件的OCR识别
     
     Args:
         file: 上传的PDF文件
-        model: OCR模型选择，可选值: pp-ocrv5, pp-structurev3, paddleocr-vl, pp-chatocrv4
+        model: OCR模型选择，可选值: pp-ocrv5, pp-structurev3, paddleocr-vl, pp-chatocrv4, auto（按页路由）
         optimize_pdf: 是否优化PDF文件
         optimize_level: PDF优化级别，可选值: low, medium, high
         grayscale: 是否使用灰度渲染
+        output_format: 输出格式，可选值: txt, jsonl（逐页记录，含文本框与置信度）, md
+        page_timeout: 单页识别时间预算（秒），超时的页面在结果中标记，默认取环境变量 OCR_PAGE_TIMEOUT
+        doc_timeout: 单个文档识别时间预算（秒），默认取环境变量 OCR_DOC_TIMEOUT
+        profile: 性能档位，可选值: fast, balanced, accurate，默认取环境变量 OCR_PROFILE
+        engine_options: 引擎选项覆盖，逗号分隔的 key=value，如 text_det_limit_side_len=960,enable_mkldnn=true
     
     Returns:
         识别结果
@@ -85,62 +521,51 @@ async def ocr_pdf(
     if not file.filename.endswith('.pdf'):
         raise HTTPException(status_code=400, detail="文件类型错误，请上传PDF文件")
     
-    # 验证模型选择
-    valid_models = ["pp-ocrv5", "pp-structurev3", "paddleocr-vl", "pp-chatocrv4"]
-    if model not in valid_models:
-        raise HTTPException(status_code=400, detail=f"模型选择错误，请选择以下模型之一: {', '.join(valid_models)}")
-    
-    # 验证优化级别
-    valid_optimize_levels = ["low", "medium", "high"]
-    if optimize_level not in valid_optimize_levels:
-        raise HTTPException(status_code=400, detail=f"优化级别选择错误，请选择以下级别之一: {', '.join(valid_optimize_levels)}")
+    resolved_engine_options = validate_options(model, optimize_level, output_format, profile, engine_options,
+                                               page_timeout, doc_timeout)
+    check_queue_capacity()
     
     try:
         # 创建临时目录保存上传的PDF文件
         with tempfile.TemporaryDirectory() as tmp_dir:
             # 保存上传的PDF文件
             pdf_path = os.path.join(tmp_dir, file.filename)
-            with open(pdf_path, "wb") as buffer:
-                buffer.write(await file.read())
+            await save_upload(file, pdf_path)
             
             # 创建临时输出目录
             output_dir = os.path.join(tmp_dir, "output")
             os.makedirs(output_dir, exist_ok=True)
             
-            # 初始化OCR处理器
-            logger.info(f"初始化OCR处理器，使用模型: {model}")
-            ocr_handler = PDFOCRHandler(
-                output_dir, 
+            # 在线程池中按调度处理，并发请求的页面由共享引擎合并推理
+            job = OCRJob(file.filename, get_client_id(request), *inspect_pdf(pdf_path, model, grayscale=grayscale))
+            logger.info(f"提交PDF文件: {file.filename}，共 {job.total_pages} 页，使用模型: {model}")
+            success, ocr_result = await run_in_threadpool(
+                run_ocr,
+                job,
+                pdf_path,
+                output_dir,
                 model,
                 optimize_pdf=optimize_pdf,
                 optimize_level=optimize_level,
-                grayscale=grayscale
+                grayscale=grayscale,
+                output_format=output_format,
+                page_timeout=page_timeout,
+                doc_timeout=doc_timeout,
+                profile=profile,
+                engine_options=resolved_engine_options
             )
             
-            # 处理PDF文件
-            logger.info(f"开始处理PDF文件: {file.filename}")
-            success = ocr_handler.process_pdf(pdf_path)
-            
-            if not success:
+            if ocr_result is None:
                 raise HTTPException(status_code=500, detail="PDF文件处理失败")
             
-            # 读取识别结果
-            txt_filename = os.path.splitext(file.filename)[0] + ".txt"
-            txt_path = os.path.join(output_dir, txt_filename)
-            
-            if not os.path.exists(txt_path):
-                raise HTTPException(status_code=500, detail="识别结果文件生成失败")
-            
-            with open(txt_path, "r", encoding="utf-8") as f:
-                ocr_result = f.read()
-            
             # 返回识别结果
             return JSONResponse(
                 status_code=200,
                 content={
-                    "status": "success",
+                    "status": "success" if success else "partial",
                     "filename": file.filename,
                     "model": model,
+                    "format": output_format,
                     "result": ocr_result
                 }
             )
@@ -153,6 +578,187 @@ async def ocr_pdf(
         logger.debug(f"完整错误堆栈: {traceback.format_exc()}")
         raise HTTPException(status_code=500, detail=f"处理PDF文件时发生错误: {str(e)}")
 
+# 多文件批量OCR接口
+@app.post("/ocr/batch")
+async def ocr_batch(
+    request: Request,
+    files: List[UploadFile] = File(...),
+    model: Optional[str] = Form(default=DEFAULT_MODEL, description="OCR模型选择: pp-ocrv5, pp-structurev3, paddleocr-vl, pp-chatocrv4, auto"),
+    optimize_pdf: Optional[bool] = Form(default=False, description="是否优化PDF文件"),
+    optimize_level: Optional[str] = Form(default="medium", description="PDF优化级别: low, medium, high"),
+    grayscale: Optional[bool] = Form(default=False, description="是否使用灰度渲染"),
+    output_format: Optional[str] = Form(default="txt", description="输出格式: txt, jsonl, md"),
+    page_timeout: Optional[float] = Form(default=DEFAULT_PAGE_TIMEOUT, description="单页识别时间预算（秒）"),
+    doc_timeout: Optional[float] = Form(default=DEFAULT_DOC_TIMEOUT, description="单个文档识别时间预算（秒）"),
+    profile: Optional[str] = Form(default=None, description="性能档位: fast, balanced, accurate"),
+    engine_options: Optional[str] = Form(default=None, description="引擎选项覆盖，逗号分隔的 key=value")
+):
+    """
+    一次请求识别多个PDF文件
+    
+    各文件并发处理，页面与其他请求的页面一起经微批处理合并推理；
+    单个文件失败不影响其他文件，结果按上传顺序返回。
+    
+    Args:
+        files: 上传的多个PDF文件
+        其余参数同 /ocr/pdf，对所有文件生效
+    
+    Returns:
+        逐文件的识别结果
+    """
+    # 验证文件类型
+    invalid_files = [file.filename for file in files if not file.filename.endswith('.pdf')]
+    if invalid_files:
+        raise HTTPException(status_code=400, detail=f"文件类型错误，请上传PDF文件: {', '.join(invalid_files)}")
+    
+    resolved_engine_options = validate_options(model, optimize_level, output_format, profile, engine_options,
+                                               page_timeout, doc_timeout)
+    check_queue_capacity(len(files))
+    
+    async def process_file(index, file, tmp_dir):
+        # 每个文件使用独立的子目录，避免同名文件互相覆盖
+        file_dir = os.path.join(tmp_dir, str(index))
+        output_dir = os.path.join(file_dir, "output")
+        os.makedirs(output_dir, exist_ok=True)
+        pdf_path = os.path.join(file_dir, file.filename)
+        await save_upload(file, pdf_path)
+        try:
+            job = OCRJob(file.filename, client, *inspect_pdf(pdf_path, model, grayscale=grayscale))
+            success, ocr_result = await run_in_threadpool(
+                run_ocr,
+                job,
+                pdf_path,
+                output_dir,
+                model,
+                optimize_pdf=optimize_pdf,
+                optimize_level=optimize_level,
+                grayscale=grayscale,
+                output_format=output_format,
+                page_timeout=page_timeout,
+                doc_timeout=doc_timeout,
+                profile=profile,
+                engine_options=resolved_engine_options
+            )
+        except HTTPException as e:
+            return {"filename": file.filename, "status": "failed", "detail": e.detail}
+        except Exception as e:
+            logger.error(f"处理PDF文件 {file.filename} 时发生错误: {str(e)}")
+            return {"filename": file.filename, "status": "failed", "detail": str(e)}
+        if ocr_result is None:
+            return {"filename": file.filename, "status": "failed", "detail": "PDF文件处理失败"}
+        return {
+            "filename": file.filename,
+            "status": "success" if success else "partial",
+            "result": ocr_result
+        }
+    
+    client = get_client_id(request)
+    logger.info(f"开始批量处理 {len(files)} 个PDF文件，使用模型: {model}，客户端: {client}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        results = await asyncio.gather(*[process_file(index, file, tmp_dir) for index, file in enumerate(files)])
+    
+    succeeded = sum(1 for result in results if result["status"] == "success")
+    return JSONResponse(
+        status_code=200,
+        content={
+            "status": "success" if succeeded == len(results) else "partial",
+            "model": model,
+            "format": output_format,
+            "total": len(results),
+            "succeeded": succeeded,
+            "results": results
+        }
+    )
+
+# 查询接口
+@app.post("/ocr/query")
+async def ocr_query(
+    request: Request,
+    file: UploadFile = File(...),
+    patterns: List[str] = Form(default=[], description="查找的正则表达式或关键字，可重复指定"),
+    fields: Optional[str] = Form(default=None, description="提取的字段，JSON对象：字段名 -> 正则表达式"),
+    page_order: Optional[str] = Form(default=DEFAULT_QUERY_ORDER, description="页序：逗号分隔的页码，负数从最后一页倒数，* 为其余页面顺序、~ 为其余页面倒序"),
+    max_pages: Optional[int] = Form(default=None, description="最多识别的页数"),
+    model: Optional[str] = Form(default=DEFAULT_MODEL, description="OCR模型选择: pp-ocrv5, pp-structurev3, paddleocr-vl, pp-chatocrv4, auto"),
+    grayscale: Optional[bool] = Form(default=False, description="是否使用灰度渲染"),
+    page_timeout: Optional[float] = Form(default=DEFAULT_PAGE_TIMEOUT, description="单页识别时间预算（秒）"),
+    doc_timeout: Optional[float] = Form(default=DEFAULT_DOC_TIMEOUT, description="单个文档识别时间预算（秒）"),
+    profile: Optional[str] = Form(default=None, description="性能档位: fast, balanced, accurate"),
+    engine_options: Optional[str] = Form(default=None, description="引擎选项覆盖，逗号分隔的 key=value")
+):
+    """
+    在PDF文件中查找关键字或提取字段，按页序识别，所有目标都找到后立即停止
+    
+    Args:
+        file: 上传的PDF文件
+        patterns: 查找的正则表达式或关键字，目标名称即表达式本身
+        fields: 字段定义，JSON对象，如 {"invoice_no": "发票号码[:：]\\s*(\\d+)"}，表达式含分组时取第一个分组作为字段值
+        page_order: 页序，默认先识别前两页，再识别最后两页，最后按顺序识别其余页面
+        max_pages: 最多识别的页数，默认不限制
+        其余参数同 /ocr/pdf
+    
+    Returns:
+        各目标所在的页码、值与所在行，以及未找到的目标和已识别的页码
+    """
+    if not file.filename.endswith('.pdf'):
+        raise HTTPException(status_code=400, detail="文件类型错误，请上传PDF文件")
+    
+    resolved_engine_options = validate_options(model, "medium", "txt", profile, engine_options,
+                                               page_timeout, doc_timeout)
+    try:
+        field_patterns = json.loads(fields) if fields else {}
+        if not isinstance(field_patterns, dict):
+            raise ValueError("字段定义应为JSON对象：字段名 -> 正则表达式")
+        targets = compile_query_targets(patterns, field_patterns)
+        resolve_page_order(1, page_order)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    check_queue_capacity()
+    
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            pdf_path = os.path.join(tmp_dir, file.filename)
+            await save_upload(file, pdf_path)
+            total_pages, peak_memory = inspect_pdf(pdf_path, model, grayscale=grayscale)
+            # 按最多需要识别的页数调度，查询通常只识别少量页面
+            query_pages = len(resolve_page_order(total_pages, page_order))
+            if max_pages:
+                query_pages = min(query_pages, max_pages)
+            job = OCRJob(file.filename, get_client_id(request), max(1, query_pages), peak_memory)
+            logger.info(f"提交查询: {file.filename}，共 {total_pages} 页，目标: {', '.join(targets)}")
+            result = await run_in_threadpool(
+                run_query,
+                job,
+                pdf_path,
+                tmp_dir,
+                model,
+                targets,
+                page_order,
+                max_pages,
+                grayscale=grayscale,
+                page_timeout=page_timeout,
+                doc_timeout=doc_timeout,
+                profile=profile,
+                engine_options=resolved_engine_options
+            )
+            return JSONResponse(
+                status_code=200,
+                content={
+                    "status": "success" if result['complete'] else "partial",
+                    "filename": file.filename,
+                    "model": model,
+                    "result": result
+                }
+            )
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"查询PDF文件时发生错误: {str(e)}")
+        import traceback
+        logger.debug(f"完整错误堆栈: {traceback.format_exc()}")
+        raise HTTPException(status_code=500, detail=f"查询PDF文件时发生错误: {str(e)}")
+
 # 运行API服务
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------
+# 模块信息
+# ----------------------------------------------------------------------
+# @Time    : 2026-10-19
+# @FileName: autotune.py
+# @Version : 1.0.0
+# ----------------------------------------------------------------------
+# 功能描述
+# ----------------------------------------------------------------------
+# 本脚本在本机上用合成页面和本地可用的模型运行一段短时间的标定负载，
+# 搜索 工作进程数 × 每进程推理线程数 × 文本识别批大小 的最优组合，
+# 并将结果写入调优配置文件（默认 ./ocr_tuning.json，可通过环境变量
+# OCR_TUNING_CONFIG 指定路径），ocr_pdf.py 与 api.py 启动时自动读取。
+# ----------------------------------------------------------------------
+# 使用示例
+# ----------------------------------------------------------------------
+# 使用默认搜索空间调优PP-OCRv5：
+#   python autotune.py
+#
+# 限制最大进程数并指定候选批大小：
+#   python autotune.py -model pp-ocrv5 --max-workers 4 --batch-sizes 1,8,16
+# ----------------------------------------------------------------------
+
+import os
+import sys
+import json
+import time
+import random
+import platform
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait
+
+import numpy as np
+import cv2
+
+from ocr_pdf import (logger, LOG_LEVELS, LocalOCREngine, get_tuning_config_path)
+
+# 合成页面使用的字符
+SYNTHETIC_CHARSET = 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789.,:-/()'
+
+# 工作进程内预先生成的合成页面与推理引擎
+_tune_pages = None
+_tune_engine = None
+
+
+def make_synthetic_page(seed, width=595, height=842):
+    """生成一张由随机文本行组成的白底合成页面（BGR）"""
+    rng = random.Random(seed)
+    page = np.full((height, width, 3), 255, dtype=np.uint8)
+    y = 40
+    while y < height - 20:
+        words = [''.join(rng.choice(SYNTHETIC_CHARSET) for _ in range(rng.randint(2, 9)))
+                 for _ in range(rng.randint(3, 8))]
+        font_scale = rng.uniform(0.4, 0.7)
+        cv2.putText(page, ' '.join(words), (rng.randint(20, 60), y), cv2.FONT_HERSHEY_SIMPLEX,
+                    font_scale, (0, 0, 0), 1, cv2.LINE_AA)
+        y += int(30 * font_scale / 0.5)
+    return page
+
+
+def _init_tune_worker(model, cpu_threads, batch_size, page_count, page_size):
+    """工作进程初始化：限制线程数、生成合成页面并加载模型"""
+    global _tune_pages, _tune_engine
+    for env_name in ['OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS']:
+        os.environ[env_name] = str(cpu_threads)
+    cv2.setNumThreads(1)
+    _tune_pages = [make_synthetic_page(seed, *page_size) for seed in range(page_count)]
+    _tune_engine = LocalOCREngine(model, cpu_threads=cpu_threads, text_recognition_batch_size=batch_size)
+
+
+def _infer_synthetic_page(index):
+    """识别一张合成页面，返回识别出的文本行数"""
+    page_text, _, _ = _tune_engine.infer([_tune_pages[index % len(_tune_pages)]], index, text_fallback=False)[0]
+    return len(page_text)
+
+
+def measure_config(model, workers, cpu_threads, batch_size, pages_per_worker, page_size):
+    """
+    测量一种配置的吞吐量
+
+    模型加载与预热不计入耗时，只统计所有进程识别合成页面的总耗时。
+
+    Returns:
+        dict: 配置与测量结果（页/分钟），失败时包含error
+    """
+    result = {'workers': workers, 'cpu_threads': cpu_threads, 'batch_size': batch_size}
+    total_pages = workers * pages_per_worker
+    logger.info(f"测量配置: 进程数={workers}, 每进程线程数={cpu_threads}, 识别批大小={batch_size}")
+    try:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_tune_worker,
+            initargs=(model, cpu_threads, batch_size, pages_per_worker, page_size)
+        ) as executor:
+            # 预热：每个进程至少完成一次推理（首次推理包含额外的初始化开销）
+            wait([executor.submit(_infer_synthetic_page, index) for index in range(workers * 2)])
+            start_time = time.time()
+            futures = [executor.submit(_infer_synthetic_page, index) for index in range(total_pages)]
+            lines = sum(future.result() for future in futures)
+            elapsed = time.time() - start_time
+    except Exception as e:
+        logger.error(f"配置测量失败: {str(e)}")
+        result['error'] = str(e)
+        return result
+    result['elapsed'] = elapsed
+    result['pages_per_minute'] = total_pages / elapsed * 60 if elapsed > 0 else 0.0
+    result['lines'] = lines
+    logger.info(f"吞吐量: {result['pages_per_minute']:.2f} 页/分钟（{total_pages} 页，耗时 {elapsed:.2f}秒）")
+    return result
+
+
+def candidate_workers(cpu_count, max_workers):
+    """候选进程数：1、2、4……直到CPU核心数（或上限），并包含核心数本身"""
+    limit = max(1, min(cpu_count, max_workers or cpu_count))
+    candidates = []
+    workers = 1
+    while workers <= limit:
+        candidates.append(workers)
+        workers *= 2
+    if limit not in candidates:
+        candidates.append(limit)
+    return candidates
+
+
+def candidate_threads(cpu_count, workers):
+    """候选线程数：均分全部核心，以及均分一半核心（给渲染等留出余量）"""
+    full = max(1, cpu_count // workers)
+    return sorted({full, max(1, full // 2)}, reverse=True)
+
+
+def autotune(model, max_workers=None, batch_sizes=(1, 8, 16), pages_per_worker=6, page_size=(595, 842)):
+    """
+    坐标搜索最优配置：先以第一个候选批大小搜索 进程数 × 线程数，再在最优组合上搜索批大小
+
+    Returns:
+        tuple: (最优结果, 所有测量结果)
+    """
+    cpu_count = os.cpu_count() or 1
+    results = []
+    base_batch = batch_sizes[0]
+    for workers in candidate_workers(cpu_count, max_workers):
+        for cpu_threads in candidate_threads(cpu_count, workers):
+            results.append(measure_config(model, workers, cpu_threads, base_batch, pages_per_worker, page_size))
+
+    measured = [result for result in results if 'error' not in result]
+    if not measured:
+        return None, results
+    best = max(measured, key=lambda result: result['pages_per_minute'])
+    for batch_size in batch_sizes[1:]:
+        results.append(measure_config(model, best['workers'], best['cpu_threads'], batch_size,
+                                      pages_per_worker, page_size))
+    measured = [result for result in results if 'error' not in result]
+    best = max(measured, key=lambda result: result['pages_per_minute'])
+    return best, results
+
+
+def write_tuning_config(path, model, best, results):
+    """原子写入调优配置文件"""
+    config = {
+        'version': 1,
+        'created_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'host': {
+            'cpu_count': os.cpu_count(),
+            'machine': platform.machine(),
+            'system': platform.system()
+        },
+        'model': model,
+        'workers': best['workers'],
+        'cpu_threads': best['cpu_threads'],
+        'engine_options': {
+            'text_recognition_batch_size': best['batch_size']
+        },
+        'pages_per_minute': round(best['pages_per_minute'], 2),
+        'results': results
+    }
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(config, f, ensure_ascii=False, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return config
+
+
+def main():
+    parser = argparse.ArgumentParser(description='OCR并行配置自动调优工具')
+    parser.add_argument('-model', '--model', choices=['paddleocr-vl', 'pp-ocrv5', 'pp-structurev3'],
+                        default='pp-ocrv5', help='用于调优的OCR模型，默认：pp-ocrv5')
+    parser.add_argument('-o', '--output', default=None,
+                        help='调优配置文件路径，默认：环境变量 OCR_TUNING_CONFIG 或 ./ocr_tuning.json')
+    parser.add_argument('--max-workers', type=int, default=None,
+                        help='搜索的最大工作进程数，默认：CPU核心数')
+    parser.add_argument('--batch-sizes', default='1,8,16',
+                        help='候选文本识别批大小（逗号分隔），默认：1,8,16')
+    parser.add_argument('--pages-per-worker', type=int, default=6,
+                        help='每种配置下每个进程识别的合成页面数，默认：6')
+    parser.add_argument('--render-scale', type=float, default=1.0,
+                        help='合成页面对应的渲染缩放比例（以A4页面为准），默认：1.0')
+    parser.add_argument('-l', '--log-level', choices=LOG_LEVELS.keys(), default='info',
+                        help='日志输出级别：debug、info、warning、error、critical，默认：info')
+    args = parser.parse_args()
+
+    logger.setLevel(LOG_LEVELS[args.log_level])
+    try:
+        batch_sizes = [int(batch_size) for batch_size in args.batch_sizes.split(',') if batch_size.strip()]
+    except ValueError:
+        logger.error(f"候选批大小格式错误: {args.batch_sizes}")
+        return 1
+    if not batch_sizes:
+        logger.error("至少需要一个候选批大小")
+        return 1
+    page_size = (round(595 * args.render_scale), round(842 * args.render_scale))
+    output_path = args.output or get_tuning_config_path()
+
+    logger.info(f"开始自动调优: 模型={args.model}, CPU核心数={os.cpu_count()}, 平台={platform.machine()}")
+    start_time = time.time()
+    best, results = autotune(args.model, args.max_workers, batch_sizes, args.pages_per_worker, page_size)
+    if best is None:
+        logger.error("所有配置均测量失败，未生成调优配置")
+        return 1
+
+    write_tuning_config(output_path, args.model, best, results)
+    logger.info("=" * 50)
+    logger.info("自动调优完成")
+    logger.info(f"最优配置: 进程数={best['workers']}, 每进程线程数={best['cpu_threads']}, 识别批大小={best['batch_size']}")
+    logger.info(f"吞吐量: {best['pages_per_minute']:.2f} 页/分钟")
+    logger.info(f"调优耗时: {time.time() - start_time:.2f}秒")
+    logger.info(f"调优配置已保存至: {output_path}")
+    logger.info("=" * 50)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
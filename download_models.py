@@ -18,6 +18,8 @@
 #   - pp-ocrv5: PP-OCRv5模型
 #   - pp-structurev3: PP-StructureV3模型
 #   - paddleocr-vl: PaddleOCR-VL模型
+# 模型归档并发下载、支持断点续传，下载后生成校验清单（models_manifest.json），
+# 并支持仅校验、打包与解压离线模型归档（用于无外网节点）。
 # ----------------------------------------------------------------------
 # 使用示例
 # ----------------------------------------------------------------------
@@ -26,12 +28,29 @@
 # 
 # 下载指定模型到自定义目录
 #   python download_models.py -m pp-ocrv5,paddleocr-vl -o ./models
+#
+# 从内网镜像下载：
+#   OCR_MODEL_MIRROR=http://mirror.local/models python download_models.py -m pp-ocrv5
+#
+# 校验、打包与解压离线模型归档：
+#   python download_models.py -a verify -m pp-ocrv5
+#   python download_models.py -a pack -m pp-ocrv5 --bundle models.tar
+#   python download_models.py -a unpack --bundle models.tar
 # ----------------------------------------------------------------------
 
+import io
 import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import tarfile
 import argparse
 import logging
-import sys
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # 配置日志级别映射
 LOG_LEVELS = {
@@ -102,9 +121,348 @@ def setup_custom_cache(cache_dir=None):
     logger.info(f"已设置自定义缓存目录: {custom_cache_module.CACHE_DIR}")
 
 
+# 官方模型归档的默认下载地址（PaddleX官方推理模型），可通过 --mirror 或环境变量 OCR_MODEL_MIRROR 覆盖，
+# 镜像目录下需提供 <模型名>_infer.tar 形式的归档文件
+DEFAULT_MODEL_MIRROR = 'https://paddle-model-ecology.bj.bcebos.com/paddlex/official_inference_model/paddle3.0.0'
+
+# 各推理管线依赖的官方模型（与本项目创建管线时使用的默认配置一致）
+PIPELINE_MODELS = {
+    'pp-ocrv5': [
+        'PP-OCRv5_server_det',
+        'PP-OCRv5_server_rec',
+        'PP-LCNet_x1_0_textline_ori'
+    ],
+    'pp-structurev3': [
+        'PP-DocLayout_plus-L',
+        'PP-DocBlockLayout',
+        'PP-OCRv5_server_det',
+        'PP-OCRv5_server_rec',
+        'PP-LCNet_x1_0_textline_ori',
+        'PP-LCNet_x1_0_table_cls',
+        'SLANeXt_wired',
+        'SLANet_plus',
+        'RT-DETR-L_wired_table_cell_det',
+        'RT-DETR-L_wireless_table_cell_det',
+        'PP-OCRv4_server_seal_det',
+        'PP-FormulaNet_plus-L'
+    ],
+    'paddleocr-vl': [
+        'PP-DocLayoutV2',
+        'PaddleOCR-VL'
+    ]
+}
+
+# 校验清单文件名（位于缓存目录下）
+MANIFEST_FILENAME = 'models_manifest.json'
+
+# 下载时每次读取的数据块大小
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+def get_cache_dir(cache_dir=None):
+    """模型缓存目录，默认为当前目录下的.paddlex（与ocr_pdf.py一致）"""
+    return os.path.abspath(cache_dir) if cache_dir else os.path.join(os.getcwd(), '.paddlex')
+
+
+def get_model_mirror(mirror=None):
+    """模型下载地址：命令行参数 > 环境变量 OCR_MODEL_MIRROR > 官方地址"""
+    return (mirror or os.environ.get('OCR_MODEL_MIRROR') or DEFAULT_MODEL_MIRROR).rstrip('/')
+
+
+def resolve_model_names(pipelines):
+    """将推理管线名称展开为去重后的官方模型名称列表"""
+    names = []
+    for pipeline in pipelines:
+        for name in PIPELINE_MODELS[pipeline]:
+            if name not in names:
+                names.append(name)
+    return names
+
+
+def compute_sha256(file_path):
+    """计算文件的SHA256"""
+    sha256 = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(DOWNLOAD_CHUNK_SIZE), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def load_manifest(manifest_path):
+    """读取校验清单，不存在时返回空清单"""
+    if not os.path.exists(manifest_path):
+        return {'version': 1, 'models': {}}
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_manifest(manifest_path, manifest):
+    """原子写入校验清单"""
+    tmp_path = manifest_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, manifest_path)
+
+
+def fetch_file(url, dest_path, retries=3, timeout=30):
+    """
+    断点续传下载文件
+
+    数据先写入 dest_path + '.part'，中断后再次下载时通过HTTP Range请求从已下载位置继续；
+    服务器不支持Range时从头下载。下载完成后重命名为目标文件。
+    """
+    part_path = dest_path + '.part'
+    for attempt in range(1, retries + 1):
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        request = urllib.request.Request(url)
+        if offset:
+            request.add_header('Range', f'bytes={offset}-')
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                if offset and response.status != 206:
+                    logger.debug(f"服务器不支持断点续传，从头下载: {url}")
+                    offset = 0
+                elif offset:
+                    logger.info(f"从 {offset} 字节处继续下载: {url}")
+                with open(part_path, 'ab' if offset else 'wb') as f:
+                    for chunk in iter(lambda: response.read(DOWNLOAD_CHUNK_SIZE), b''):
+                        f.write(chunk)
+            os.replace(part_path, dest_path)
+            return dest_path
+        except urllib.error.HTTPError as e:
+            if e.code == 416:
+                # 请求范围越界：.part已是完整文件
+                os.replace(part_path, dest_path)
+                return dest_path
+            if e.code == 404 or attempt == retries:
+                raise
+            logger.warning(f"下载失败（第{attempt}次）: {url}, 错误: {str(e)}")
+        except (urllib.error.URLError, OSError) as e:
+            if attempt == retries:
+                raise
+            logger.warning(f"下载中断（第{attempt}次）: {url}, 错误: {str(e)}")
+        time.sleep(2 ** attempt)
+
+
+def safe_extract(tar, dest_dir, members=None):
+    """解压tar归档，拒绝指向目标目录之外的成员与链接"""
+    dest_dir = os.path.abspath(dest_dir)
+    members = tar.getmembers() if members is None else members
+    for member in members:
+        member_path = os.path.abspath(os.path.join(dest_dir, member.name))
+        if os.path.commonpath([dest_dir, member_path]) != dest_dir or member.issym() or member.islnk():
+            raise ValueError(f"归档中包含不安全的路径: {member.name}")
+    tar.extractall(dest_dir, members=members)
+
+
+def hash_model_dir(model_dir):
+    """计算模型目录下每个文件的大小与SHA256"""
+    files = {}
+    for root, _, filenames in os.walk(model_dir):
+        for filename in sorted(filenames):
+            file_path = os.path.join(root, filename)
+            relative_path = os.path.relpath(file_path, model_dir).replace(os.sep, '/')
+            files[relative_path] = {'size': os.path.getsize(file_path), 'sha256': compute_sha256(file_path)}
+    return files
+
+
+def prefetch_model(model_name, cache_dir, mirror, expected_sha256=None):
+    """
+    下载并安装单个官方模型
+
+    Returns:
+        dict: 校验清单条目（归档SHA256与模型文件列表）
+    """
+    models_dir = os.path.join(cache_dir, 'official_models')
+    temp_dir = os.path.join(cache_dir, 'temp')
+    os.makedirs(models_dir, exist_ok=True)
+    os.makedirs(temp_dir, exist_ok=True)
+
+    archive_name = f'{model_name}_infer.tar'
+    archive_path = os.path.join(temp_dir, archive_name)
+    logger.info(f"开始下载模型: {model_name}")
+    fetch_file(f'{mirror}/{archive_name}', archive_path)
+
+    archive_sha256 = compute_sha256(archive_path)
+    if expected_sha256 and archive_sha256 != expected_sha256:
+        os.remove(archive_path)
+        raise ValueError(f"{model_name} 归档校验失败: 期望 {expected_sha256}，实际 {archive_sha256}")
+
+    # 先解压到临时目录，再整体替换，避免留下不完整的模型目录
+    extract_dir = os.path.join(temp_dir, f'{model_name}.extract')
+    shutil.rmtree(extract_dir, ignore_errors=True)
+    with tarfile.open(archive_path) as tar:
+        safe_extract(tar, extract_dir)
+    entries = os.listdir(extract_dir)
+    source_dir = os.path.join(extract_dir, entries[0]) if len(entries) == 1 and \
+        os.path.isdir(os.path.join(extract_dir, entries[0])) else extract_dir
+    model_dir = os.path.join(models_dir, model_name)
+    shutil.rmtree(model_dir, ignore_errors=True)
+    os.replace(source_dir, model_dir)
+    shutil.rmtree(extract_dir, ignore_errors=True)
+    os.remove(archive_path)
+
+    logger.info(f"模型 {model_name} 下载完成")
+    return {'archive_sha256': archive_sha256, 'files': hash_model_dir(model_dir)}
+
+
+def prefetch_models(pipelines, cache_dir=None, mirror=None, jobs=4, pinned_manifest=None, force=False):
+    """
+    并发下载推理管线所需的官方模型，并更新缓存目录下的校验清单
+
+    已下载且文件与校验清单一致的模型直接跳过，只下载缺失或校验不通过的模型。
+
+    Args:
+        pipelines (list): 推理管线名称列表
+        cache_dir (str): 模型缓存目录
+        mirror (str): 模型下载地址
+        jobs (int): 并发下载数
+        pinned_manifest (dict): 受信任的校验清单，提供时校验下载的归档SHA256
+        force (bool): 忽略已下载的模型，全部重新下载
+
+    Returns:
+        bool: 是否全部下载成功
+    """
+    cache_dir = get_cache_dir(cache_dir)
+    mirror = get_model_mirror(mirror)
+    manifest_path = os.path.join(cache_dir, MANIFEST_FILENAME)
+    manifest = load_manifest(manifest_path)
+    pinned = (pinned_manifest or {}).get('models', {})
+    model_names = resolve_model_names(pipelines)
+    pending_names = model_names if force else \
+        [name for name in model_names if not is_model_current(name, cache_dir, manifest, pinned)]
+    if len(pending_names) < len(model_names):
+        logger.info(f"跳过 {len(model_names) - len(pending_names)} 个已下载且校验通过的模型（使用 --force 重新下载）")
+    logger.info(f"从 {mirror} 下载 {len(pending_names)} 个模型，并发数: {jobs}")
+
+    failed = []
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        futures = {
+            executor.submit(prefetch_model, name, cache_dir, mirror,
+                            pinned.get(name, {}).get('archive_sha256')): name
+            for name in pending_names
+        }
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                manifest['models'][name] = future.result()
+            except Exception as e:
+                logger.error(f"下载模型 {name} 失败: {str(e)}")
+                failed.append(name)
+
+    manifest['updated_at'] = time.strftime('%Y-%m-%d %H:%M:%S')
+    manifest['mirror'] = mirror
+    save_manifest(manifest_path, manifest)
+    logger.info(f"下载完成: {len(pending_names) - len(failed)}/{len(pending_names)} 个模型下载成功")
+    return not failed
+
+
+def is_model_current(model_name, cache_dir, manifest, pinned=None):
+    """模型已在校验清单中、文件校验通过，且归档SHA256与受信任清单一致（提供时）"""
+    entry = manifest['models'].get(model_name)
+    if entry is None:
+        return False
+    expected_sha256 = (pinned or {}).get(model_name, {}).get('archive_sha256')
+    if expected_sha256 and entry.get('archive_sha256') != expected_sha256:
+        return False
+    return not verify_model_files([model_name], cache_dir, manifest=manifest)
+
+
+def verify_models(pipelines, cache_dir=None, quick=False):
+    """
+    按校验清单检查推理管线所需的模型文件是否完整（不导入paddle，可在启动时调用）
+
+    Args:
+        pipelines (list): 推理管线名称列表
+        cache_dir (str): 模型缓存目录
+        quick (bool): 仅比较文件大小，不计算SHA256
+
+    Returns:
+        list: 发现的问题，为空表示校验通过
+    """
+    return verify_model_files(resolve_model_names(pipelines), cache_dir, quick)
+
+
+def verify_model_files(model_names, cache_dir=None, quick=False, manifest=None):
+    """按校验清单逐个检查官方模型的文件，返回发现的问题列表"""
+    cache_dir = get_cache_dir(cache_dir)
+    if manifest is None:
+        manifest = load_manifest(os.path.join(cache_dir, MANIFEST_FILENAME))
+    problems = []
+    for name in model_names:
+        entry = manifest['models'].get(name)
+        model_dir = os.path.join(cache_dir, 'official_models', name)
+        if entry is None:
+            problems.append(f"{name}: 校验清单中没有该模型")
+            continue
+        for relative_path, expected in entry['files'].items():
+            file_path = os.path.join(model_dir, relative_path)
+            if not os.path.isfile(file_path):
+                problems.append(f"{name}: 缺少文件 {relative_path}")
+            elif os.path.getsize(file_path) != expected['size']:
+                problems.append(f"{name}: 文件大小不符 {relative_path}")
+            elif not quick and compute_sha256(file_path) != expected['sha256']:
+                problems.append(f"{name}: 文件校验失败 {relative_path}")
+    return problems
+
+
+def pack_bundle(pipelines, bundle_path, cache_dir=None):
+    """将推理管线所需的模型与校验清单打包为单个离线归档（用于无外网节点）"""
+    cache_dir = get_cache_dir(cache_dir)
+    problems = verify_models(pipelines, cache_dir)
+    if problems:
+        raise ValueError(f"模型校验未通过，无法打包: {'; '.join(problems)}")
+    manifest = load_manifest(os.path.join(cache_dir, MANIFEST_FILENAME))
+    model_names = resolve_model_names(pipelines)
+    bundle_manifest = {
+        'version': 1,
+        'updated_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'models': {name: manifest['models'][name] for name in model_names}
+    }
+    manifest_bytes = json.dumps(bundle_manifest, ensure_ascii=False, indent=2).encode('utf-8')
+
+    tmp_path = bundle_path + '.tmp'
+    with tarfile.open(tmp_path, 'w') as tar:
+        info = tarfile.TarInfo(MANIFEST_FILENAME)
+        info.size = len(manifest_bytes)
+        info.mtime = int(time.time())
+        tar.addfile(info, io.BytesIO(manifest_bytes))
+        for name in model_names:
+            tar.add(os.path.join(cache_dir, 'official_models', name), arcname=f'official_models/{name}')
+    os.replace(tmp_path, bundle_path)
+    logger.info(f"已打包 {len(model_names)} 个模型至: {bundle_path}")
+
+
+def unpack_bundle(bundle_path, cache_dir=None):
+    """
+    解压离线模型归档到缓存目录，合并校验清单并逐文件校验
+
+    Returns:
+        list: 校验发现的问题，为空表示解压后的模型完整
+    """
+    cache_dir = get_cache_dir(cache_dir)
+    os.makedirs(cache_dir, exist_ok=True)
+    with tarfile.open(bundle_path) as tar:
+        bundle_manifest = json.load(tar.extractfile(MANIFEST_FILENAME))
+        for name in bundle_manifest['models']:
+            shutil.rmtree(os.path.join(cache_dir, 'official_models', name), ignore_errors=True)
+        members = [member for member in tar.getmembers() if member.name != MANIFEST_FILENAME]
+        safe_extract(tar, cache_dir, members)
+
+    manifest_path = os.path.join(cache_dir, MANIFEST_FILENAME)
+    manifest = load_manifest(manifest_path)
+    manifest['models'].update(bundle_manifest['models'])
+    manifest['updated_at'] = time.strftime('%Y-%m-%d %H:%M:%S')
+    save_manifest(manifest_path, manifest)
+    logger.info(f"已解压 {len(bundle_manifest['models'])} 个模型至: {cache_dir}")
+    return verify_model_files(list(bundle_manifest['models']), cache_dir)
+
+
 def download_model(model_name):
     """
-    下载指定的PaddleOCR模型
+    通过实例化推理管线下载指定的PaddleOCR模型（由PaddleOCR自行下载，无断点续传与校验）
     
     Args:
         model_name (str): 模型名称
@@ -156,6 +514,13 @@ def download_model(model_name):
 
 def main():
     parser = argparse.ArgumentParser(description='下载PaddleOCR模型到指定文件夹')
+    parser.add_argument(
+        '-a', '--action',
+        type=str,
+        choices=['download', 'verify', 'pack', 'unpack'],
+        default='download',
+        help='操作：download（下载）、verify（仅校验）、pack（打包离线归档）、unpack（解压离线归档），默认: download'
+    )
     parser.add_argument(
         '-m', '--models',
         type=str,
@@ -168,6 +533,45 @@ def main():
         default=None,
         help='模型保存目录，默认使用PaddleOCR默认缓存目录'
     )
+    parser.add_argument(
+        '-j', '--jobs',
+        type=int,
+        default=4,
+        help='并发下载数，默认: 4'
+    )
+    parser.add_argument(
+        '--mirror',
+        type=str,
+        default=None,
+        help=f"模型下载地址，默认: 环境变量 OCR_MODEL_MIRROR 或 {DEFAULT_MODEL_MIRROR}"
+    )
+    parser.add_argument(
+        '--manifest',
+        type=str,
+        default=None,
+        help='受信任的校验清单文件，提供时下载后校验归档SHA256'
+    )
+    parser.add_argument(
+        '--bundle',
+        type=str,
+        default=None,
+        help='离线模型归档路径（pack/unpack时必需）'
+    )
+    parser.add_argument(
+        '--quick',
+        action='store_true',
+        help='校验时仅比较文件大小，不计算SHA256'
+    )
+    parser.add_argument(
+        '--force',
+        action='store_true',
+        help='重新下载全部模型（默认跳过已下载且校验通过的模型）'
+    )
+    parser.add_argument(
+        '--via-pipeline',
+        action='store_true',
+        help='通过实例化推理管线下载模型（由PaddleOCR自行下载，无断点续传与校验）'
+    )
     parser.add_argument(
         '-l', '--log-level',
         type=str,
@@ -196,7 +600,7 @@ def main():
             if model not in SUPPORTED_MODELS:
                 logger.error(f"不支持的模型: {model}")
                 logger.info(f"支持的模型: {', '.join(SUPPORTED_MODELS)}")
-                return
+                return 1
     
     # 确定模型保存目录
     cache_dir = args.output
@@ -205,6 +609,42 @@ def main():
     else:
         logger.info(f"使用默认缓存目录")
     
+    if args.action in ['pack', 'unpack'] and not args.bundle:
+        logger.error(f"{args.action} 操作需要通过 --bundle 指定离线模型归档路径")
+        return 1
+    
+    try:
+        if args.action == 'verify':
+            problems = verify_models(models_to_download, cache_dir, quick=args.quick)
+        elif args.action == 'pack':
+            pack_bundle(models_to_download, args.bundle, cache_dir)
+            return 0
+        elif args.action == 'unpack':
+            problems = unpack_bundle(args.bundle, cache_dir)
+        else:
+            problems = None
+    except Exception as e:
+        logger.error(f"{args.action} 操作失败: {str(e)}")
+        return 1
+    
+    if problems is not None:
+        for problem in problems:
+            logger.error(f"模型校验失败: {problem}")
+        if problems:
+            return 1
+        logger.info("模型校验通过")
+        return 0
+    
+    if not args.via_pipeline:
+        pinned_manifest = None
+        if args.manifest:
+            with open(args.manifest, 'r', encoding='utf-8') as f:
+                pinned_manifest = json.load(f)
+        success = prefetch_models(models_to_download, cache_dir, args.mirror, args.jobs, pinned_manifest,
+                                  force=args.force)
+        logger.info(f"模型已保存到: {get_cache_dir(cache_dir)}")
+        return 0 if success else 1
+    
     # 设置自定义缓存目录
     setup_custom_cache(cache_dir)
     
@@ -220,6 +660,7 @@ def main():
         logger.info(f"所有模型已保存到: {os.path.abspath(cache_dir)}")
     else:
         logger.info(f"模型已保存到默认缓存目录")
+    return 0 if success_count == len(models_to_download) else 1
 
 if __name__ == '__main__':
-    main()
+    sys.exit(main())
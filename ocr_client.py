@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------
+# 模块信息
+# ----------------------------------------------------------------------
+# @Time    : 2026-10-19
+# @FileName: ocr_client.py
+# @Version : 1.0.0
+# ----------------------------------------------------------------------
+# 功能描述
+# ----------------------------------------------------------------------
+# 本模块是 api.py 的Python客户端与批量提交工具：
+#   - 连接池与长连接复用（所有请求共享一个 httpx.Client）
+#   - 流式上传（按块读取文件，不把整个文件读入内存）
+#   - 有界并发（同时在途的请求数不超过 --concurrency）
+#   - 失败重试：429/503 时遵循服务端的 Retry-After，其余可重试错误按指数退避
+# 命令行模式将目录、单个PDF或文件列表中的PDF提交到服务，结果保存到本地，
+# 并输出进度与吞吐量统计。
+# ----------------------------------------------------------------------
+# 使用示例
+# ----------------------------------------------------------------------
+# 提交目录中的所有PDF文件：
+#   python ocr_client.py -i ./test_input -o ./test_output --url http://localhost:8000
+#
+# 提交文件列表（每行一个路径），4个并发，输出jsonl：
+#   python ocr_client.py -i files.txt -o ./test_output -c 4 -f jsonl
+#
+# 作为库使用：
+#   from ocr_client import OCRClient
+#   with OCRClient('http://localhost:8000') as client:
+#       response = client.ocr_pdf('a.pdf', output_format='jsonl')
+# ----------------------------------------------------------------------
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import logging
+import threading
+from email.utils import parsedate_to_datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import httpx
+
+# 配置日志级别映射
+LOG_LEVELS = {
+    'debug': logging.DEBUG,
+    'info': logging.INFO,
+    'warning': logging.WARNING,
+    'error': logging.ERROR,
+    'critical': logging.CRITICAL
+}
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,  # 初始默认值，后续会根据命令行参数更新
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[logging.StreamHandler()]
+)
+logger = logging.getLogger(__name__)
+
+# 可重试的HTTP状态码（429/503会遵循Retry-After）
+RETRY_STATUS_CODES = {429, 502, 503, 504}
+
+# 各输出格式对应的结果文件扩展名（与 ocr_pdf.py 一致）
+OUTPUT_EXTENSIONS = {'txt': '.txt', 'jsonl': '.jsonl', 'md': '.md'}
+
+
+class OCRClientError(Exception):
+    """请求失败（不可重试的错误或重试次数用尽）"""
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def parse_retry_after(value):
+    """解析Retry-After响应头（秒数或HTTP日期），无法解析时返回None"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class OCRClient:
+    """
+    PDF OCR API客户端（线程安全，可在多个线程间共享）
+
+    Args:
+        base_url (str): 服务地址，如 http://localhost:8000
+        api_key (str): 客户端标识，以 X-API-Key 请求头发送（服务端按客户端公平调度）
+        max_connections (int): 连接池大小
+        timeout (float): 单次请求的读取超时（秒），识别大文档时应适当调大
+        max_retries (int): 最大重试次数
+        backoff (float): 指数退避的初始等待时间（秒）
+        max_backoff (float): 单次等待时间上限（秒）
+        transport (httpx.BaseTransport): 自定义传输层（如测试中包装的传输层），默认按 max_connections 建立连接池
+    """
+    def __init__(self, base_url, api_key=None, max_connections=8, timeout=600.0,
+                 max_retries=5, backoff=1.0, max_backoff=60.0, transport=None):
+        self.base_url = base_url.rstrip('/')
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        headers = {'X-API-Key': api_key} if api_key else {}
+        self._client = httpx.Client(
+            base_url=self.base_url,
+            headers=headers,
+            timeout=httpx.Timeout(timeout, connect=10.0),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            transport=transport
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """关闭连接池"""
+        self._client.close()
+
+    def _wait_time(self, attempt, response=None):
+        """计算重试前的等待时间：优先使用Retry-After，否则指数退避并加随机抖动"""
+        if response is not None:
+            retry_after = parse_retry_after(response.headers.get('retry-after'))
+            if retry_after is not None:
+                return min(retry_after, self.max_backoff)
+        return min(self.backoff * (2 ** attempt), self.max_backoff) * random.uniform(0.5, 1.0)
+
+    def _request(self, method, url, make_kwargs, description):
+        """
+        发送请求，可重试的错误按策略重试
+
+        Args:
+            make_kwargs (callable): 每次尝试时调用，返回 (请求参数, 需关闭的文件列表)，
+                上传的文件在每次尝试时重新打开，保证重试时从头发送
+
+        Returns:
+            dict: 响应JSON
+        """
+        for attempt in range(self.max_retries + 1):
+            kwargs, files_to_close = make_kwargs()
+            try:
+                response = self._client.request(method, url, **kwargs)
+            except httpx.TransportError as e:
+                if attempt == self.max_retries:
+                    raise OCRClientError(f"{description} 请求失败: {str(e)}")
+                wait = self._wait_time(attempt)
+                logger.warning(f"{description} 连接错误: {str(e)}，{wait:.1f}秒后重试（第{attempt + 1}次）")
+                time.sleep(wait)
+                continue
+            finally:
+                for f in files_to_close:
+                    f.close()
+
+            if response.status_code in RETRY_STATUS_CODES and attempt < self.max_retries:
+                wait = self._wait_time(attempt, response)
+                logger.warning(f"{description} 服务端返回 {response.status_code}，{wait:.1f}秒后重试（第{attempt + 1}次）")
+                time.sleep(wait)
+                continue
+            if response.status_code >= 400:
+                try:
+                    detail = response.json().get('detail')
+                except ValueError:
+                    detail = response.text
+                raise OCRClientError(f"{description} 失败（{response.status_code}）: {detail}", response.status_code)
+            return response.json()
+
+    def health(self):
+        """查询服务健康状态与队列情况"""
+        return self._request('GET', '/health', lambda: ({}, []), '健康检查')
+
+    def ocr_pdf(self, pdf_path, model='pp-ocrv5', output_format='txt', **options):
+        """
+        识别单个PDF文件（文件以流的方式分块上传）
+
+        Args:
+            pdf_path (str): PDF文件路径
+            model (str): OCR模型
+            output_format (str): 输出格式: txt, jsonl, md
+            **options: 其他表单参数，如 grayscale、page_timeout、profile、engine_options
+
+        Returns:
+            dict: 服务端响应（status、filename、model、format、result）
+        """
+        data = {'model': model, 'output_format': output_format}
+        data.update({key: str(value).lower() if isinstance(value, bool) else str(value)
+                     for key, value in options.items() if value is not None})
+
+        def make_kwargs():
+            f = open(pdf_path, 'rb')
+            return {'data': data, 'files': {'file': (os.path.basename(pdf_path), f, 'application/pdf')}}, [f]
+
+        return self._request('POST', '/ocr/pdf', make_kwargs, os.path.basename(pdf_path))
+
+    def query(self, pdf_path, patterns=None, fields=None, model='pp-ocrv5', **options):
+        """
+        在PDF文件中查找关键字或提取字段，服务端找齐所有目标后立即停止识别
+
+        Args:
+            pdf_path (str): PDF文件路径
+            patterns (list): 正则表达式或关键字
+            fields (dict): 字段名 -> 正则表达式
+            model (str): OCR模型
+            **options: 其他表单参数，如 page_order、max_pages、page_timeout
+
+        Returns:
+            dict: 服务端响应（status、filename、model、result）
+        """
+        data = {'model': model, 'patterns': list(patterns or [])}
+        if fields:
+            data['fields'] = json.dumps(fields, ensure_ascii=False)
+        data.update({key: str(value).lower() if isinstance(value, bool) else str(value)
+                     for key, value in options.items() if value is not None})
+
+        def make_kwargs():
+            f = open(pdf_path, 'rb')
+            return {'data': data, 'files': {'file': (os.path.basename(pdf_path), f, 'application/pdf')}}, [f]
+
+        return self._request('POST', '/ocr/query', make_kwargs, os.path.basename(pdf_path))
+
+
+def collect_input_files(input_path):
+    """收集待提交的PDF文件：目录（不递归）、单个PDF或文件列表（每行一个路径）"""
+    if os.path.isdir(input_path):
+        return sorted(os.path.join(input_path, f) for f in os.listdir(input_path) if f.lower().endswith('.pdf'))
+    if input_path.lower().endswith('.pdf'):
+        return [input_path]
+    base_dir = os.path.dirname(os.path.abspath(input_path))
+    with open(input_path, 'r', encoding='utf-8') as f:
+        return [line if os.path.isabs(line) else os.path.join(base_dir, line)
+                for line in (line.strip() for line in f) if line and not line.startswith('#')]
+
+
+def write_result(output_path, output_format, result):
+    """原子写入识别结果（jsonl结果逐页一行）"""
+    tmp_path = output_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        if output_format == 'jsonl':
+            for record in result:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        else:
+            f.write(result)
+    os.replace(tmp_path, output_path)
+
+
+def submit_files(client, pdf_files, output_dir, model='pp-ocrv5', output_format='txt', concurrency=4,
+                 skip_existing=False, **options):
+    """
+    并发提交PDF文件并保存结果
+
+    Returns:
+        dict: 汇总统计
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    stats = {'total': len(pdf_files), 'success': 0, 'partial': 0, 'failed': 0, 'skipped': 0, 'bytes': 0}
+    lock = threading.Lock()
+    finished = [0]
+    start_time = time.time()
+
+    def output_path_for(pdf_path):
+        filename = os.path.splitext(os.path.basename(pdf_path))[0]
+        return os.path.join(output_dir, filename + OUTPUT_EXTENSIONS[output_format])
+
+    def submit(pdf_path):
+        file_start = time.time()
+        response = client.ocr_pdf(pdf_path, model=model, output_format=output_format, **options)
+        write_result(output_path_for(pdf_path), output_format, response['result'])
+        return response['status'], time.time() - file_start
+
+    pending = []
+    for pdf_path in pdf_files:
+        if skip_existing and os.path.exists(output_path_for(pdf_path)):
+            stats['skipped'] += 1
+        else:
+            pending.append(pdf_path)
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        futures = {executor.submit(submit, pdf_path): pdf_path for pdf_path in pending}
+        for future in as_completed(futures):
+            pdf_path = futures[future]
+            name = os.path.basename(pdf_path)
+            try:
+                status, elapsed = future.result()
+                result_text = '成功' if status == 'success' else '部分页面超时'
+            except (OCRClientError, OSError, KeyError, ValueError) as e:
+                status, elapsed = 'failed', None
+                result_text = f"失败: {str(e)}"
+            with lock:
+                stats[status] += 1
+                if status != 'failed':
+                    stats['bytes'] += os.path.getsize(pdf_path)
+                finished[0] += 1
+                elapsed_text = f"，耗时 {elapsed:.2f}秒" if elapsed is not None else ''
+                logger.info(f"[{finished[0]}/{len(pending)}] {name} {result_text}{elapsed_text}")
+
+    stats['elapsed'] = time.time() - start_time
+    return stats
+
+
+def log_summary(stats):
+    """输出批量提交的汇总统计"""
+    elapsed = stats['elapsed']
+    processed = stats['success'] + stats['partial']
+    logger.info("=" * 50)
+    logger.info("批量提交汇总")
+    logger.info(f"文件总数: {stats['total']}")
+    logger.info(f"成功: {stats['success']} 个")
+    logger.info(f"部分页面超时: {stats['partial']} 个")
+    logger.info(f"失败: {stats['failed']} 个")
+    logger.info(f"跳过（结果已存在）: {stats['skipped']} 个")
+    logger.info(f"总耗时: {elapsed:.2f}秒")
+    if elapsed > 0:
+        logger.info(f"吞吐量: {processed / elapsed * 60:.2f} 文件/分钟，{stats['bytes'] / (1024 * 1024) / elapsed:.2f} MB/秒")
+    logger.info("=" * 50)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='PDF OCR API批量提交工具')
+    parser.add_argument('-i', '--input', required=True, help='输入路径（目录、单个PDF文件或每行一个路径的文件列表）')
+    parser.add_argument('-o', '--output', required=True, help='结果保存目录')
+    parser.add_argument('--url', default=os.environ.get('OCR_API_URL', 'http://localhost:8000'),
+                        help='服务地址，默认：环境变量 OCR_API_URL 或 http://localhost:8000')
+    parser.add_argument('--api-key', default=os.environ.get('OCR_API_KEY'),
+                        help='客户端标识（X-API-Key），默认：环境变量 OCR_API_KEY')
+    parser.add_argument('-c', '--concurrency', type=int, default=4, help='并发请求数，默认：4')
+    parser.add_argument('-model', '--model', choices=['paddleocr-vl', 'pp-ocrv5', 'pp-structurev3', 'pp-chatocrv4', 'auto'],
+                        default='pp-ocrv5', help='OCR模型选择，auto为按页路由，默认：pp-ocrv5')
+    parser.add_argument('-f', '--output-format', choices=list(OUTPUT_EXTENSIONS), default='txt',
+                        help='输出格式，默认：txt')
+    parser.add_argument('--grayscale', action='store_true', help='是否使用灰度渲染，默认：False')
+    parser.add_argument('--profile', choices=['fast', 'balanced', 'accurate'], default=None,
+                        help='推理引擎性能档位，默认使用服务端配置')
+    parser.add_argument('--page-timeout', type=float, default=None, help='单页识别时间预算（秒），默认使用服务端配置')
+    parser.add_argument('--doc-timeout', type=float, default=None, help='单个文档识别时间预算（秒），默认使用服务端配置')
+    parser.add_argument('--timeout', type=float, default=600.0, help='单次请求的读取超时（秒），默认：600')
+    parser.add_argument('--retries', type=int, default=5, help='最大重试次数，默认：5')
+    parser.add_argument('--skip-existing', action='store_true', help='跳过结果文件已存在的PDF，默认：False')
+    parser.add_argument('-l', '--log-level', choices=LOG_LEVELS.keys(), default='info',
+                        help='日志输出级别：debug、info、warning、error、critical，默认：info')
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(LOG_LEVELS[args.log_level])
+    # httpx每个请求都会输出info日志，默认只保留警告
+    logging.getLogger('httpx').setLevel(max(LOG_LEVELS[args.log_level], logging.WARNING))
+
+    pdf_files = collect_input_files(args.input)
+    if not pdf_files:
+        logger.error(f"没有找到待提交的PDF文件: {args.input}")
+        return 1
+    logger.info(f"提交 {len(pdf_files)} 个PDF文件到 {args.url}，并发数: {args.concurrency}")
+
+    with OCRClient(args.url, api_key=args.api_key, max_connections=args.concurrency,
+                   timeout=args.timeout, max_retries=args.retries) as client:
+        stats = submit_files(
+            client,
+            pdf_files,
+            args.output,
+            model=args.model,
+            output_format=args.output_format,
+            concurrency=args.concurrency,
+            skip_existing=args.skip_existing,
+            grayscale=args.grayscale or None,
+            profile=args.profile,
+            page_timeout=args.page_timeout,
+            doc_timeout=args.doc_timeout
+        )
+    log_summary(stats)
+    return 0 if stats['failed'] == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
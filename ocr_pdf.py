@@ -37,10 +37,26 @@
 
 # 导入必要的库
 import os
+import re
 import time
+import json
+import math
+import copy
+import hashlib
 import argparse
 import logging
+import logging.handlers
+import atexit
 import sys
+import queue
+import signal
+import socket
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import (ProcessPoolExecutor, Future, wait, FIRST_COMPLETED,
+                                TimeoutError as FutureTimeoutError)
+from concurrent.futures.process import BrokenProcessPool
 from PyPDF2 import PdfReader, PdfWriter
 
 # 配置日志级别映射
@@ -57,19 +73,134 @@ LOG_LEVELS = {
 logs_dir = os.path.join(os.getcwd(), 'logs')
 os.makedirs(logs_dir, exist_ok=True)
 
-# 设置日志文件路径（包含日期信息）
-log_filename = os.path.join(logs_dir, f"ocr_pdf_{time.strftime('%Y-%m-%d')}.log")
+# 日志文件滚动方式：daily（每天零点，默认）或 size（按大小），保留的历史文件数
+log_filename = os.path.join(logs_dir, 'ocr_pdf.log')
+LOG_ROTATE = os.environ.get('OCR_LOG_ROTATE', 'daily').lower()
+LOG_MAX_BYTES = int(float(os.environ.get('OCR_LOG_MAX_MB', '100')) * 1024 * 1024)
+LOG_BACKUP_COUNT = int(os.environ.get('OCR_LOG_BACKUPS', '30'))
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# 文档处理报表（ocr_logs.md）使用独立的日志器，由常驻的文件处理器追加表格行
+REPORT_LOGGER_NAME = 'ocr_report'
+REPORT_HEADER = ('# OCR识别日志\n\n'
+                 '| 日期时间 | 文件名 | 文件大小 | 总页数 | 处理耗时 | 处理结果 | 输出路径 |\n'
+                 '|---------|-------|---------|-------|---------|---------|---------|\n')
+
+
+class MarkdownReportHandler(logging.FileHandler):
+    """将文档处理结果以表格行追加到 ocr_logs.md，文件保持打开，新建文件时写入表头"""
+    def __init__(self, path):
+        super().__init__(path, mode='a', encoding='utf-8', delay=True)
+        self.setFormatter(logging.Formatter('%(message)s'))
+        self.addFilter(lambda record: record.name == REPORT_LOGGER_NAME)
+
+    def _open(self):
+        stream = super()._open()
+        if stream.tell() == 0:
+            stream.write(REPORT_HEADER)
+        return stream
+
+
+def create_log_handlers():
+    """控制台、滚动日志文件与Markdown报表三个处理器（报表记录只写入报表）"""
+    formatter = logging.Formatter(LOG_FORMAT)
+    if LOG_ROTATE == 'size':
+        file_handler = logging.handlers.RotatingFileHandler(
+            log_filename, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding='utf-8', delay=True)
+    else:
+        file_handler = logging.handlers.TimedRotatingFileHandler(
+            log_filename, when='midnight', backupCount=LOG_BACKUP_COUNT, encoding='utf-8', delay=True)
+    handlers = [logging.StreamHandler(), file_handler]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+        handler.addFilter(lambda record: record.name != REPORT_LOGGER_NAME)
+    handlers.append(MarkdownReportHandler(os.path.join(os.getcwd(), 'ocr_logs.md')))
+    return handlers
+
+
+def setup_logging(log_queue=None, level=logging.INFO):
+    """
+    配置根日志器：记录只放入队列，格式化与控制台、磁盘写入都在后台线程中完成
+    
+    Args:
+        log_queue: 子进程传入父进程的日志队列（见 get_worker_log_config），记录发回父进程统一写入
+        level: 日志级别
+    
+    Returns:
+        QueueListener: 主进程的后台写入线程；子进程返回None
+    """
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.setLevel(level)
+    if log_queue is not None:
+        root.addHandler(logging.handlers.QueueHandler(log_queue))
+        return None
+    if multiprocessing.parent_process() is not None:
+        # 未接入父进程日志队列的子进程只输出到控制台，避免多个进程同时滚动同一个日志文件
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        handler.addFilter(lambda record: record.name != REPORT_LOGGER_NAME)
+        root.addHandler(handler)
+        return None
+    local_queue = queue.SimpleQueue()
+    root.addHandler(logging.handlers.QueueHandler(local_queue))
+    listener = logging.handlers.QueueListener(local_queue, *create_log_handlers(), respect_handler_level=True)
+    listener.start()
+    # 退出时写完队列中剩余的记录
+    atexit.register(stop_log_listeners)
+    return listener
+
+
+def stop_log_listeners():
+    """
+    停止日志后台写入线程并写完队列中剩余的记录（服务停止或进程退出时调用，可重复调用）
+
+    之后的记录由根日志器的处理器直接写入。
+    """
+    global _log_listener, _worker_log_listener, _worker_log_queue
+    if _worker_log_listener is not None:
+        _worker_log_listener.stop()
+        _worker_log_listener = None
+        _worker_log_queue = None
+    if _log_listener is not None:
+        listener, _log_listener = _log_listener, None
+        listener.stop()
+        root = logging.getLogger()
+        for handler in root.handlers[:]:
+            if isinstance(handler, logging.handlers.QueueHandler):
+                root.removeHandler(handler)
+        for handler in listener.handlers:
+            root.addHandler(handler)
+
+
+_log_listener = setup_logging()
+_worker_log_listener = None
+_worker_log_queue = None
+
+
+def get_worker_log_config():
+    """
+    子进程的日志配置：首次调用时创建跨进程队列，由父进程的后台线程写入同一组处理器
+    
+    Returns:
+        tuple: (日志队列, 日志级别)，作为 setup_logging 的参数在子进程中调用
+    """
+    global _worker_log_listener, _worker_log_queue
+    if _log_listener is None:
+        return None, logging.getLogger().level
+    if _worker_log_queue is None:
+        _worker_log_queue = multiprocessing.get_context('spawn').Queue()
+        _worker_log_listener = logging.handlers.QueueListener(_worker_log_queue, *_log_listener.handlers,
+                                                              respect_handler_level=True)
+        _worker_log_listener.start()
+    return _worker_log_queue, logging.getLogger().level
+
 
-# 配置日志同时输出到控制台和文件
-logging.basicConfig(
-    level=logging.INFO,  # 初始默认值，后续会根据命令行参数更新
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(),  # 控制台输出
-        logging.FileHandler(log_filename, encoding='utf-8')  # 文件输出
-    ]
-)
 logger = logging.getLogger(__name__)
+report_logger = logging.getLogger(REPORT_LOGGER_NAME)
+# 报表不受命令行日志级别影响，每个文档都会记录
+report_logger.setLevel(logging.INFO)
 
 # 创建自定义的paddlex.utils.cache模块
 class CustomCacheModule:
@@ -115,50 +246,2008 @@ sys.modules['paddlex.utils.cache'] = custom_cache_module
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 import pypdfium2 as pdfium
+import pypdfium2.raw as pdfium_c
 import cv2
 import numpy as np
-from paddleocr import PaddleOCR, PPStructureV3, PaddleOCRVL
+from search_index import SearchIndex, DEFAULT_INDEX_FILENAME
+
+class PageJournal:
+    """
+    单个文档的逐页进度日志（JSON Lines），用于进程崩溃后的断点续跑
+
+    第一行为文档头（源文件路径、大小、修改时间、总页数、模型与影响识别结果的处理选项），之后每完成一页追加一行页面记录。
+    文档头与本次处理不一致（源文件或处理选项已变化）时丢弃旧日志，避免不同设置识别的页面混入同一结果。
+    每次追加后立即flush并fsync，进程被OOM终止或断电时最多丢失正在处理的那一页。
+    """
+    def __init__(self, journal_path, fsync=True):
+        self.journal_path = journal_path
+        self.fsync = fsync
+        self._file = None
+        self._reader = None
+        # 已完成页面在日志中的偏移量，续跑时按需读取，不把整份文档读入内存
+        self._offsets = {}
+        self._valid_end = 0
+
+    @staticmethod
+    def path_for(output_dir, filename):
+        """返回文档对应的进度日志路径"""
+        return os.path.join(output_dir, f".{filename}.journal")
+
+    def load(self, header):
+        """
+        读取已完成的页面
+
+        Args:
+            header (dict): 当前文档头，与日志中的文档头不一致时（源文件或处理选项已变化）丢弃旧日志
+
+        Returns:
+            set: 已完成的页码集合（从1开始）
+        """
+        self._offsets = {}
+        if not os.path.exists(self.journal_path):
+            return set()
+        try:
+            with open(self.journal_path, 'rb') as f:
+                first_line = f.readline()
+                if not first_line.endswith(b'\n') or json.loads(first_line) != header:
+                    logger.info(f"源文件或处理选项已变化，或进度日志不完整，重新处理: {self.journal_path}")
+                    self.remove()
+                    return set()
+                while True:
+                    offset = f.tell()
+                    line = f.readline()
+                    # 最后一行可能因崩溃而写了一半，直接忽略
+                    if not line.endswith(b'\n'):
+                        break
+                    self._offsets[json.loads(line)['page']] = offset
+                self._valid_end = offset
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"进度日志损坏，重新处理: {self.journal_path}，错误: {str(e)}")
+            self.remove()
+            return set()
+        return set(self._offsets)
+
+    def open(self, header):
+        """打开日志用于追加，新日志先写入文档头"""
+        is_new = not os.path.exists(self.journal_path)
+        if not is_new:
+            # 截掉崩溃时写了一半的末行，保证后续追加的记录独占一行
+            with open(self.journal_path, 'rb+') as f:
+                f.truncate(self._valid_end)
+        self._file = open(self.journal_path, 'a', encoding='utf-8')
+        if is_new:
+            self._write_line(header)
+
+    def append(self, record):
+        """追加一页识别结果"""
+        self._write_line(record)
+
+    def read_page(self, page):
+        """读取此前已完成的某一页记录"""
+        if self._reader is None:
+            self._reader = open(self.journal_path, 'rb')
+        self._reader.seek(self._offsets[page])
+        return json.loads(self._reader.readline())
+
+    def _write_line(self, obj):
+        self._file.write(json.dumps(obj, ensure_ascii=False) + '\n')
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+
+    def remove(self):
+        self.close()
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+
+
+def find_unfinished_documents(input_dir, output_dir):
+    """查找输入目录中存在未完成进度日志的PDF文件（用于守护模式启动时的积压扫描）"""
+    unfinished = []
+    if not os.path.isdir(output_dir):
+        return unfinished
+    for f in os.listdir(input_dir):
+        if not f.lower().endswith('.pdf'):
+            continue
+        filename = os.path.splitext(f)[0]
+        if os.path.exists(PageJournal.path_for(output_dir, filename)):
+            unfinished.append(os.path.join(input_dir, f))
+    return unfinished
+
+
+# 识别超时页面在文本与Markdown结果中的标记
+TIMEOUT_MARKER = '[识别超时，已跳过]'
+
+# process_pdf 的返回值：部分页面识别超时，结果文件已保存（超时页带标记），进度日志保留供再次处理时只重试超时页面
+PROCESS_PARTIAL = 'partial'
+
+
+class OCRResultWriter:
+    """
+    识别结果写入器基类
+
+    每完成一页即追加写入临时文件，文档全部完成后再原子替换为最终结果，
+    下游既不会读到写了一半的文件，也不需要把整份文档保存在内存中。
+    """
+    extension = '.txt'
+
+    def __init__(self, output_path):
+        self.output_path = output_path
+        self.tmp_path = output_path + '.tmp'
+        self._file = None
+
+    def open(self):
+        self._file = open(self.tmp_path, 'w', encoding='utf-8')
+
+    def write_page(self, record):
+        """追加一页识别结果"""
+        self._write_record(record)
+        self._file.flush()
+
+    def _write_record(self, record):
+        raise NotImplementedError
+
+    def commit(self):
+        """完成写入并原子替换为最终结果文件"""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        self._file = None
+        os.replace(self.tmp_path, self.output_path)
+
+    def abort(self):
+        """放弃写入并清理临时文件（已提交时不做任何操作）"""
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+class TextResultWriter(OCRResultWriter):
+    """纯文本格式：每页以 `=== 第 X 页 ===` 分隔"""
+    extension = '.txt'
+
+    def open(self):
+        super().open()
+        self._first_line = True
+
+    def _write_record(self, record):
+        lines = record['lines']
+        if record.get('status') == 'timeout':
+            lines = [TIMEOUT_MARKER]
+        for line in [f"=== 第 {record['page']} 页 ==="] + lines:
+            if not self._first_line:
+                self._file.write('\n')
+            self._file.write(line)
+            self._first_line = False
+
+
+class JsonlResultWriter(OCRResultWriter):
+    """JSON Lines格式：每页一行，包含页面尺寸、文本行、文本框多边形与置信度（超时页带 status 字段）"""
+    extension = '.jsonl'
+
+    def _write_record(self, record):
+        self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+
+class MarkdownResultWriter(OCRResultWriter):
+    """Markdown格式：结构化模型输出原样保留，其他模型按行输出"""
+    extension = '.md'
+
+    def _write_record(self, record):
+        route = f"（{record['route']['model']}）" if record.get('route') else ''
+        self._file.write(f"<!-- 第 {record['page']} 页{route} -->\n\n")
+        if record.get('status') == 'timeout':
+            content = TIMEOUT_MARKER
+        else:
+            content = record.get('markdown') or '\n\n'.join(record['lines'])
+        self._file.write(content.rstrip('\n') + '\n\n')
+
+
+# 支持的输出格式
+OUTPUT_FORMATS = {
+    'txt': TextResultWriter,
+    'jsonl': JsonlResultWriter,
+    'md': MarkdownResultWriter
+}
+
+
+# 影响识别结果的处理选项及其默认值，写入输出清单用于判断结果是否需要重新生成
+OUTPUT_OPTION_DEFAULTS = {
+    'optimize_pdf': False,
+    'optimize_level': 'medium',
+    'grayscale': False,
+    'output_format': 'txt',
+    'render_scale': 1.0,
+    'tile_mode': False,
+    'tile_size': 2000,
+    'tile_overlap': 200,
+    'adaptive_mode': False,
+    'adaptive_threshold': 0.85,
+    'adaptive_scale': 3.0
+}
+
+def get_output_options(model, handler_options):
+    """提取影响识别结果的模型与处理选项"""
+    options = {'model': model}
+    for key, default in OUTPUT_OPTION_DEFAULTS.items():
+        options[key] = handler_options.get(key, default)
+    # 只记录会改变识别结果的引擎选项，默认档位下不记录，保持与已有清单兼容
+    engine_options = resolve_engine_options(handler_options.get('profile'), handler_options.get('engine_options'), model)
+    engine_options = {key: value for key, value in engine_options.items() if key not in ENGINE_PERFORMANCE_OPTIONS}
+    if engine_options:
+        options['engine_options'] = engine_options
+    # 扫描页直接解码内嵌图像与空白边距裁剪默认开启，关闭时才记录，保持与已有清单兼容
+    for key in ('direct_image', 'crop_margins'):
+        if not handler_options.get(key, True):
+            options[key] = False
+    return options
+
+def get_output_path(output_dir, pdf_path, output_format='txt'):
+    """返回PDF文件对应的识别结果路径"""
+    filename = os.path.splitext(os.path.basename(pdf_path))[0]
+    return os.path.join(output_dir, f"{filename}{OUTPUT_FORMATS[output_format].extension}")
+
+def compute_file_hash(file_path, chunk_size=1024 * 1024):
+    """分块计算文件的SHA-256，避免大文件整体读入内存"""
+    sha256 = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+class OutputManifest:
+    """
+    输出清单：记录每个识别结果对应的源文件（路径、大小、修改时间、内容哈希）与模型、处理选项
+
+    再次批量处理时，源文件大小与修改时间未变即可跳过，只需一次stat；
+    仅当修改时间变化而大小不变时才重新计算哈希，内容未变则同样跳过。
+    """
+    def __init__(self, output_dir, save_interval=5.0):
+        self.manifest_path = os.path.join(output_dir, '.ocr_manifest.json')
+        self.save_interval = save_interval
+        self.entries = {}
+        self._dirty = False
+        self._last_save = time.time()
+        if os.path.exists(self.manifest_path):
+            try:
+                with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f).get('entries', {})
+            except (OSError, ValueError) as e:
+                logger.warning(f"输出清单损坏，将重新生成: {self.manifest_path}，错误: {str(e)}")
+                self.entries = {}
+
+    def is_up_to_date(self, pdf_path, output_path, options):
+        """判断源文件的识别结果是否已是最新"""
+        entry = self.entries.get(os.path.abspath(pdf_path))
+        if not entry or entry['options'] != options or entry['output'] != os.path.abspath(output_path):
+            return False
+        if not os.path.exists(output_path):
+            return False
+        stat = os.stat(pdf_path)
+        if stat.st_size != entry['size']:
+            return False
+        if stat.st_mtime == entry['mtime']:
+            return True
+        # 修改时间变化（如重新复制）但内容可能未变，用哈希确认
+        if compute_file_hash(pdf_path) == entry['sha256']:
+            entry['mtime'] = stat.st_mtime
+            self._dirty = True
+            return True
+        return False
+
+    def record(self, pdf_path, output_path, options):
+        """记录一次成功的识别结果"""
+        stat = os.stat(pdf_path)
+        self.entries[os.path.abspath(pdf_path)] = {
+            'size': stat.st_size,
+            'mtime': stat.st_mtime,
+            'sha256': compute_file_hash(pdf_path),
+            'options': options,
+            'output': os.path.abspath(output_path),
+            'updated_at': time.strftime('%Y-%m-%d %H:%M:%S')
+        }
+        self._dirty = True
+        if time.time() - self._last_save >= self.save_interval:
+            self.save()
+
+    def save(self):
+        """写入清单（先写临时文件再原子替换）"""
+        if not self._dirty:
+            return
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': 1, 'entries': self.entries}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.manifest_path)
+        self._dirty = False
+        self._last_save = time.time()
+
+
+class PageBufferPool:
+    """
+    页面图像缓冲池
+
+    预分配的一维uint8缓冲区在各页之间复用，颜色转换与缩放直接写入缓冲区的视图，
+    避免每页重复分配大块内存造成堆碎片。取出时选用容量足够的最小空闲缓冲区，
+    空闲缓冲区超过 max_free 个时丢弃最久未用的一个。
+    """
+    def __init__(self, max_free=6):
+        self.max_free = max_free
+        self._free = []
+        self._in_use = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, shape):
+        """取出一个指定形状的uint8数组（内容未初始化）"""
+        size = int(np.prod(shape))
+        with self._lock:
+            candidates = [index for index, buffer in enumerate(self._free) if buffer.size >= size]
+            if candidates:
+                # 按下标取出：list.remove 会逐元素比较数组，空闲缓冲区多于一个时出错
+                buffer = self._free.pop(min(candidates, key=lambda index: self._free[index].size))
+            else:
+                buffer = np.empty(size, dtype=np.uint8)
+            view = buffer[:size].reshape(shape)
+            self._in_use[id(view)] = buffer
+        return view
+
+    def release(self, view):
+        """归还 acquire 取出的数组，非缓冲池数组直接忽略"""
+        with self._lock:
+            buffer = self._in_use.pop(id(view), None)
+            if buffer is None:
+                return
+            self._free.append(buffer)
+            if len(self._free) > self.max_free:
+                self._free.pop(0)
+
+    def discard(self, view):
+        """放弃归还一个仍可能被他处使用的数组，之后对它的 release 不再生效"""
+        with self._lock:
+            self._in_use.pop(id(view), None)
+
+    def clear(self):
+        """丢弃所有空闲缓冲区"""
+        with self._lock:
+            self._free.clear()
+
+
+# pypdfium2位图模式到OpenCV BGR的转换（None表示已是BGR，直接复制）
+BITMAP_CONVERSIONS = {
+    'BGR': None,
+    'BGRA': cv2.COLOR_BGRA2BGR,
+    'BGRX': cv2.COLOR_BGRA2BGR,
+    'RGB': cv2.COLOR_RGB2BGR,
+    'RGBA': cv2.COLOR_RGBA2BGR,
+    'RGBX': cv2.COLOR_RGBA2BGR,
+    'L': cv2.COLOR_GRAY2BGR
+}
+
+
+def bitmap_to_bgr(bitmap, pool):
+    """按位图模式转换为三通道BGR图像，结果写入缓冲池数组"""
+    if bitmap.mode not in BITMAP_CONVERSIONS:
+        raise ValueError(f"不支持的位图模式: {bitmap.mode}")
+    # to_numpy 返回位图内存的视图，不产生复制
+    src = bitmap.to_numpy()
+    dst = pool.acquire((src.shape[0], src.shape[1], 3))
+    code = BITMAP_CONVERSIONS[bitmap.mode]
+    if code is None:
+        np.copyto(dst, src)
+    else:
+        cv2.cvtColor(src, code, dst=dst)
+    return dst
+
+
+def find_page_image(page, coverage_tolerance=0.02):
+    """
+    检测只包含一张覆盖整个裁剪框的图像的页面（扫描件）
+    
+    页面中有文字、矢量图形、表单对象或多张图像，图像未覆盖整页，或图像矩阵含斜切时返回None，
+    由调用方回退到整页渲染。
+    
+    Returns:
+        tuple: (图像对象, 图像矩阵系数 (a, b, c, d, e, f))，不满足条件时返回None
+    """
+    image = None
+    for obj in page.get_objects(max_depth=1):
+        if obj.type != pdfium_c.FPDF_PAGEOBJ_IMAGE or image is not None:
+            return None
+        image = obj
+    if image is None:
+        return None
+    a, b, c, d, e, f = image.get_matrix().get()
+    epsilon = 1e-6
+    axis_aligned = abs(b) < epsilon and abs(c) < epsilon and abs(a) > epsilon and abs(d) > epsilon
+    quarter_turned = abs(a) < epsilon and abs(d) < epsilon and abs(b) > epsilon and abs(c) > epsilon
+    if not (axis_aligned or quarter_turned):
+        return None
+    # pypdfium2 v5 起 get_pos 更名为 get_bounds
+    left, bottom, right, top = (image.get_bounds() if hasattr(image, 'get_bounds') else image.get_pos())
+    crop_left, crop_bottom, crop_right, crop_top = page.get_cropbox()
+    tolerance = coverage_tolerance * max(crop_right - crop_left, crop_top - crop_bottom)
+    if (left > crop_left + tolerance or bottom > crop_bottom + tolerance
+            or right < crop_right - tolerance or top < crop_top - tolerance):
+        return None
+    return image, (a, b, c, d, e, f)
+
+
+def decode_page_image(page, pool, grayscale=False):
+    """
+    以原始分辨率直接解码扫描页的内嵌图像，按图像矩阵、页面旋转与裁剪框转换为页面显示方向
+    
+    不经过pdfium光栅化，也没有渲染缩放带来的重采样；结果写入缓冲池数组，用完后需归还。
+    
+    Returns:
+        numpy.ndarray: BGR图像，页面不是单图像扫描页或图像无法解码时返回None
+    """
+    found = find_page_image(page)
+    if found is None:
+        return None
+    image, (a, b, c, d, e, f) = found
+    try:
+        bitmap = image.get_bitmap(render=False)
+    except pdfium.PdfiumError:
+        return None
+    # 解码得到的位图由pdfium分配，显式关闭会触发pypdfium2的警告，复制到缓冲池后交由其回收
+    if bitmap.mode not in BITMAP_CONVERSIONS:
+        return None
+    decoded = bitmap_to_bgr(bitmap, pool)
+    gray_source = bitmap.mode == 'L'
+    del bitmap
+    if grayscale and not gray_source:
+        gray = cv2.cvtColor(decoded, cv2.COLOR_BGR2GRAY)
+        cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR, dst=decoded)
+    
+    # 裁剪框映射到图像像素坐标：图像矩阵把单位正方形映射到页面，像素第0行位于单位正方形顶部
+    height, width = decoded.shape[:2]
+    det = a * d - b * c
+    cols, rows = [], []
+    crop_left, crop_bottom, crop_right, crop_top = page.get_cropbox()
+    for x, y in ((crop_left, crop_bottom), (crop_left, crop_top), (crop_right, crop_bottom), (crop_right, crop_top)):
+        u = (d * (x - e) - c * (y - f)) / det
+        v = (a * (y - f) - b * (x - e)) / det
+        cols.append(u * width)
+        rows.append((1 - v) * height)
+    col0, col1 = max(0, int(round(min(cols)))), min(width, int(round(max(cols))))
+    row0, row1 = max(0, int(round(min(rows)))), min(height, int(round(max(rows))))
+    if col1 - col0 < 1 or row1 - row0 < 1:
+        pool.release(decoded)
+        return None
+    view = decoded[row0:row1, col0:col1]
+    
+    # 像素列、行的前进方向在显示坐标（x向右、y向下）中的方向，再按页面旋转（顺时针）转动
+    col_step = (int(np.sign(a)), -int(np.sign(b)))
+    row_step = (-int(np.sign(c)), int(np.sign(d)))
+    for _ in range(page.get_rotation() // 90 % 4):
+        col_step = (-col_step[1], col_step[0])
+        row_step = (-row_step[1], row_step[0])
+    if col_step[0] != 0:
+        flip_cols, flip_rows = col_step[0] < 0, row_step[1] < 0
+    else:
+        # 图像列对应页面纵向：转置后原来的行成为列
+        view = view.transpose(1, 0, 2)
+        flip_cols, flip_rows = row_step[0] < 0, col_step[1] < 0
+    if flip_cols:
+        view = view[:, ::-1]
+    if flip_rows:
+        view = view[::-1]
+    if view.shape == decoded.shape and view.strides == decoded.strides:
+        return decoded
+    oriented = pool.acquire(view.shape)
+    np.copyto(oriented, view)
+    pool.release(decoded)
+    return oriented
+
+
+# 空白边距裁剪：灰度低于阈值的像素计为墨迹；裁剪后四周保留的留白（占长边的比例，不少于最小像素数）；
+# 裁掉的面积不足整页的该比例时不裁剪，省去一次复制
+CROP_INK_THRESHOLD = 200
+CROP_PADDING_RATIO = 0.01
+CROP_MIN_PADDING = 8
+CROP_MIN_GAIN = 0.1
+
+
+def find_content_bbox(image, ink_threshold=CROP_INK_THRESHOLD, padding_ratio=CROP_PADDING_RATIO,
+                      min_padding=CROP_MIN_PADDING, min_gain=CROP_MIN_GAIN):
+    """
+    检测页面图像中有墨迹的区域，用于裁掉扫描页的空白边距
+    
+    二值化后用 cv2.reduce 按行、列统计墨迹像素数（整页只扫描两遍，比逐像素的numpy归约快一个数量级），
+    墨迹像素少于行（列）长度千分之二的行列视为噪点，不计入内容区域。
+    
+    Returns:
+        tuple: 加上留白后的内容区域 (x0, y0, x1, y1)，空白页或可裁剪面积过小时返回None
+    """
+    height, width = image.shape[:2]
+    gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    _, ink = cv2.threshold(gray, ink_threshold - 1, 1, cv2.THRESH_BINARY_INV)
+    row_counts = cv2.reduce(ink, 1, cv2.REDUCE_SUM, dtype=cv2.CV_32S).ravel()
+    col_counts = cv2.reduce(ink, 0, cv2.REDUCE_SUM, dtype=cv2.CV_32S).ravel()
+    rows = np.flatnonzero(row_counts >= max(2, width // 500))
+    cols = np.flatnonzero(col_counts >= max(2, height // 500))
+    if rows.size == 0 or cols.size == 0:
+        return None
+    padding = max(min_padding, int(max(height, width) * padding_ratio))
+    x0, x1 = max(0, cols[0] - padding), min(width, cols[-1] + 1 + padding)
+    y0, y1 = max(0, rows[0] - padding), min(height, rows[-1] + 1 + padding)
+    if (x1 - x0) * (y1 - y0) > (1 - min_gain) * width * height:
+        return None
+    return int(x0), int(y0), int(x1), int(y1)
+
+
+# 各模型识别单页时的内存开销估算：送入模型的每个像素的工作内存（字节）与每页固定开销（字节）
+# 为偏保守的经验值，可按实际测量的峰值内存调整
+MODEL_MEMORY_PROFILES = {
+    'pp-ocrv5': {'bytes_per_pixel': 48, 'page_overhead': 64 * 1024 * 1024},
+    'pp-structurev3': {'bytes_per_pixel': 160, 'page_overhead': 256 * 1024 * 1024},
+    'paddleocr-vl': {'bytes_per_pixel': 320, 'page_overhead': 1024 * 1024 * 1024}
+}
+
+# 整页识别时送入模型的像素上限（与 _process_page 的缩放规则一致）
+MAX_INFER_PIXELS = 2000 * 2000
+
+
+def estimate_page_memory(width_pt, height_pt, model='pp-ocrv5', render_scale=1.0, grayscale=False,
+                         tile_mode=False, tile_size=2000, tile_batch_size=4):
+    """
+    按页面尺寸估算识别单页的峰值内存（字节）
+
+    渲染位图（灰度1通道/彩色3通道）与BGR图像按渲染像素计，缩放后的识别图像与模型工作内存
+    按送入模型的像素计（整页不超过像素上限；分块模式为一批分块），再加每页固定开销。
+    """
+    profile = MODEL_MEMORY_PROFILES.get(model, MODEL_MEMORY_PROFILES['pp-structurev3'])
+    channels = 1 if grayscale else 3
+    pixels = math.ceil(width_pt * render_scale) * math.ceil(height_pt * render_scale)
+    if tile_mode and model == 'pp-ocrv5' and pixels > tile_size * tile_size:
+        # 分块模式逐块渲染，同时驻留的只有一批分块
+        tile_pixels = tile_batch_size * tile_size * tile_size
+        return tile_pixels * (channels + 3 + 3 + profile['bytes_per_pixel']) + profile['page_overhead']
+    infer_pixels = min(pixels, MAX_INFER_PIXELS)
+    return pixels * (channels + 3) + infer_pixels * (3 + profile['bytes_per_pixel']) + profile['page_overhead']
+
+
+def estimate_document_memory(pdf, model='pp-ocrv5', **options):
+    """
+    估算识别文档的峰值内存（字节），即最大一页的估算值
+
+    Args:
+        pdf (pdfium.PdfDocument): 已打开的PDF文档（只读取页面尺寸，不加载页面）
+        **options: 传给 estimate_page_memory 的渲染与分块参数
+    """
+    return max((estimate_page_memory(*pdf.get_page_size(index), model=model, **options)
+                for index in range(len(pdf))), default=0)
+
+
+def estimate_pdf_file_memory(pdf_path, model, handler_options):
+    """按处理选项中的渲染与分块参数估算PDF文件的峰值内存（字节），文件无法解析时返回0"""
+    try:
+        pdf = pdfium.PdfDocument(pdf_path)
+    except Exception as e:
+        logger.warning(f"无法读取页面尺寸，跳过内存估算: {pdf_path}，错误: {str(e)}")
+        return 0
+    try:
+        return estimate_document_memory(
+            pdf, model,
+            render_scale=handler_options.get('render_scale', 1.0),
+            grayscale=handler_options.get('grayscale', False),
+            tile_mode=handler_options.get('tile_mode', False),
+            tile_size=handler_options.get('tile_size', 2000),
+            tile_batch_size=handler_options.get('tile_batch_size', 4)
+        )
+    finally:
+        pdf.close()
+
+
+class MemoryBudget:
+    """
+    进程内的全局内存预算
+
+    识别页面（或启动作业）前按估算值申请额度，在途总量超出预算时等待其他页面完成。
+    单独一页就超出预算时，等到没有其他在途页面后单独处理，不会永久阻塞。
+    """
+    def __init__(self, limit_bytes):
+        self.limit = int(limit_bytes)
+        self._in_use = 0
+        self._cond = threading.Condition()
+
+    def fits(self, nbytes):
+        """当前是否有足够的额度（不申请）"""
+        with self._cond:
+            return self._in_use == 0 or self._in_use + nbytes <= self.limit
+
+    def acquire(self, nbytes):
+        """申请额度，额度不足时阻塞等待，返回实际占用的额度（释放时传回）"""
+        nbytes = min(int(nbytes), self.limit)
+        with self._cond:
+            while self._in_use and self._in_use + nbytes > self.limit:
+                self._cond.wait()
+            self._in_use += nbytes
+        return nbytes
+
+    def release(self, nbytes):
+        """释放额度"""
+        with self._cond:
+            self._in_use -= nbytes
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {'limit_mb': round(self.limit / (1024 * 1024)), 'in_use_mb': round(self._in_use / (1024 * 1024))}
+
+
+class PageDedupIndex:
+    """
+    重复页面索引
+
+    以渲染图像的感知哈希（32x32灰度图DCT低频8x8系数相对中位数的64位签名）索引已识别页面的结果。
+    汉明距离不超过 threshold 的候选页面，还需尺寸一致且缩略图逐像素差不超过 max_pixel_diff 才视为重复，
+    避免只有少量字段不同的表单被误判。索引按最近使用保留至多 max_entries 个页面。
+    """
+    def __init__(self, threshold=4, max_entries=1000, thumbnail_size=128, max_pixel_diff=40):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.thumbnail_size = thumbnail_size
+        self.max_pixel_diff = max_pixel_diff
+        self._entries = OrderedDict()
+        self._next_key = 0
+
+    def fingerprint(self, image):
+        """计算图像的感知哈希与用于校验的灰度缩略图"""
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        small = cv2.resize(gray, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+        low = cv2.dct(small)[:8, :8].flatten()
+        # 直流分量只反映整体亮度，不参与比较
+        bits = low[1:] > np.median(low[1:])
+        page_hash = int(np.packbits(np.concatenate([[False], bits])).view('>u8')[0])
+        height, width = gray.shape
+        scale = self.thumbnail_size / max(height, width)
+        thumbnail = cv2.resize(gray, (max(1, round(width * scale)), max(1, round(height * scale))),
+                               interpolation=cv2.INTER_AREA)
+        return page_hash, thumbnail
+
+    def lookup(self, page_hash, thumbnail, shape):
+        """查找与给定页面近似重复的已识别页面，返回索引条目或None"""
+        if not self._entries:
+            return None
+        keys = list(self._entries)
+        hashes = np.array([self._entries[key]['hash'] for key in keys], dtype=np.uint64)
+        distances = np.unpackbits((hashes ^ np.uint64(page_hash)).view(np.uint8)).reshape(len(keys), 64).sum(axis=1)
+        for idx in np.argsort(distances, kind='stable'):
+            if distances[idx] > self.threshold:
+                break
+            entry = self._entries[keys[idx]]
+            if entry['shape'] != shape:
+                continue
+            diff = cv2.absdiff(entry['thumbnail'], thumbnail)
+            if int(diff.max()) <= self.max_pixel_diff:
+                self._entries.move_to_end(keys[idx])
+                return entry
+        return None
+
+    def add(self, page_hash, thumbnail, shape, record, source):
+        """记录一个已识别页面的结果"""
+        self._entries[self._next_key] = {
+            'hash': page_hash,
+            'thumbnail': thumbnail,
+            'shape': shape,
+            'record': copy.deepcopy(record),
+            'source': source
+        }
+        self._next_key += 1
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+# 渲染缓存格式版本：预处理流程变化导致缓存图像不再适用时递增
+RENDER_CACHE_VERSION = 1
+
+
+class RenderCache:
+    """
+    预处理页面图像的磁盘缓存
+
+    以 .npy 文件保存送入模型前的页面图像（渲染或解码、裁剪与缩放之后），按文档标识、页码与渲染参数寻址，
+    命中时以内存映射只读打开（调用方复制后再使用），不重新渲染；同名 .json 记录把文本框映射回页面坐标所需的尺寸与偏移。
+    文档默认按路径、大小与修改时间标识，只需一次stat；content_hash 为True时按内容哈希标识（文件移动或
+    重新上传后仍可命中），同一文件只计算一次，已知哈希的调用方（如边接收边计算的上传）可通过
+    remember_content_hash 直接登记。
+    缓存总大小超过 max_bytes 时按最近使用时间（命中时更新文件修改时间）淘汰最旧的页面，直到不超过上限的九成。
+    多个进程可共用同一缓存目录：写入先写临时文件再原子替换，被淘汰的文件在已映射的进程中仍可读取。
+    """
+    def __init__(self, cache_dir, max_bytes, content_hash=False, max_documents=1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.content_hash = content_hash
+        self.max_documents = max_documents
+        self.hits = 0
+        self.misses = 0
+        # 缓存目录的总大小在第一次写入时才统计（大缓存目录的遍历较慢）
+        self._size = None
+        # 遍历目录与淘汰在锁外进行，期间其他线程写入的大小先累计，结束后计入总大小
+        self._evicting = False
+        self._pending_bytes = 0
+        # (绝对路径, 大小, 修改时间) -> 文档标识，按最近使用保留 max_documents 个
+        self._document_keys = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def _file_identity(pdf_path):
+        """源文件的路径、大小与修改时间（纳秒）"""
+        stat = os.stat(pdf_path)
+        return os.path.abspath(pdf_path), stat.st_size, stat.st_mtime_ns
+
+    def _remember_document_key(self, identity, key):
+        with self._lock:
+            self._document_keys[identity] = key
+            self._document_keys.move_to_end(identity)
+            while len(self._document_keys) > self.max_documents:
+                self._document_keys.popitem(last=False)
+
+    def remember_content_hash(self, pdf_path, content_hash):
+        """登记调用方已算出的文件内容哈希，之后 document_key 不再重复读取文件"""
+        self._remember_document_key(self._file_identity(pdf_path), content_hash)
+
+    def document_key(self, pdf_path):
+        """返回文档在缓存中的标识（十六进制字符串）"""
+        identity = self._file_identity(pdf_path)
+        with self._lock:
+            key = self._document_keys.get(identity)
+            if key is not None:
+                self._document_keys.move_to_end(identity)
+                return key
+        if self.content_hash:
+            key = compute_file_hash(pdf_path)
+        else:
+            key = hashlib.sha256(json.dumps(identity).encode('utf-8')).hexdigest()
+        self._remember_document_key(identity, key)
+        return key
+
+    @staticmethod
+    def params_key(**params):
+        """由渲染参数生成缓存键的一部分，参数任一变化都不会命中旧的缓存"""
+        params['version'] = RENDER_CACHE_VERSION
+        return hashlib.sha256(json.dumps(params, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+    def _paths(self, doc_hash, page_num, params_key):
+        """返回页面缓存所在目录、图像路径与元数据路径（按文档哈希前两位分桶）"""
+        directory = os.path.join(self.cache_dir, doc_hash[:2], doc_hash)
+        base = os.path.join(directory, f"p{page_num + 1:05d}_{params_key}")
+        return directory, base + '.npy', base + '.json'
+
+    def load(self, doc_hash, page_num, params_key):
+        """
+        读取缓存的页面图像
+
+        Returns:
+            tuple: (只读内存映射的图像, 元数据)，未命中或缓存文件损坏时返回None
+        """
+        _, image_path, meta_path = self._paths(doc_hash, page_num, params_key)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            image = np.load(image_path, mmap_mode='r')
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        if list(image.shape) != meta.get('shape'):
+            self.misses += 1
+            return None
+        try:
+            os.utime(image_path)
+        except OSError:
+            pass
+        self.hits += 1
+        return image, meta
+
+    def store(self, doc_hash, page_num, params_key, image, meta):
+        """写入页面图像与元数据，写入失败（如磁盘已满）只记录警告，不影响识别"""
+        directory, image_path, meta_path = self._paths(doc_hash, page_num, params_key)
+        suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            for attempt in range(2):
+                os.makedirs(directory, exist_ok=True)
+                try:
+                    with open(image_path + suffix, 'wb') as f:
+                        np.save(f, np.ascontiguousarray(image))
+                        written = f.tell()
+                    break
+                except FileNotFoundError:
+                    # 其他线程或进程淘汰时恰好删除了这个空目录，重建后重试一次
+                    if attempt:
+                        raise
+            os.replace(image_path + suffix, image_path)
+            with open(meta_path + suffix, 'w', encoding='utf-8') as f:
+                json.dump(dict(meta, shape=list(image.shape)), f)
+            os.replace(meta_path + suffix, meta_path)
+        except OSError as e:
+            logger.warning(f"写入渲染缓存失败: {image_path}，错误: {str(e)}")
+            return
+        with self._lock:
+            if self._evicting:
+                self._pending_bytes += written
+                return
+            if self._size is not None:
+                self._size += written
+                if self._size <= self.max_bytes:
+                    return
+            self._evicting = True
+            self._pending_bytes = 0
+        # 遍历目录与删除文件不持有锁，其他线程的读写不受影响
+        total = None
+        try:
+            entries, total = self._scan()
+            if total > self.max_bytes:
+                total = self._evict(entries, total)
+        finally:
+            with self._lock:
+                self._size = None if total is None else total + self._pending_bytes
+                self._evicting = False
+
+    def _scan(self):
+        """遍历缓存目录，返回 ([(修改时间, 大小, 图像路径)], 总大小)"""
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith('.npy'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries, sum(size for _, size, _ in entries)
+
+    def _evict(self, entries, total):
+        """按最近使用时间淘汰最旧的页面，直到缓存总大小不超过上限的九成，返回淘汰后的总大小"""
+        target = self.max_bytes * 0.9
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= target:
+                break
+            for stale_path in (path, path[:-len('.npy')] + '.json'):
+                try:
+                    os.remove(stale_path)
+                except OSError:
+                    pass
+            total -= size
+            removed += 1
+            # 文档的页面全部淘汰后删除空目录
+            try:
+                os.rmdir(os.path.dirname(path))
+            except OSError:
+                pass
+        logger.debug("渲染缓存淘汰 %d 个页面，当前大小 %.0fMB", removed, total / (1024 * 1024))
+        return total
+
+
+def compute_tile_grid(width, height, tile_size, overlap):
+    """
+    将页面像素区域切分为相互重叠的分块
+
+    Returns:
+        list: 分块区域列表 [(x0, y0, x1, y1), ...]，每块不超过 tile_size×tile_size
+    """
+    def axis_starts(length):
+        if length <= tile_size:
+            return [0]
+        step = max(tile_size - overlap, 1)
+        starts = list(range(0, length - tile_size + 1, step))
+        # 最后一块贴齐页面边缘
+        if starts[-1] + tile_size < length:
+            starts.append(length - tile_size)
+        return starts
+
+    tiles = []
+    for y0 in axis_starts(height):
+        for x0 in axis_starts(width):
+            tiles.append((x0, y0, min(x0 + tile_size, width), min(y0 + tile_size, height)))
+    return tiles
+
+
+def get_item_bounds(items):
+    """返回文本框多边形的外接矩形数组 [[x0, y0, x1, y1], ...]"""
+    polys = [np.asarray(item['box'], dtype=np.float64) for item in items]
+    return np.array([[p[:, 0].min(), p[:, 1].min(), p[:, 0].max(), p[:, 1].max()] for p in polys]).reshape(-1, 4)
+
+
+def reading_order(boxes, indices):
+    """按阅读顺序（自上而下、自左向右）排序文本框下标"""
+    if not len(indices):
+        return list(indices)
+    # 以文本行高度中位数为行距，将纵向中心相近的文本框归为同一行
+    line_height = max(float(np.median(boxes[indices, 3] - boxes[indices, 1])), 1.0)
+    return sorted(indices, key=lambda i: (round((boxes[i, 1] + boxes[i, 3]) / 2 / line_height), boxes[i, 0]))
+
+
+def merge_regions(regions):
+    """合并相互重叠的矩形区域 [(x0, y0, x1, y1), ...]，直到任意两个区域都不再重叠"""
+    merged = list(regions)
+    changed = True
+    while changed:
+        changed = False
+        result = []
+        for x0, y0, x1, y1 in merged:
+            for idx, (mx0, my0, mx1, my1) in enumerate(result):
+                if x0 < mx1 and mx0 < x1 and y0 < my1 and my0 < y1:
+                    result[idx] = (min(x0, mx0), min(y0, my0), max(x1, mx1), max(y1, my1))
+                    changed = True
+                    break
+            else:
+                result.append((x0, y0, x1, y1))
+        merged = result
+    return merged
+
+
+def merge_tile_items(items, containment_threshold=0.7):
+    """
+    合并各分块的识别结果并去重
+
+    重叠区域中的同一文本行会被相邻分块重复识别，被分块边界截断的文本行也会留下残片。
+    按面积从大到小保留文本框，与已保留文本框的交集占自身面积超过阈值的视为重复并丢弃；
+    比重叠宽度更长、在任何分块中都不完整的文本行，由左右两段在重叠区域拼接为一行。
+    最后按阅读顺序（自上而下、自左向右）排序。
+
+    Args:
+        items (list): 整页坐标下的文本框，可带 `_cut_left`/`_cut_right` 标记表示被分块内部边界截断
+    """
+    if not items:
+        return items
+    boxes = get_item_bounds(items)
+    areas = np.maximum((boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1]), 1e-6)
+    suppressed = np.zeros(len(items), dtype=bool)
+    keep = []
+    for idx in np.argsort(-areas, kind='stable'):
+        if suppressed[idx]:
+            continue
+        keep.append(idx)
+        inter_w = np.clip(np.minimum(boxes[idx, 2], boxes[:, 2]) - np.maximum(boxes[idx, 0], boxes[:, 0]), 0, None)
+        inter_h = np.clip(np.minimum(boxes[idx, 3], boxes[:, 3]) - np.maximum(boxes[idx, 1], boxes[:, 1]), 0, None)
+        duplicated = inter_w * inter_h / np.minimum(areas[idx], areas) > containment_threshold
+        duplicated[idx] = False
+        suppressed |= duplicated
+
+    keep = reading_order(boxes, keep)
+
+    merged = []
+    for idx in keep:
+        item = dict(items[idx])
+        x0, y0, x1, y1 = boxes[idx]
+        if merged:
+            prev = merged[-1]
+            px0, py0, px1, py1 = prev['_bounds']
+            overlap_w = px1 - x0
+            overlap_h = min(py1, y1) - max(py0, y0)
+            # 同一行左右两段在重叠区域相交：按重叠宽度占比去掉右段开头的重复字符后拼接
+            if (prev.get('_cut_right') and item.get('_cut_left') and overlap_w > 0 and x1 > px1
+                    and overlap_h >= 0.5 * min(py1 - py0, y1 - y0)):
+                text = item['text']
+                skip_chars = int(round(len(text) * overlap_w / max(x1 - x0, 1e-6)))
+                prev['text'] = prev['text'] + text[skip_chars:]
+                scores = [score for score in (prev['score'], item['score']) if score is not None]
+                prev['score'] = min(scores) if scores else None
+                left, top, bottom = float(min(px0, x0)), float(min(py0, y0)), float(max(py1, y1))
+                x1 = float(x1)
+                prev['box'] = [[left, top], [x1, top], [x1, bottom], [left, bottom]]
+                prev['_bounds'] = (left, top, x1, bottom)
+                prev['_cut_right'] = item.get('_cut_right', False)
+                continue
+        item['_bounds'] = (x0, y0, x1, y1)
+        merged.append(item)
+    for item in merged:
+        for key in ('_bounds', '_cut_left', '_cut_right'):
+            item.pop(key, None)
+    return merged
+
+
+# 自动路由（-model auto）：表格与复杂版面页面使用PP-StructureV3，其余页面使用PP-OCRv5
+AUTO_MODEL = 'auto'
+AUTO_BASE_MODEL = 'pp-ocrv5'
+AUTO_STRUCTURE_MODEL = 'pp-structurev3'
+
+
+def detect_ruling_lines(image, max_side=1000, min_length_ratio=0.15):
+    """
+    检测页面中的水平与竖直长线段（表格框线）
+
+    缩小到最长边不超过 max_side 后自适应二值化，分别用长条形结构元素做开运算，
+    只保留长度不小于页面宽（高）min_length_ratio 的线段，文字笔画会被滤除。
+
+    Returns:
+        tuple: (水平线数, 竖直线数)
+    """
+    gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    scale = min(1.0, max_side / max(gray.shape[:2]))
+    if scale < 1.0:
+        gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    binary = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY_INV, 15, 10)
+    height, width = binary.shape
+    horizontal_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (max(2, int(width * min_length_ratio)), 1))
+    vertical_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (1, max(2, int(height * min_length_ratio))))
+    horizontal = cv2.morphologyEx(binary, cv2.MORPH_OPEN, horizontal_kernel)
+    vertical = cv2.morphologyEx(binary, cv2.MORPH_OPEN, vertical_kernel)
+    return cv2.connectedComponents(horizontal)[0] - 1, cv2.connectedComponents(vertical)[0] - 1
+
+
+def detect_grid_layout(items, min_columns=3, min_rows=3, min_row_ratio=0.3):
+    """
+    按PP-OCRv5文本框的行列分布判断页面是否为无框线表格或多栏等复杂版面
+
+    文本框按中心纵坐标聚成行（容差为文本框高度中位数的一半），包含 min_columns 个以上
+    文本框的行数不少于 min_rows 且占全部行的比例不低于 min_row_ratio 时判定为复杂版面。
+    """
+    if len(items) < min_columns * min_rows:
+        return False
+    boxes = []
+    for item in items:
+        ys = [point[1] for point in item['box']]
+        boxes.append(((min(ys) + max(ys)) / 2, max(ys) - min(ys)))
+    tolerance = max(1.0, float(np.median([box_height for _, box_height in boxes])) / 2)
+    rows = []
+    for center, _ in sorted(boxes):
+        if rows and center - rows[-1][-1] <= tolerance:
+            rows[-1].append(center)
+        else:
+            rows.append([center])
+    grid_rows = sum(1 for row in rows if len(row) >= min_columns)
+    return grid_rows >= min_rows and grid_rows >= min_row_ratio * len(rows)
+
+
+# 查询模式（-m query）：只识别到找齐所有目标为止，默认先看前两页，再看最后两页，最后按顺序看其余页面
+DEFAULT_QUERY_ORDER = '1,2,-1,-2,*'
+
+
+def compile_query_targets(patterns=None, fields=None):
+    """
+    编译查询目标
+
+    Args:
+        patterns (list): 正则表达式或关键字，目标名称即表达式本身
+        fields (dict): 字段名 -> 正则表达式；表达式含分组时取第一个分组作为字段值
+
+    Returns:
+        dict: 目标名称 -> 编译后的正则表达式，表达式不合法时抛出ValueError
+    """
+    targets = {}
+    for name, pattern in [(pattern, pattern) for pattern in patterns or []] + list((fields or {}).items()):
+        try:
+            targets[name] = re.compile(pattern)
+        except re.error as e:
+            raise ValueError(f"查询表达式不合法: {pattern}，错误信息: {str(e)}")
+    if not targets:
+        raise ValueError("至少需要一个查询表达式或字段定义")
+    return targets
+
+
+def parse_query_field(field_spec):
+    """解析命令行字段定义 NAME=REGEX"""
+    name, sep, pattern = field_spec.partition('=')
+    if not sep or not name.strip() or not pattern:
+        raise ValueError(f"字段定义格式错误: {field_spec}，应为 NAME=REGEX")
+    return name.strip(), pattern
+
+
+def resolve_page_order(total_pages, order=DEFAULT_QUERY_ORDER):
+    """
+    按页序表达式生成识别顺序（0起始页码，不重复）
+
+    表达式为逗号分隔的页码：正数从第一页起算，负数从最后一页倒数，* 表示其余页面按顺序，
+    ~ 表示其余页面倒序；未出现 * 或 ~ 时只识别列出的页面。如 "1,2,-1,*" 依次识别第1、2页、
+    最后一页，再识别其余页面。
+    """
+    pages = []
+    seen = set()
+    rest = None
+    for token in (token.strip() for token in order.split(',')):
+        if not token:
+            continue
+        if token in ('*', '~'):
+            rest = token
+            break
+        try:
+            number = int(token)
+        except ValueError:
+            raise ValueError(f"页序表达式格式错误: {token}")
+        index = number - 1 if number > 0 else total_pages + number
+        if number == 0 or not 0 <= index < total_pages or index in seen:
+            continue
+        pages.append(index)
+        seen.add(index)
+    if rest is not None:
+        remaining = [index for index in range(total_pages) if index not in seen]
+        pages.extend(remaining if rest == '*' else reversed(remaining))
+    return pages
+
+
+def match_query_targets(targets, record, found):
+    """在一页识别结果中查找尚未找到的目标，命中的写入 found（目标名称 -> 匹配信息）"""
+    text = '\n'.join(record.get('lines') or [])
+    for name, pattern in targets.items():
+        if name in found:
+            continue
+        match = pattern.search(text)
+        if match is None:
+            continue
+        value = match.group(1) if match.re.groups else match.group(0)
+        line_start = text.rfind('\n', 0, match.start()) + 1
+        line_end = text.find('\n', match.end())
+        found[name] = {
+            'page': record['page'],
+            'value': value,
+            'text': text[line_start:line_end if line_end != -1 else len(text)]
+        }
+
+
+def extract_text_items(res):
+    """从OCR结果中提取文本行的文本、置信度与多边形框"""
+    items = []
+    if res is None or not hasattr(res, 'get') or res.get('rec_texts') is None:
+        return items
+    rec_texts = res['rec_texts']
+    rec_scores = res.get('rec_scores')
+    rec_polys = res.get('rec_polys')
+    if rec_polys is None:
+        rec_polys = res.get('dt_polys')
+    rec_boxes = res.get('rec_boxes')
+    for idx, text in enumerate(rec_texts):
+        if rec_polys is not None and idx < len(rec_polys):
+            box = [[float(x), float(y)] for x, y in rec_polys[idx]]
+        elif rec_boxes is not None and idx < len(rec_boxes):
+            x1, y1, x2, y2 = [float(v) for v in rec_boxes[idx]]
+            box = [[x1, y1], [x2, y1], [x2, y2], [x1, y2]]
+        else:
+            continue
+        score = float(rec_scores[idx]) if rec_scores is not None and idx < len(rec_scores) else None
+        items.append({'text': text, 'score': score, 'box': box})
+    return items
+
+def parse_ocr_result(model, result, page_num, text_fallback=True):
+    """
+    解析predict方法的返回结果
+
+    Returns:
+        tuple: (文本行列表, 文本框列表, Markdown内容)
+    """
+    page_text = []
+    items = []
+    markdown_parts = []
+    result_list = []
+    # 尝试处理predict方法的返回结果
+    if result:
+        # 将生成器转换为列表以便处理
+        result_list = list(result)
+
+        # 根据模型类型处理不同的输出格式
+        if model == 'pp-structurev3':
+            # 处理PP-StructureV3模型的输出格式
+            for res in result_list:
+                if hasattr(res, 'print') and callable(res.print):
+                    # 对于PP-StructureV3的结果对象
+                    # 尝试保存为markdown以获取结构化内容
+                    import tempfile
+
+                    # 版面中的通用OCR结果带有文本框和置信度
+                    try:
+                        items.extend(extract_text_items(res.get('overall_ocr_res')))
+                    except Exception as e:
+                        logger.debug("提取PP-StructureV3文本框失败: %s", e)
+
+                    # 创建临时目录保存结果
+                    with tempfile.TemporaryDirectory() as tmpdir:
+                        try:
+                            # 保存为JSON和Markdown
+                            if hasattr(res, 'save_to_json'):
+                                res.save_to_json(save_path=tmpdir)
+
+                            if hasattr(res, 'save_to_markdown'):
+                                res.save_to_markdown(save_path=tmpdir)
+
+                            # 读取Markdown结果
+                            markdown_files = [f for f in os.listdir(tmpdir) if f.endswith('.md')]
+                            if markdown_files:
+                                markdown_path = os.path.join(tmpdir, markdown_files[0])
+                                with open(markdown_path, 'r', encoding='utf-8') as f:
+                                    md_content = f.read()
+                                    page_text.append(md_content)
+                                    markdown_parts.append(md_content)
+
+                            # 如果没有Markdown，尝试读取JSON
+                            elif os.listdir(tmpdir):
+                                json_files = [f for f in os.listdir(tmpdir) if f.endswith('.json')]
+                                if json_files:
+                                    json_path = os.path.join(tmpdir, json_files[0])
+                                    with open(json_path, 'r', encoding='utf-8') as f:
+                                        json_content = json.load(f)
+                                        # 从JSON中提取文本
+                                        if isinstance(json_content, list):
+                                            for item in json_content:
+                                                if isinstance(item, dict):
+                                                    if 'text' in item:
+                                                        page_text.append(item['text'])
+                                                elif isinstance(item, str):
+                                                    page_text.append(item)
+                        except Exception as e:
+                            logger.error(f"处理PP-StructureV3结果时出错: {str(e)}")
+                else:
+                    # 尝试直接提取文本
+                    if isinstance(res, dict):
+                        if 'text' in res:
+                            page_text.append(res['text'])
+                    elif isinstance(res, (list, tuple)):
+                        # 递归提取文本
+                        for item in res:
+                            if isinstance(item, dict) and 'text' in item:
+                                page_text.append(item['text'])
+                            elif isinstance(item, (list, tuple)) and len(item) >= 2:
+                                if isinstance(item[-1], str):
+                                    page_text.append(item[-1])
+
+        elif model == 'paddleocr-vl':
+            # 处理PaddleOCR-VL模型的输出格式
+            for res in result_list:
+                if hasattr(res, 'print') and callable(res.print):
+                    # 对于PaddleOCR-VL的结果对象
+                    import tempfile
+
+                    with tempfile.TemporaryDirectory() as tmpdir:
+                        try:
+                            if hasattr(res, 'save_to_json'):
+                                res.save_to_json(save_path=tmpdir)
+
+                            if hasattr(res, 'save_to_markdown'):
+                                res.save_to_markdown(save_path=tmpdir)
+                                markdown_files = [f for f in os.listdir(tmpdir) if f.endswith('.md')]
+                                if markdown_files:
+                                    with open(os.path.join(tmpdir, markdown_files[0]), 'r', encoding='utf-8') as f:
+                                        markdown_parts.append(f.read())
+
+                            # 读取JSON结果
+                            json_files = [f for f in os.listdir(tmpdir) if f.endswith('.json')]
+                            if json_files:
+                                json_path = os.path.join(tmpdir, json_files[0])
+                                with open(json_path, 'r', encoding='utf-8') as f:
+                                    json_content = json.load(f)
+                                    # 从JSON中提取文本
+                                    if isinstance(json_content, list):
+                                        for item in json_content:
+                                            if isinstance(item, dict):
+                                                # 检查是否有parsing_res_list字段
+                                                if 'parsing_res_list' in item:
+                                                    parsing_res_list = item['parsing_res_list']
+                                                    # 解析文本内容
+                                                    for parsing_item in parsing_res_list:
+                                                        if isinstance(parsing_item, str):
+                                                            # 查找content字段
+                                                            content_start = parsing_item.find('content:')
+                                                            if content_start != -1:
+                                                                # 提取content字段内容
+                                                                content = parsing_item[content_start + len('content:'):].strip()
+                                                                if content:
+                                                                    page_text.append(content)
+                                                elif 'text' in item:
+                                                    page_text.append(item['text'])
+                                            elif isinstance(item, str):
+                                                page_text.append(item)
+                        except Exception as e:
+                            logger.error(f"处理PaddleOCR-VL结果时出错: {str(e)}")
+                else:
+                    # 尝试直接提取文本
+                    if isinstance(res, dict):
+                        # 检查是否有parsing_res_list字段
+                        if 'parsing_res_list' in res:
+                            parsing_res_list = res['parsing_res_list']
+                            # 解析文本内容
+                            for parsing_item in parsing_res_list:
+                                if isinstance(parsing_item, str):
+                                    # 查找content字段
+                                    content_start = parsing_item.find('content:')
+                                    if content_start != -1:
+                                        # 提取content字段内容
+                                        content = parsing_item[content_start + len('content:'):].strip()
+                                        if content:
+                                            page_text.append(content)
+                        elif 'text' in res:
+                            page_text.append(res['text'])
+                    elif isinstance(res, (list, tuple)):
+                        for item in res:
+                            if isinstance(item, dict):
+                                if 'parsing_res_list' in item:
+                                    parsing_res_list = item['parsing_res_list']
+                                    # 解析文本内容
+                                    for parsing_item in parsing_res_list:
+                                        if isinstance(parsing_item, str):
+                                            # 查找content字段
+                                            content_start = parsing_item.find('content:')
+                                            if content_start != -1:
+                                                # 提取content字段内容
+                                                content = parsing_item[content_start + len('content:'):].strip()
+                                                if content:
+                                                    page_text.append(content)
+                                elif 'text' in item:
+                                    page_text.append(item['text'])
+                            elif isinstance(item, (list, tuple)) and len(item) >= 2:
+                                if isinstance(item[-1], str):
+                                    page_text.append(item[-1])
+        else:
+            # 处理PP-OCRv5模型的输出格式
+            if result_list and isinstance(result_list[0], dict):
+                # 如果是字典格式，检查是否有rec_texts字段
+                if 'rec_texts' in result_list[0]:
+                    rec_texts = result_list[0]['rec_texts']
+                    page_text.extend(rec_texts)
+                    # 同时保留文本框与置信度
+                    items.extend(extract_text_items(result_list[0]))
+                else:
+                    # 记录返回格式以便调试
+                    logger.debug("识别结果格式(字典)：%s", result_list[0].keys())
+                    # 尝试从其他可能的字段提取文本
+                    for item in result_list:
+                        if 'text' in item:
+                            page_text.append(item['text'])
+            elif result_list:
+                # 如果不是字典格式，尝试其他方式提取
+                logger.debug("识别结果格式(非字典)：%s", type(result_list[0]))
+                # 对于列表或元组格式，尝试提取文本
+                for item in result_list:
+                    if isinstance(item, (list, tuple)) and len(item) >= 2:
+                        # 可能是[(box, text), ...]格式
+                        page_text.extend([text for box, text in item])
+
+    # 如果没有提取到文本，尝试使用备用方法
+    if not page_text and text_fallback:
+        logger.warning(f"第 {page_num + 1} 页未提取到文本，尝试使用备用方法")
+        # 尝试直接从result_list中提取文本
+        try:
+            # 检查是否是paddleocr-vl模型的结果格式
+            if model == 'paddleocr-vl':
+                for res in result_list:
+                    if isinstance(res, dict):
+                        # 检查是否有parsing_res_list字段
+                        if 'parsing_res_list' in res:
+                            parsing_res_list = res['parsing_res_list']
+                            # 直接解析parsing_res_list中的文本内容
+                            for parsing_item in parsing_res_list:
+                                if isinstance(parsing_item, str):
+                                    # 查找content字段
+                                    content_start = parsing_item.find('content:')
+                                    if content_start != -1:
+                                        # 提取content字段内容直到下一个分隔符
+                                        content_end = parsing_item.find('#################', content_start)
+                                        if content_end != -1:
+                                            content = parsing_item[content_start + len('content:'):content_end].strip()
+                                        else:
+                                            content = parsing_item[content_start + len('content:'):].strip()
+                                        if content:
+                                            page_text.append(content)
+
+            # 如果还是没有提取到文本，使用最后的备用方法
+            if not page_text:
+                text_content = str(result_list)
+                if len(text_content) > 0:
+                    # 尝试从字符串中提取content字段内容
+                    import re
+                    content_pattern = r'content:\s*(.*?)\s*#################'
+                    content_matches = re.findall(content_pattern, text_content, re.DOTALL)
+                    if content_matches:
+                        page_text.extend(content_matches)
+                    else:
+                        page_text.append(text_content)
+        except Exception as e:
+            logger.error(f"备用方法提取文本失败: {str(e)}")
+            import traceback
+            logger.debug(f"完整错误堆栈: {traceback.format_exc()}")
+
+    return page_text, items, '\n\n'.join(markdown_parts)
+
+
+# 自动调优结果文件（由 autotune.py 生成），可通过环境变量 OCR_TUNING_CONFIG 指定其他路径
+DEFAULT_TUNING_CONFIG = 'ocr_tuning.json'
+_tuning_configs = {}
+_tuning_model_mismatches = set()
+
+
+def get_tuning_config_path():
+    """返回自动调优结果文件路径"""
+    return os.environ.get('OCR_TUNING_CONFIG') or os.path.join(os.getcwd(), DEFAULT_TUNING_CONFIG)
+
+
+def load_tuning_config(model=None):
+    """
+    读取自动调优结果
+
+    Args:
+        model (str): 当前使用的模型，调优结果是针对其他模型生成时忽略（None表示不检查）
+
+    Returns:
+        dict: 调优结果（workers、cpu_threads、engine_options等）；文件不存在、无法解析、
+            不是在当前主机（CPU核心数不同）上生成或不是针对该模型生成时返回None
+    """
+    path = get_tuning_config_path()
+    if path not in _tuning_configs:
+        _tuning_configs[path] = _read_tuning_config(path)
+    config = _tuning_configs[path]
+    if config and model is not None and config.get('model') != model:
+        if (path, model) not in _tuning_model_mismatches:
+            _tuning_model_mismatches.add((path, model))
+            logger.warning(f"自动调优配置是针对模型 {config.get('model')} 生成的，当前模型为 {model}，已忽略: {path}")
+        return None
+    return config
+
+
+def _read_tuning_config(path):
+    """读取并校验调优结果文件，无效时返回None"""
+    config = None
+    if os.path.exists(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                config = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"自动调优配置无法读取，已忽略: {path}，错误信息: {str(e)}")
+        else:
+            if config.get('host', {}).get('cpu_count') != os.cpu_count():
+                logger.warning(f"自动调优配置不是在当前主机上生成的（CPU核心数不同），已忽略: {path}")
+                config = None
+            else:
+                logger.info(f"已加载自动调优配置: {path}")
+    return config
+
+
+# 可调整的推理引擎选项及其类型
+ENGINE_OPTION_TYPES = {
+    'use_textline_orientation': bool,
+    'text_det_limit_side_len': int,
+    'text_det_limit_type': str,
+    'text_recognition_batch_size': int,
+    'cpu_threads': int,
+    'enable_mkldnn': bool
+}
+
+# 各模型支持的引擎选项（PaddleOCR-VL没有独立的文本检测与识别阶段）
+MODEL_ENGINE_OPTIONS = {
+    'pp-ocrv5': set(ENGINE_OPTION_TYPES),
+    'pp-structurev3': set(ENGINE_OPTION_TYPES),
+    'paddleocr-vl': {'cpu_threads', 'enable_mkldnn'}
+}
+
+# 预设性能档位：balanced与之前的默认配置一致
+ENGINE_PROFILES = {
+    'fast': {
+        'use_textline_orientation': False,
+        'text_det_limit_type': 'max',
+        'text_det_limit_side_len': 960,
+        'text_recognition_batch_size': 16,
+        'enable_mkldnn': True
+    },
+    'balanced': {},
+    'accurate': {
+        'use_textline_orientation': True,
+        'text_det_limit_type': 'min',
+        'text_det_limit_side_len': 1280,
+        'text_recognition_batch_size': 1
+    }
+}
+
+# 只影响速度、不影响识别结果的引擎选项
+ENGINE_PERFORMANCE_OPTIONS = {'cpu_threads', 'enable_mkldnn', 'text_recognition_batch_size'}
+
+
+def parse_engine_option(key, value):
+    """将字符串形式的引擎选项值按类型转换，选项名或取值无效时抛出ValueError"""
+    if key not in ENGINE_OPTION_TYPES:
+        raise ValueError(f"不支持的引擎选项: {key}，可选值: {', '.join(ENGINE_OPTION_TYPES)}")
+    option_type = ENGINE_OPTION_TYPES[key]
+    if not isinstance(value, str):
+        return option_type(value)
+    if option_type is bool:
+        if value.lower() in ('1', 'true', 'yes', 'on'):
+            return True
+        if value.lower() in ('0', 'false', 'no', 'off'):
+            return False
+        raise ValueError(f"引擎选项 {key} 的取值无效: {value}")
+    try:
+        return option_type(value)
+    except ValueError:
+        raise ValueError(f"引擎选项 {key} 的取值无效: {value}")
+
+
+def parse_engine_option_args(option_args):
+    """解析 key=value 形式的引擎选项列表"""
+    options = {}
+    for option_arg in option_args or []:
+        if '=' not in option_arg:
+            raise ValueError(f"引擎选项格式错误: {option_arg}，应为 key=value")
+        key, value = option_arg.split('=', 1)
+        options[key.strip()] = parse_engine_option(key.strip(), value.strip())
+    return options
+
+
+def resolve_engine_options(profile=None, overrides=None, model=None):
+    """
+    合并引擎选项：档位预设 < 自动调优结果 < 环境变量 < 显式指定
+
+    Args:
+        profile (str): 档位名称，未指定时取环境变量 OCR_PROFILE，默认 balanced
+        overrides (dict): 显式指定的引擎选项（命令行或API参数）
+        model (str): 使用的模型，只采用针对该模型生成的自动调优结果
+
+    Returns:
+        dict: 最终的引擎选项
+    """
+    profile = profile or os.environ.get('OCR_PROFILE') or 'balanced'
+    if profile not in ENGINE_PROFILES:
+        raise ValueError(f"不支持的性能档位: {profile}，可选值: {', '.join(ENGINE_PROFILES)}")
+    options = dict(ENGINE_PROFILES[profile])
+    tuning = load_tuning_config(model)
+    if tuning:
+        for key, value in tuning.get('engine_options', {}).items():
+            options[key] = parse_engine_option(key, value)
+    # 环境变量 OCR_<选项名大写>，如 OCR_TEXT_DET_LIMIT_SIDE_LEN=960
+    for key in ENGINE_OPTION_TYPES:
+        env_value = os.environ.get(f"OCR_{key.upper()}")
+        if env_value:
+            options[key] = parse_engine_option(key, env_value)
+    for key, value in (overrides or {}).items():
+        options[key] = parse_engine_option(key, value)
+    return options
+
+
+def create_ocr_pipeline(model, **engine_kwargs):
+    """根据模型名称创建PaddleOCR推理管线，模型不支持的引擎选项忽略并给出警告"""
+    supported = MODEL_ENGINE_OPTIONS.get(model, set())
+    unsupported = [key for key in engine_kwargs if key not in supported]
+    if unsupported:
+        logger.warning(f"{model}模型不支持引擎选项 {', '.join(unsupported)}，已忽略")
+    engine_kwargs = {key: value for key, value in engine_kwargs.items() if key in supported}
+    # 延迟导入paddleocr，使模型校验等不需要推理的操作无需加载paddle
+    from paddleocr import PaddleOCR, PPStructureV3, PaddleOCRVL
+    if model == 'paddleocr-vl':
+        # PaddleOCR-VL模型配置
+        return PaddleOCRVL(
+            use_doc_orientation_classify=False,
+            use_doc_unwarping=False,
+            **engine_kwargs
+        )
+    elif model == 'pp-structurev3':
+        # PP-StructureV3模型配置
+        return PPStructureV3(
+            use_doc_orientation_classify=False,
+            use_doc_unwarping=False,
+            **engine_kwargs
+        )
+    elif model == 'pp-chatocrv4':
+        # PP-ChatOCRv4模型需要额外的API配置，暂不支持直接使用
+        raise ValueError(f"{model}模型需要额外的API配置，暂不支持直接使用")
+    else:
+        # 默认PP-OCRv5模型配置，默认开启文本行方向分类
+        engine_kwargs.setdefault('use_textline_orientation', True)
+        return PaddleOCR(
+            use_doc_orientation_classify=False,
+            use_doc_unwarping=False,
+            **engine_kwargs
+        )
+
+
+class InferenceTimeout(Exception):
+    """推理超过时间预算"""
+
+
+def expand_page_nums(page_num, count):
+    """推理引擎的页码参数规范化为每张图像一个页码：整数表示所有图像属于同一页（如同一页的分块）"""
+    if isinstance(page_num, (list, tuple)):
+        return list(page_num)
+    return [page_num] * count
+
+
+def format_page_nums(page_nums):
+    """页码列表（从0开始）转为日志中的页码文本，如 "1、3"（去重并保持顺序）"""
+    return '、'.join(str(page_num + 1) for page_num in dict.fromkeys(page_nums))
+
+
+class LocalOCREngine:
+    """进程内推理引擎"""
+    def __init__(self, model, **engine_kwargs):
+        self.model = model
+        self.pipeline = create_ocr_pipeline(model, **engine_kwargs)
+
+    def infer(self, images, page_num=0, timeout=None, text_fallback=True):
+        """
+        识别一批图像
+
+        Args:
+            images (list): OpenCV图像列表
+            page_num (int | list): 页码（从0开始），仅用于日志；整数表示所有图像属于同一页，
+                列表为每张图像各自的页码（如微批合并了不同页面）
+            timeout (float): 时间预算（秒），进程内推理无法中断，忽略该参数
+            text_fallback (bool): 未提取到文本时是否使用备用方法（分块等只需要文本框的场景应关闭）
+
+        Returns:
+            list: 每张图像的 (文本行列表, 文本框列表, Markdown内容)
+        """
+        page_nums = expand_page_nums(page_num, len(images))
+        return [parse_ocr_result(self.model, [res], page_nums[index], text_fallback=text_fallback)
+                for index, res in enumerate(self.pipeline.predict(images))]
+
+    def close(self):
+        pass
+
+
+class StubOCREngine:
+    """
+    桩推理引擎：不加载模型，每页返回一行固定文本（用于在没有paddle的环境中联调API与客户端）
+
+    可选的 delay 参数（秒）模拟每页的推理耗时。
+    """
+    def __init__(self, model, delay=0.0, **engine_kwargs):
+        self.model = model
+        self.delay = delay
+
+    def infer(self, images, page_num=0, timeout=None, text_fallback=True):
+        """识别一批图像，返回格式同 LocalOCREngine.infer"""
+        if self.delay:
+            time.sleep(self.delay * len(images))
+        results = []
+        for image, image_page in zip(images, expand_page_nums(page_num, len(images))):
+            height, width = image.shape[:2]
+            text = f"stub page {image_page + 1} ({width}x{height})"
+            box = [[0.0, 0.0], [float(width), 0.0], [float(width), float(height)], [0.0, float(height)]]
+            results.append(([text], [{'text': text, 'score': 1.0, 'box': box}], ''))
+        return results
+
+    def close(self):
+        pass
+
+
+def _supervised_inference_main(model, engine_kwargs, conn, log_config=(None, logging.INFO)):
+    """受监管推理子进程入口：加载模型后循环处理推理请求"""
+    setup_logging(*log_config)
+    try:
+        engine = LocalOCREngine(model, **engine_kwargs)
+    except Exception as e:
+        conn.send(('error', f"模型初始化失败: {str(e)}"))
+        return
+    conn.send(('ready', None))
+    while True:
+        try:
+            request = conn.recv()
+        except EOFError:
+            break
+        if request is None:
+            break
+        images, page_num, text_fallback = request
+        try:
+            conn.send(('ok', engine.infer(images, page_num, text_fallback=text_fallback)))
+        except Exception as e:
+            conn.send(('error', str(e)))
+
+
+class SupervisedOCREngine:
+    """
+    在受监管的子进程中运行推理
+
+    超过时间预算时终止子进程并重建（重新加载模型），单个异常页面不会无限期阻塞守护进程或API请求；
+    子进程异常退出（如被OOM终止）时同样自动重建。
+    """
+    def __init__(self, model, **engine_kwargs):
+        self.model = model
+        self.engine_kwargs = engine_kwargs
+        self._context = multiprocessing.get_context('spawn')
+        self._process = None
+        self._conn = None
+        self._start()
+
+    def _start(self):
+        parent_conn, child_conn = self._context.Pipe()
+        self._process = self._context.Process(
+            target=_supervised_inference_main,
+            args=(self.model, self.engine_kwargs, child_conn, get_worker_log_config()),
+            daemon=True
+        )
+        self._process.start()
+        child_conn.close()
+        self._conn = parent_conn
+        # 等待子进程加载模型
+        try:
+            status, payload = self._conn.recv()
+        except EOFError:
+            status, payload = 'error', '推理子进程启动失败'
+        if status != 'ready':
+            self._stop()
+            raise RuntimeError(payload)
+        logger.info(f"推理子进程已启动，PID: {self._process.pid}")
+
+    def _stop(self):
+        if self._process is not None:
+            if self._process.is_alive():
+                self._process.kill()
+            self._process.join()
+            self._process = None
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _restart(self):
+        self._stop()
+        self._start()
+
+    def infer(self, images, page_num=0, timeout=None, text_fallback=True):
+        """识别一批图像，参数与返回值同 LocalOCREngine.infer，超过timeout秒抛出InferenceTimeout"""
+        if timeout is not None and timeout <= 0:
+            raise InferenceTimeout("时间预算已用尽")
+        if self._process is None:
+            # 上次终止后重建失败（如模型加载出错），在下一次推理前重试
+            self._start()
+        try:
+            self._conn.send((images, page_num, text_fallback))
+            if not self._conn.poll(timeout):
+                logger.warning(f"第 {format_page_nums(expand_page_nums(page_num, len(images)))} 页推理超过时间预算 "
+                               f"{timeout:.1f} 秒，终止并重建推理子进程")
+                self._restart()
+                raise InferenceTimeout(f"推理超过时间预算 {timeout:.1f} 秒")
+            status, payload = self._conn.recv()
+        except (EOFError, OSError) as e:
+            logger.error(f"推理子进程异常退出，正在重建: {str(e)}")
+            self._restart()
+            raise RuntimeError(f"推理子进程异常退出: {str(e)}")
+        if status != 'ok':
+            raise RuntimeError(payload)
+        return payload
+
+    def close(self):
+        """通知子进程退出并回收"""
+        if self._process is not None and self._process.is_alive():
+            try:
+                self._conn.send(None)
+                self._process.join(5)
+            except (OSError, ValueError):
+                pass
+        self._stop()
+
+
+class MicroBatchEngine:
+    """
+    跨请求微批处理
+
+    包装一个推理引擎，在 max_wait 秒的窗口内收集多个调用方（如API的并发请求）提交的页面图像，
+    合并为一次 predict 批量推理后再把结果分发回各自的调用方。多个调用方可在不同线程中并发调用 infer。
+    """
+    def __init__(self, engine, max_batch_size=8, max_wait=0.02):
+        self.engine = engine
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='ocr-micro-batch', daemon=True)
+        self._thread.start()
+
+    def infer(self, images, page_num=0, timeout=None, text_fallback=True):
+        """参数与返回值同 LocalOCREngine.infer，超过timeout秒未拿到结果时抛出InferenceTimeout"""
+        if timeout is not None and timeout <= 0:
+            raise InferenceTimeout("时间预算已用尽")
+        future = Future()
+        deadline = None if timeout is None else time.time() + timeout
+        self._queue.put((images, page_num, deadline, text_fallback, future))
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise InferenceTimeout(f"推理超过时间预算 {timeout:.1f} 秒")
+
+    def _run(self):
+        while True:
+            request = self._queue.get()
+            if request is None:
+                break
+            batch = [request]
+            batch_images = len(request[0])
+            window_end = time.time() + self.max_wait
+            stopping = False
+            # 在时间窗口内继续收集其他调用方的页面，凑满批大小即提前执行
+            while batch_images < self.max_batch_size:
+                remaining = window_end - time.time()
+                if remaining <= 0:
+                    break
+                try:
+                    request = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if request is None:
+                    stopping = True
+                    break
+                batch.append(request)
+                batch_images += len(request[0])
+            self._run_batch(batch)
+            if stopping:
+                break
+
+    def _run_batch(self, batch):
+        # 跳过调用方已放弃等待的请求
+        batch = [request for request in batch if request[4].set_running_or_notify_cancel()]
+        # 是否使用备用文本提取会影响结果解析，按该选项分组执行
+        for text_fallback in (True, False):
+            group = [request for request in batch if request[3] == text_fallback]
+            if not group:
+                continue
+            images = [image for request in group for image in request[0]]
+            # 每张图像带上各自调用方的页码，日志、备用文本提取与超时提示对应到正确的页
+            page_nums = [image_page for request in group for image_page in expand_page_nums(request[1], len(request[0]))]
+            # 批次的时间预算取各调用方中最宽松的一个，单个调用方超时由其自身的等待处理
+            deadlines = [request[2] for request in group]
+            timeout = None if None in deadlines else max(deadlines) - time.time()
+            logger.debug("微批推理: %d 个请求，共 %d 张图像", len(group), len(images))
+            try:
+                results = self.engine.infer(images, page_nums, timeout=timeout, text_fallback=text_fallback)
+            except Exception as e:
+                for request in group:
+                    request[4].set_exception(e)
+                continue
+            offset = 0
+            for request in group:
+                count = len(request[0])
+                request[4].set_result(results[offset:offset + count])
+                offset += count
+
+    def close(self):
+        """处理完已提交的请求后停止批处理线程，并关闭被包装的引擎"""
+        self._queue.put(None)
+        self._thread.join()
+        self.engine.close()
+
 
 class PDFOCRHandler:
-    def __init__(self, output_dir, model='pp-ocrv5', optimize_pdf=False, optimize_level='medium', grayscale=False):
+    def __init__(self, output_dir, model='pp-ocrv5', optimize_pdf=False, optimize_level='medium', grayscale=False,
+                 cpu_threads=None, resume=True, journal_fsync=True, output_format='txt', render_scale=1.0,
+                 tile_mode=False, tile_size=2000, tile_overlap=200, tile_batch_size=4,
+                 adaptive_mode=False, adaptive_threshold=0.85, adaptive_scale=3.0,
+                 page_timeout=None, doc_timeout=None, dedup=False, dedup_threshold=4,
+                 profile=None, engine_options=None, engine=None, memory_budget=None, memory_budget_mb=None,
+                 structure_engine=None, index_path=None, page_log_sample=1, direct_image=True,
+                 crop_margins=True, render_cache=None, render_cache_dir=None, render_cache_mb=4096,
+                 render_cache_hash=False):
         self.output_dir = output_dir
         self.model = model
         self.optimize_pdf_flag = optimize_pdf
         self.optimize_level = optimize_level
         self.grayscale = grayscale
+        self.cpu_threads = cpu_threads
+        self.resume = resume
+        self.journal_fsync = journal_fsync
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"不支持的输出格式: {output_format}，可选值: {', '.join(OUTPUT_FORMATS)}")
+        self.output_format = output_format
+        self.render_scale = render_scale
+        # 自动路由模式下普通页面使用PP-OCRv5，表格与复杂版面页面使用PP-StructureV3
+        self.auto_route = model == AUTO_MODEL
+        base_model = AUTO_BASE_MODEL if self.auto_route else model
+        # 分块模式依赖文本框坐标合并结果，目前仅PP-OCRv5支持
+        if tile_mode and model != 'pp-ocrv5':
+            logger.warning(f"分块模式仅支持pp-ocrv5模型，{model}模型将使用整页缩放")
+            tile_mode = False
+        self.tile_mode = tile_mode
+        self.tile_size = tile_size
+        self.tile_overlap = min(tile_overlap, tile_size // 2)
+        self.tile_batch_size = max(1, tile_batch_size)
+        # 自适应精细识别同样依赖文本框与置信度，目前仅PP-OCRv5支持
+        if adaptive_mode and model != 'pp-ocrv5':
+            logger.warning(f"自适应精细识别仅支持pp-ocrv5模型，{model}模型将关闭该功能")
+            adaptive_mode = False
+        self.adaptive_mode = adaptive_mode
+        self.adaptive_threshold = adaptive_threshold
+        self.adaptive_scale = adaptive_scale
+        # 扫描页直接解码内嵌图像：分块与自适应模式按渲染比例重新渲染页面区域，两者开启时不使用
+        self.direct_image = direct_image and not tile_mode and not adaptive_mode
+        # 识别前裁掉空白边距，像素预算只用于有内容的区域（分块模式的超大页面按原始分辨率分块，不裁剪）
+        self.crop_margins = crop_margins
+        self.last_direct_pages = 0
+        self.page_timeout = page_timeout
+        self.doc_timeout = doc_timeout
+        # 逐页日志采样：每 page_log_sample 页输出一次info，其余页降为debug
+        self.page_log_sample = page_log_sample
+        self._doc_deadline = None
+        self._page_deadline = None
+        # 渲染与缩放使用的图像缓冲区在各页之间复用
+        self.buffer_pool = PageBufferPool()
+        # 重复页面索引在处理器生命周期内跨文档保留
+        self.dedup_index = PageDedupIndex(threshold=dedup_threshold) if dedup else None
+        self.dedup_hits = 0
+        self.last_dedup_hits = 0
+        self._current_source = None
+        # 内存预算：调用方传入的共享预算（如API各请求共用）优先，否则按 memory_budget_mb 创建
+        if memory_budget is None and memory_budget_mb:
+            memory_budget = MemoryBudget(memory_budget_mb * 1024 * 1024)
+        self.memory_budget = memory_budget
+        # 渲染缓存：调用方传入的共享缓存（如API各请求共用）优先，否则按 render_cache_dir 创建
+        if render_cache is None and render_cache_dir:
+            render_cache = RenderCache(render_cache_dir, render_cache_mb * 1024 * 1024, content_hash=render_cache_hash)
+        self.render_cache = render_cache
+        self._render_cache_key = RenderCache.params_key(
+            render_scale=render_scale, grayscale=grayscale, direct_image=self.direct_image,
+            crop_margins=crop_margins, max_pixels=MAX_INFER_PIXELS)
+        self._render_cache_doc = None
+        self.last_cache_hits = 0
+        # 全文索引：每完成一个文档即写入该文档的所有页面（按需打开）
+        self.index_path = index_path
+        self.search_index = None
         
-        # 根据选择的模型配置PaddleOCR
-        logger.info(f"正在初始化{model}模型...")
-        if model == 'paddleocr-vl':
-            # PaddleOCR-VL模型配置
-            self.ocr = PaddleOCRVL(
-                use_doc_orientation_classify=False,
-                use_doc_unwarping=False
-            )
-        elif model == 'pp-structurev3':
-            # PP-StructureV3模型配置
-            self.ocr = PPStructureV3(
-                use_doc_orientation_classify=False,
-                use_doc_unwarping=False
-            )
-        elif model == 'pp-chatocrv4':
+        # 引擎选项：性能档位、环境变量与显式指定的选项合并
+        engine_kwargs = resolve_engine_options(profile, engine_options, model)
+        # 推理线程数：多进程并行时由调用方按进程数切分，避免CPU超订
+        if cpu_threads:
+            engine_kwargs['cpu_threads'] = cpu_threads
+        self.engine_options = engine_kwargs
+        # 影响识别结果的处理选项（与输出清单的记录方式一致），写入进度日志的文档头，续跑时选项变化则重新识别
+        self.output_options = get_output_options(model, {
+            'optimize_pdf': optimize_pdf,
+            'optimize_level': optimize_level,
+            'grayscale': grayscale,
+            'output_format': output_format,
+            'render_scale': render_scale,
+            'tile_mode': tile_mode,
+            'tile_size': tile_size,
+            'tile_overlap': tile_overlap,
+            'adaptive_mode': adaptive_mode,
+            'adaptive_threshold': adaptive_threshold,
+            'adaptive_scale': adaptive_scale,
+            'profile': profile,
+            'engine_options': engine_options,
+            'direct_image': direct_image,
+            'crop_margins': crop_margins
+        })
+        
+        if model == 'pp-chatocrv4':
             # PP-ChatOCRv4模型需要额外的API配置，暂不支持直接使用
             logger.error(f"PP-ChatOCRv4模型需要额外的API配置，暂不支持直接使用")
             raise ValueError(f"{model}模型需要额外的API配置，暂不支持直接使用")
-        else:
-            # 默认PP-OCRv5模型配置
-            self.ocr = PaddleOCR(
-                use_textline_orientation=True, 
-                use_doc_orientation_classify=False,
-                use_doc_unwarping=False
-            )
-        logger.info(f"{model}模型初始化完成")
+        
+        # 根据选择的模型配置PaddleOCR
+        # 调用方传入的共享引擎（如API的微批引擎）由调用方负责关闭
+        self._owns_engine = engine is None
+        self.engine = engine if engine is not None else self._create_engine(base_model)
+        # 自动路由使用的PP-StructureV3引擎在第一次遇到复杂页面时才加载
+        self._owns_structure_engine = structure_engine is None
+        self.structure_engine = structure_engine
+        self.last_route_counts = {}
         
         logger.info(f"使用OCR模型: {model}")
+        logger.info(f"性能档位: {profile or os.environ.get('OCR_PROFILE') or 'balanced'}")
+        if engine_kwargs:
+            logger.info(f"引擎选项: {', '.join(f'{key}={value}' for key, value in engine_kwargs.items())}")
         logger.info(f"PDF优化: {'开启' if self.optimize_pdf_flag else '关闭'}")
         if self.optimize_pdf_flag:
             logger.info(f"优化级别: {self.optimize_level}")
         logger.info(f"灰度渲染: {'开启' if self.grayscale else '关闭'}")
+        logger.info(f"断点续跑: {'开启' if self.resume else '关闭'}")
+        logger.info(f"输出格式: {self.output_format}")
+        logger.info(f"渲染缩放比例: {self.render_scale}")
+        if self.tile_mode:
+            logger.info(f"分块模式: 开启，分块尺寸: {self.tile_size}，重叠: {self.tile_overlap}，批大小: {self.tile_batch_size}")
+        if self.adaptive_mode:
+            logger.info(f"自适应精细识别: 开启，置信度阈值: {self.adaptive_threshold}，精细缩放比例: {self.adaptive_scale}")
+        if self.page_timeout or self.doc_timeout:
+            page_budget = f"{self.page_timeout} 秒" if self.page_timeout else '不限'
+            doc_budget = f"{self.doc_timeout} 秒" if self.doc_timeout else '不限'
+            logger.info(f"时间预算: 每页 {page_budget}，每文档 {doc_budget}")
+        if self.dedup_index is not None:
+            logger.info(f"重复页面检测: 开启，汉明距离阈值: {dedup_threshold}")
+        if self.index_path:
+            logger.info(f"全文索引: {self.index_path}")
+        logger.info(f"扫描页直接解码内嵌图像: {'开启' if self.direct_image else '关闭'}")
+        logger.info(f"空白边距裁剪: {'开启' if self.crop_margins else '关闭'}")
+        if self.render_cache is not None:
+            logger.info(f"渲染缓存: {self.render_cache.cache_dir}，上限: {self.render_cache.max_bytes / (1024 * 1024):.0f}MB")
+        if self.page_log_sample != 1:
+            logger.info(f"逐页日志: {f'每 {self.page_log_sample} 页输出一次' if self.page_log_sample else '仅debug级别'}")
         
         # 确保输出目录存在
         os.makedirs(output_dir, exist_ok=True)
@@ -223,16 +2312,34 @@ class PDFOCRHandler:
             # 如果优化失败，返回原始文件路径
             return pdf_path
     
-    def process_pdf(self, pdf_path):
-        """处理单个PDF文件的OCR识别"""
+    def process_pdf(self, pdf_path, should_yield=None, source_path=None):
+        """
+        处理单个PDF文件的OCR识别
+        
+        Args:
+            pdf_path (str): PDF文件路径
+            should_yield (callable): 在识别每个新页面之前调用（本次调用的第一页除外），参数为此前已处理的页数
+                （含进度日志中已完成的页），返回True时在页边界让出（供调度器抢占大文档），
+                已完成的页保留在进度日志中，再次调用时从断点继续
+            source_path (str): 记入进度日志的源文件路径，默认为pdf_path（文件被移动后处理时传入原路径，
+                使其他节点回收后仍能从断点继续）
+        
+        Returns:
+            bool: 是否处理成功；部分页面超时时返回 PROCESS_PARTIAL（结果已保存，进度日志保留可续跑）；让出时返回None
+        """
         import time  # 确保time模块可用
         import os  # 确保os模块在方法内可用
         start_time = time.time()
         success = False
+        partial = False
+        preempted = False
         file_size = 0
         file_size_mb = 0  # 初始化文件大小变量，避免NameError
         total_pages = 0
-        output_txt_path = None
+        output_path = None
+        pdf = None
+        journal = None
+        writer = None
         
         try:
             # 获取文件大小
@@ -244,7 +2351,14 @@ class PDFOCRHandler:
             
             # 获取文件名（不含扩展名）
             filename = os.path.splitext(os.path.basename(pdf_path))[0]
-            output_txt_path = os.path.join(self.output_dir, f"{filename}.txt")
+            self._current_source = os.path.basename(pdf_path)
+            self.last_dedup_hits = 0
+            self.last_route_counts = {}
+            self.last_direct_pages = 0
+            output_path = get_output_path(self.output_dir, pdf_path, self.output_format)
+            source_stat = os.stat(pdf_path)
+            source_path = os.path.abspath(source_path or pdf_path)
+            self._start_render_cache(pdf_path)
             
             # 优化PDF文件
             if self.optimize_pdf_flag:
@@ -255,338 +2369,104 @@ class PDFOCRHandler:
             total_pages = len(pdf)
             logger.info(f"PDF文件总页数: {total_pages}")
             
-            # 识别结果
-            ocr_results = []
+            # 逐页进度日志：识别结果按页追加落盘，崩溃后从已完成的页继续
+            journal = PageJournal(PageJournal.path_for(self.output_dir, filename), fsync=self.journal_fsync)
+            journal_header = {
+                'source': source_path,
+                'size': source_stat.st_size,
+                'mtime': source_stat.st_mtime,
+                'total_pages': total_pages,
+                'model': self.model,
+                # 输出格式只影响结果文件的写法，页面记录通用，不参与比较
+                'options': {key: value for key, value in self.output_options.items() if key != 'output_format'}
+            }
+            if not self.resume:
+                journal.remove()
+            completed_pages = journal.load(journal_header)
+            if completed_pages:
+                logger.info(f"检测到进度日志，已完成 {len(completed_pages)}/{total_pages} 页，从断点继续处理")
+            journal.open(journal_header)
+            
+            # 结果写入器：逐页追加到临时文件，文档完成后原子替换
+            writer = OUTPUT_FORMATS[self.output_format](output_path)
+            writer.open()
+            pages_written = 0
+            pages_attempted = 0
+            indexed_pages = []
+            timed_out_pages = 0
+            self._doc_deadline = time.time() + self.doc_timeout if self.doc_timeout else None
             
             # 逐页处理
             for page_num in range(total_pages):
-                logger.info(f"处理第 {page_num + 1}/{total_pages} 页")
+                if page_num + 1 in completed_pages:
+                    # 已完成的页直接从进度日志读取
+                    record = journal.read_page(page_num + 1)
+                    writer.write_page(record)
+                    pages_written += 1
+                    if self.index_path:
+                        indexed_pages.append((record['page'], '\n'.join(record['lines'])))
+                    continue
+                # 页边界：本次调用至少处理一页后才允许让出，保证每次调度都有进展
+                if should_yield is not None and pages_attempted and should_yield(page_num):
+                    preempted = True
+                    break
+                pages_attempted += 1
+                logger.log(self._page_log_level(page_num), "处理第 %d/%d 页", page_num + 1, total_pages)
                 
-                try:
-                    # 获取页面
-                    page = pdf[page_num]
-                    
-                    # 将页面转换为图像
-                    # 降低初始渲染分辨率，减少内存占用
-                    bitmap = page.render(
-                        scale=1.0,  # 降低初始缩放比例以提高性能
-                        rotation=0,
-                        # 使用灰度渲染可以进一步减少内存使用
-                        grayscale=self.grayscale
-                    )
-                    
-                    # 转换为numpy数组
-                    img = bitmap.to_numpy()
-                    
-                    # 转换为OpenCV格式（BGR）
-                    img_cv = cv2.cvtColor(img, cv2.COLOR_RGB2BGR)
-                    
-                    # 检查图像尺寸，如果过大则进行缩放
-                    max_size = 6000  # 降低最大尺寸以提高处理速度
-                    target_resolution = 300  # 设置目标分辨率
-                    
-                    height, width = img_cv.shape[:2]
-                    current_resolution = width * height
-                    
-                    if height > max_size or width > max_size:
-                        # 计算缩放比例
-                        scale_factor = max_size / max(height, width)
-                        new_width = int(width * scale_factor)
-                        new_height = int(height * scale_factor)
-                        
-                        logger.info(f"图像尺寸过大 ({width}x{height})，将缩放到 {new_width}x{new_height}")
-                        
-                        # 缩放图像
-                        img_cv = cv2.resize(img_cv, (new_width, new_height), interpolation=cv2.INTER_AREA)
-                        height, width = img_cv.shape[:2]
-                    
-                    # 检查分辨率，如果过高则进一步降低
-                    desired_max_resolution = 2000 * 2000  # 400万像素
-                    if width * height > desired_max_resolution:
-                        resolution_scale = (desired_max_resolution / (width * height)) ** 0.5
-                        new_width = int(width * resolution_scale)
-                        new_height = int(height * resolution_scale)
-                        
-                        logger.info(f"图像分辨率过高 ({width}x{height})，将缩放到 {new_width}x{new_height}")
-                        
-                        # 缩放图像
-                        img_cv = cv2.resize(img_cv, (new_width, new_height), interpolation=cv2.INTER_AREA)
-                    
-                    # 执行OCR识别
-                    logger.info(f"开始识别第 {page_num + 1} 页内容...")
-                    
-                    # 限制识别时间，避免长时间无响应
-                    import time
-                    start_ocr_time = time.time()
-                    try:
-                        result = self.ocr.predict(img_cv)
-                        ocr_time = time.time() - start_ocr_time
-                        logger.info(f"第 {page_num + 1} 页识别完成，耗时: {ocr_time:.2f}秒")
-                    except Exception as e:
-                        logger.error(f"第 {page_num + 1} 页识别失败: {str(e)}")
-                        # 释放资源
-                        del img_cv, img
-                        if 'bitmap' in locals():
-                            del bitmap
-                        continue
-                    
-                    # 提取识别文本
-                    page_text = []
-                    try:
-                        # 尝试处理predict方法的返回结果
-                        if result:
-                            # 将生成器转换为列表以便处理
-                            result_list = list(result)
-                            
-                            # 根据模型类型处理不同的输出格式
-                            if self.model == 'pp-structurev3':
-                                # 处理PP-StructureV3模型的输出格式
-                                for res in result_list:
-                                    if hasattr(res, 'print') and callable(res.print):
-                                        # 对于PP-StructureV3的结果对象
-                                        # 尝试保存为markdown以获取结构化内容
-                                        import json
-                                        import tempfile
-                                        import os
-                                        
-                                        # 创建临时目录保存结果
-                                        with tempfile.TemporaryDirectory() as tmpdir:
-                                            try:
-                                                # 保存为JSON和Markdown
-                                                if hasattr(res, 'save_to_json'):
-                                                    res.save_to_json(save_path=tmpdir)
-                                                    
-                                                if hasattr(res, 'save_to_markdown'):
-                                                    res.save_to_markdown(save_path=tmpdir)
-                                                    
-                                                # 读取Markdown结果
-                                                markdown_files = [f for f in os.listdir(tmpdir) if f.endswith('.md')]
-                                                if markdown_files:
-                                                    markdown_path = os.path.join(tmpdir, markdown_files[0])
-                                                    with open(markdown_path, 'r', encoding='utf-8') as f:
-                                                        md_content = f.read()
-                                                        page_text.append(md_content)
-                                                
-                                                # 如果没有Markdown，尝试读取JSON
-                                                elif os.listdir(tmpdir):
-                                                    json_files = [f for f in os.listdir(tmpdir) if f.endswith('.json')]
-                                                    if json_files:
-                                                        json_path = os.path.join(tmpdir, json_files[0])
-                                                        with open(json_path, 'r', encoding='utf-8') as f:
-                                                            json_content = json.load(f)
-                                                            # 从JSON中提取文本
-                                                            if isinstance(json_content, list):
-                                                                for item in json_content:
-                                                                    if isinstance(item, dict):
-                                                                        if 'text' in item:
-                                                                            page_text.append(item['text'])
-                                                                    elif isinstance(item, str):
-                                                                        page_text.append(item)
-                                            except Exception as e:
-                                                logger.error(f"处理PP-StructureV3结果时出错: {str(e)}")
-                                    else:
-                                        # 尝试直接提取文本
-                                        if isinstance(res, dict):
-                                            if 'text' in res:
-                                                page_text.append(res['text'])
-                                        elif isinstance(res, (list, tuple)):
-                                            # 递归提取文本
-                                            for item in res:
-                                                if isinstance(item, dict) and 'text' in item:
-                                                    page_text.append(item['text'])
-                                                elif isinstance(item, (list, tuple)) and len(item) >= 2:
-                                                    if isinstance(item[-1], str):
-                                                        page_text.append(item[-1])
-                                            
-                            elif self.model == 'paddleocr-vl':
-                                # 处理PaddleOCR-VL模型的输出格式
-                                for res in result_list:
-                                    if hasattr(res, 'print') and callable(res.print):
-                                        # 对于PaddleOCR-VL的结果对象
-                                        import tempfile
-                                        import os
-                                        import json
-                                        
-                                        with tempfile.TemporaryDirectory() as tmpdir:
-                                            try:
-                                                if hasattr(res, 'save_to_json'):
-                                                    res.save_to_json(save_path=tmpdir)
-                                                    
-                                                # 读取JSON结果
-                                                json_files = [f for f in os.listdir(tmpdir) if f.endswith('.json')]
-                                                if json_files:
-                                                    json_path = os.path.join(tmpdir, json_files[0])
-                                                    with open(json_path, 'r', encoding='utf-8') as f:
-                                                        json_content = json.load(f)
-                                                        # 从JSON中提取文本
-                                                        if isinstance(json_content, list):
-                                                            for item in json_content:
-                                                                if isinstance(item, dict):
-                                                                    # 检查是否有parsing_res_list字段
-                                                                    if 'parsing_res_list' in item:
-                                                                        parsing_res_list = item['parsing_res_list']
-                                                                        # 解析文本内容
-                                                                        for parsing_item in parsing_res_list:
-                                                                            if isinstance(parsing_item, str):
-                                                                                # 查找content字段
-                                                                                content_start = parsing_item.find('content:')
-                                                                                if content_start != -1:
-                                                                                    # 提取content字段内容
-                                                                                    content = parsing_item[content_start + len('content:'):].strip()
-                                                                                    if content:
-                                                                                        page_text.append(content)
-                                                                    elif 'text' in item:
-                                                                        page_text.append(item['text'])
-                                                                elif isinstance(item, str):
-                                                                    page_text.append(item)
-                                            except Exception as e:
-                                                logger.error(f"处理PaddleOCR-VL结果时出错: {str(e)}")
-                                    else:
-                                        # 尝试直接提取文本
-                                        if isinstance(res, dict):
-                                            # 检查是否有parsing_res_list字段
-                                            if 'parsing_res_list' in res:
-                                                parsing_res_list = res['parsing_res_list']
-                                                # 解析文本内容
-                                                for parsing_item in parsing_res_list:
-                                                    if isinstance(parsing_item, str):
-                                                        # 查找content字段
-                                                        content_start = parsing_item.find('content:')
-                                                        if content_start != -1:
-                                                            # 提取content字段内容
-                                                            content = parsing_item[content_start + len('content:'):].strip()
-                                                            if content:
-                                                                page_text.append(content)
-                                            elif 'text' in res:
-                                                page_text.append(res['text'])
-                                        elif isinstance(res, (list, tuple)):
-                                            for item in res:
-                                                if isinstance(item, dict):
-                                                    if 'parsing_res_list' in item:
-                                                        parsing_res_list = item['parsing_res_list']
-                                                        # 解析文本内容
-                                                        for parsing_item in parsing_res_list:
-                                                            if isinstance(parsing_item, str):
-                                                                # 查找content字段
-                                                                content_start = parsing_item.find('content:')
-                                                                if content_start != -1:
-                                                                    # 提取content字段内容
-                                                                    content = parsing_item[content_start + len('content:'):].strip()
-                                                                    if content:
-                                                                        page_text.append(content)
-                                                    elif 'text' in item:
-                                                        page_text.append(item['text'])
-                                                elif isinstance(item, (list, tuple)) and len(item) >= 2:
-                                                    if isinstance(item[-1], str):
-                                                        page_text.append(item[-1])
-                            else:
-                                # 处理PP-OCRv5模型的输出格式
-                                if result_list and isinstance(result_list[0], dict):
-                                    # 如果是字典格式，检查是否有rec_texts字段
-                                    if 'rec_texts' in result_list[0]:
-                                        rec_texts = result_list[0]['rec_texts']
-                                        page_text.extend(rec_texts)
-                                    else:
-                                        # 记录返回格式以便调试
-                                        logger.debug(f"识别结果格式(字典)：{result_list[0].keys()}")
-                                        # 尝试从其他可能的字段提取文本
-                                        for item in result_list:
-                                            if 'text' in item:
-                                                page_text.append(item['text'])
-                                elif result_list:
-                                    # 如果不是字典格式，尝试其他方式提取
-                                    logger.debug(f"识别结果格式(非字典)：{type(result_list[0])}")
-                                    # 对于列表或元组格式，尝试提取文本
-                                    for item in result_list:
-                                        if isinstance(item, (list, tuple)) and len(item) >= 2:
-                                            # 可能是[(box, text), ...]格式
-                                            page_text.extend([text for box, text in item])
-                    except Exception as e:
-                        logger.error(f"处理第 {page_num + 1} 页识别结果时出错: {str(e)}")
-                        import traceback
-                        logger.debug(f"完整错误堆栈: {traceback.format_exc()}")
-                        # 释放资源
-                        del img_cv, img
-                        if 'bitmap' in locals():
-                            del bitmap
-                        continue
-                    
-                    # 如果没有提取到文本，尝试使用备用方法
-                    if not page_text:
-                        logger.warning(f"第 {page_num + 1} 页未提取到文本，尝试使用备用方法")
-                        # 尝试直接从result_list中提取文本
-                        try:
-                            # 检查是否是paddleocr-vl模型的结果格式
-                            if self.model == 'paddleocr-vl':
-                                for res in result_list:
-                                    if isinstance(res, dict):
-                                        # 检查是否有parsing_res_list字段
-                                        if 'parsing_res_list' in res:
-                                            parsing_res_list = res['parsing_res_list']
-                                            # 直接解析parsing_res_list中的文本内容
-                                            for parsing_item in parsing_res_list:
-                                                if isinstance(parsing_item, str):
-                                                    # 查找content字段
-                                                    content_start = parsing_item.find('content:')
-                                                    if content_start != -1:
-                                                        # 提取content字段内容直到下一个分隔符
-                                                        content_end = parsing_item.find('#################', content_start)
-                                                        if content_end != -1:
-                                                            content = parsing_item[content_start + len('content:'):content_end].strip()
-                                                        else:
-                                                            content = parsing_item[content_start + len('content:'):].strip()
-                                                        if content:
-                                                            page_text.append(content)
-                            
-                            # 如果还是没有提取到文本，使用最后的备用方法
-                            if not page_text:
-                                text_content = str(result_list)
-                                if len(text_content) > 0:
-                                    # 尝试从字符串中提取content字段内容
-                                    import re
-                                    content_pattern = r'content:\s*(.*?)\s*#################'
-                                    content_matches = re.findall(content_pattern, text_content, re.DOTALL)
-                                    if content_matches:
-                                        page_text.extend(content_matches)
-                                    else:
-                                        page_text.append(text_content)
-                        except Exception as e:
-                            logger.error(f"备用方法提取文本失败: {str(e)}")
-                            import traceback
-                            logger.debug(f"完整错误堆栈: {traceback.format_exc()}")
-                    
-                    # 添加页面分隔符和识别结果
-                    ocr_results.append(f"=== 第 {page_num + 1} 页 ===")
-                    ocr_results.extend(page_text)
-                    
-                    # 释放当前页的资源，避免内存泄漏
-                    del img_cv, img
-                    if 'bitmap' in locals():
-                        del bitmap
-                    if 'result_list' in locals():
-                        del result_list
-                    if 'result' in locals():
-                        del result
-                    if 'rec_texts' in locals():
-                        del rec_texts
-                    
-                    # 强制进行垃圾回收
-                    import gc
-                    gc.collect()
-                    
-                except Exception as e:
-                    logger.error(f"处理第 {page_num + 1} 页时出错: {str(e)}")
+                if self._doc_deadline is not None and time.time() >= self._doc_deadline:
+                    # 文档时间预算已用尽，剩余页面直接标记为超时
+                    record = self._timeout_record(page_num)
+                else:
+                    record = self._process_page(pdf, page_num)
+                if record is None:
                     # 继续处理下一页，而不是整个文件失败
                     continue
+                if record.get('status') == 'timeout':
+                    # 超时页只在结果中标记，不写入进度日志，续跑时会重新尝试
+                    writer.write_page(record)
+                    timed_out_pages += 1
+                    continue
+                
+                # 当前页识别结果立即写入进度日志和结果文件
+                journal.append(record)
+                writer.write_page(record)
+                pages_written += 1
+                if self.index_path:
+                    indexed_pages.append((record['page'], '\n'.join(record['lines'])))
+            
+            if preempted:
+                # 结果文件在文档完成后才生成，进度日志保留供再次调用时续跑
+                logger.info(f"在第 {page_num + 1}/{total_pages} 页前让出，已完成的页保留在进度日志中")
+                return None
+            
+            if timed_out_pages:
+                logger.warning(f"共 {timed_out_pages} 页识别超时，已在结果中标记")
+            if self.last_dedup_hits:
+                logger.info(f"共 {self.last_dedup_hits} 页与已识别页面重复，复用了已有结果")
+            if self.last_direct_pages:
+                logger.info(f"共 {self.last_direct_pages} 页为扫描页，直接解码了内嵌图像")
+            if self.last_cache_hits:
+                logger.info(f"共 {self.last_cache_hits} 页命中渲染缓存，跳过了渲染与缩放")
+            if self.last_route_counts:
+                logger.info(f"自动路由: {', '.join(f'{route_model} {count} 页' for route_model, count in self.last_route_counts.items())}")
             
             # 保存识别结果（即使部分页面处理失败）
-            if ocr_results:
-                with open(output_txt_path, 'w', encoding='utf-8') as f:
-                    f.write('\n'.join(ocr_results))
-                logger.info(f"PDF文件处理完成，结果保存至: {output_txt_path}")
+            if timed_out_pages:
+                # 保留进度日志，下次处理时只重新识别超时页面；文档不计为成功，避免被输出清单标记为最新
+                writer.commit()
+                self._index_document(output_path, source_path, indexed_pages)
+                logger.warning(f"PDF文件部分页面识别超时，结果保存至: {output_path}")
+                partial = True
+                return PROCESS_PARTIAL
+            elif pages_written:
+                writer.commit()
+                journal.remove()
+                self._index_document(output_path, source_path, indexed_pages)
+                logger.info(f"PDF文件处理完成，结果保存至: {output_path}")
                 success = True
                 return True
             else:
+                journal.remove()
                 logger.warning(f"PDF文件处理完成，但未识别到任何文本: {pdf_path}")
                 success = False
                 return False
@@ -598,6 +2478,14 @@ class PDFOCRHandler:
             return False
             
         finally:
+            if writer is not None:
+                writer.abort()
+            if journal is not None:
+                journal.close()
+            # 及时关闭文档，守护进程长时间运行时不累积文件句柄
+            if pdf is not None:
+                pdf.close()
+            
             # 计算处理耗时
             end_time = time.time()
             elapsed_time = end_time - start_time
@@ -610,46 +2498,577 @@ class PDFOCRHandler:
             logger.info(f"文件大小: {file_size_mb:.2f}MB")
             logger.info(f"总页数: {total_pages}")
             logger.info(f"处理耗时: {elapsed_time:.2f}秒")
-            logger.info(f"处理结果: {'成功' if success else '失败'}")
-            logger.info(f"输出路径: {output_txt_path if success else 'N/A'}")
+            result_str = "成功" if success else ("部分超时" if partial else ("已让出" if preempted else "失败"))
+            logger.info(f"处理结果: {result_str}")
+            logger.info(f"输出路径: {output_path if success or partial else 'N/A'}")
             logger.info("=" * 50)
             
-            # 将日志内容以表格形式输出到本地md文件
-            log_md_path = os.path.join(os.getcwd(), 'ocr_logs.md')
-            
-            # 检查文件是否存在，如果不存在则创建并添加表头
-            if not os.path.exists(log_md_path):
-                with open(log_md_path, 'w', encoding='utf-8') as f:
-                    f.write('# OCR识别日志\n\n')
-                    f.write('| 日期时间 | 文件名 | 文件大小 | 总页数 | 处理耗时 | 处理结果 | 输出路径 |\n')
-                    f.write('|---------|-------|---------|-------|---------|---------|---------|\n')
-            
+            # 将日志内容以表格形式输出到本地md文件（由常驻的报表处理器在后台线程追加）
             # 准备日志数据行
             log_time = time.strftime('%Y-%m-%d %H:%M:%S')
             file_name = os.path.basename(pdf_path)
             file_size_str = f"{file_size_mb:.2f}MB"
             pages_str = str(total_pages)
             elapsed_str = f"{elapsed_time:.2f}秒"
-            result_str = "成功" if success else "失败"
-            output_path_str = output_txt_path if success else "N/A"
+            output_path_str = output_path if success or partial else "N/A"
             
             # 生成Markdown表格行
-            log_row = f"| {log_time} | {file_name} | {file_size_str} | {pages_str} | {elapsed_str} | {result_str} | {output_path_str} |\n"
+            report_logger.info("| %s | %s | %s | %s | %s | %s | %s |", log_time, file_name, file_size_str, pages_str,
+                               elapsed_str, result_str, output_path_str)
+    
+    def _index_document(self, output_path, source_path, pages):
+        """结果文件提交后写入全文索引，索引失败只记录警告，不影响识别结果"""
+        if not self.index_path:
+            return
+        try:
+            if self.search_index is None:
+                self.search_index = SearchIndex(self.index_path)
+            self.search_index.index_document(output_path, pages, source_path, self.model)
+            logger.debug("已写入全文索引: %s（%d 页）", output_path, len(pages))
+        except Exception as e:
+            logger.warning(f"写入全文索引失败: {output_path}，错误信息: {str(e)}")
+    
+    def query_pdf(self, pdf_path, targets, page_order=DEFAULT_QUERY_ORDER, max_pages=None):
+        """
+        查询模式：按页序逐页识别，所有目标都找到后立即停止，不生成结果文件与进度日志
+        
+        Args:
+            pdf_path (str): PDF文件路径
+            targets (dict): 目标名称 -> 编译后的正则表达式（见 compile_query_targets）
+            page_order (str): 页序表达式（见 resolve_page_order）
+            max_pages (int): 最多识别的页数，默认不限制
+        
+        Returns:
+            dict: 查询结果（各目标的页码、值与所在行，未找到的目标，已识别的页码与耗时）
+        """
+        start_time = time.time()
+        logger.info(f"开始查询PDF文件: {pdf_path}，目标: {', '.join(targets)}")
+        self._current_source = os.path.basename(pdf_path)
+        self.last_dedup_hits = 0
+        self.last_route_counts = {}
+        self._doc_deadline = time.time() + self.doc_timeout if self.doc_timeout else None
+        found = {}
+        pages_processed = []
+        self._start_render_cache(pdf_path)
+        pdf = pdfium.PdfDocument(pdf_path)
+        try:
+            total_pages = len(pdf)
+            pages = resolve_page_order(total_pages, page_order)
+            if max_pages:
+                pages = pages[:max_pages]
+            for page_num in pages:
+                if self._doc_deadline is not None and time.time() >= self._doc_deadline:
+                    logger.warning(f"文档时间预算已用尽，停止查询: {pdf_path}")
+                    break
+                logger.log(self._page_log_level(page_num), "查询第 %d/%d 页", page_num + 1, total_pages)
+                record = self._process_page(pdf, page_num)
+                pages_processed.append(page_num + 1)
+                if record is None or record.get('status') == 'timeout':
+                    continue
+                match_query_targets(targets, record, found)
+                if len(found) == len(targets):
+                    break
+        finally:
+            pdf.close()
+        
+        missing = [name for name in targets if name not in found]
+        elapsed = time.time() - start_time
+        if missing:
+            logger.info(f"查询结束，识别 {len(pages_processed)}/{total_pages} 页，未找到: {', '.join(missing)}，耗时: {elapsed:.2f}秒")
+        else:
+            logger.info(f"所有目标已找到，识别 {len(pages_processed)}/{total_pages} 页后停止，耗时: {elapsed:.2f}秒")
+        return {
+            'file': os.path.basename(pdf_path),
+            'total_pages': total_pages,
+            'pages_processed': pages_processed,
+            'complete': not missing,
+            'matches': {name: found[name] for name in targets if name in found},
+            'missing': missing,
+            'elapsed': round(elapsed, 3)
+        }
+    
+    def _process_page(self, pdf, page_num):
+        """
+        渲染并识别单页
+        
+        Returns:
+            dict: 页面记录（页码、页面尺寸、文本行、文本框与置信度、Markdown），失败时返回None
+        """
+        # 本页的截止时间：每页时间预算与文档剩余时间取较早者
+        self._page_deadline = time.time() + self.page_timeout if self.page_timeout else None
+        if self._doc_deadline is not None:
+            self._page_deadline = min(self._page_deadline or self._doc_deadline, self._doc_deadline)
+        
+        page = None
+        img_cv = None
+        reserved_memory = 0
+        page_log_level = self._page_log_level(page_num)
+        try:
+            # 获取页面
+            page = pdf[page_num]
+            
+            # 在途页面的估算内存总量超出预算时等待
+            if self.memory_budget is not None:
+                reserved_memory = self._reserve_page_memory(page, page_num)
+            
+            # 分块模式：超出像素预算的页面按重叠分块以原始分辨率识别，而不是整页缩小
+            if self.tile_mode:
+                page_width_pt, page_height_pt = page.get_size()
+                full_width = math.ceil(page_width_pt * self.render_scale)
+                full_height = math.ceil(page_height_pt * self.render_scale)
+                if full_width * full_height > self.tile_size * self.tile_size:
+                    return self._process_page_tiled(page, page_num, full_width, full_height)
+            
+            # 渲染缓存命中时读取预处理好的页面图像，跳过渲染（解码）、裁剪与缩放；
+            # 内存映射是只读的，复制到缓冲池的可写数组中，后续处理与未命中时完全一致
+            cached = None
+            if self._render_cache_doc is not None:
+                cached = self.render_cache.load(self._render_cache_doc, page_num, self._render_cache_key)
+            if cached is not None:
+                cached_image, layout = cached
+                img_cv = self.buffer_pool.acquire(cached_image.shape)
+                np.copyto(img_cv, cached_image)
+                # 复制后即释放内存映射
+                del cached, cached_image
+                self.last_cache_hits += 1
+                if layout['direct']:
+                    self.last_direct_pages += 1
+                logger.log(page_log_level, "第 %d 页命中渲染缓存 (%dx%d)", page_num + 1, img_cv.shape[1], img_cv.shape[0])
+            else:
+                img_cv, layout = self._prepare_page_image(page, page_num, page_log_level)
+                if self._render_cache_doc is not None:
+                    self.render_cache.store(self._render_cache_doc, page_num, self._render_cache_key, img_cv, layout)
+            page_width, page_height = layout['width'], layout['height']
+            crop_x, crop_y = layout['crop_x'], layout['crop_y']
+            content_width, content_height = layout['content_width'], layout['content_height']
+            
+            # 与已识别页面近似重复时直接复用其结果（比较送入模型的图像，页面尺寸须一致）
+            if self.dedup_index is not None:
+                page_hash, thumbnail = self.dedup_index.fingerprint(img_cv)
+                page_shape = (page_height, page_width) + img_cv.shape
+                duplicate = self.dedup_index.lookup(page_hash, thumbnail, page_shape)
+                if duplicate is not None:
+                    self.dedup_hits += 1
+                    self.last_dedup_hits += 1
+                    logger.log(page_log_level, "第 %d 页与 %s 第 %d 页重复，复用识别结果",
+                               page_num + 1, duplicate['source'], duplicate['record']['page'])
+                    record = copy.deepcopy(duplicate['record'])
+                    record['page'] = page_num + 1
+                    record['duplicate_of'] = {'source': duplicate['source'], 'page': duplicate['record']['page']}
+                    return record
+            
+            # 自动路由：有表格框线的页面直接使用PP-StructureV3
+            route = self._route_page(img_cv) if self.auto_route else None
+            engine = self._get_structure_engine() if route and route['model'] == AUTO_STRUCTURE_MODEL else None
+            
+            # 执行OCR识别
+            logger.log(page_log_level, "开始识别第 %d 页内容...", page_num + 1)
+            
+            # 限制识别时间，避免长时间无响应（超时由受监管的推理子进程强制执行）
+            start_ocr_time = time.time()
+            try:
+                page_text, items, markdown = self._infer([img_cv], page_num, engine=engine)[0]
+                if route and route['model'] == AUTO_BASE_MODEL and detect_grid_layout(items):
+                    # 第二阶段：PP-OCRv5文本框呈多列网格分布（无框线表格或多栏版面）时改用PP-StructureV3重新识别
+                    route.update(model=AUTO_STRUCTURE_MODEL, reason='grid')
+                    page_text, items, markdown = self._infer([img_cv], page_num, engine=self._get_structure_engine())[0]
+                if route:
+                    logger.log(page_log_level, "第 %d 页路由至 %s（%s）", page_num + 1, route['model'], route['reason'])
+                    self.last_route_counts[route['model']] = self.last_route_counts.get(route['model'], 0) + 1
+                logger.log(page_log_level, "第 %d 页识别完成，耗时: %.2f秒", page_num + 1, time.time() - start_ocr_time)
+            except InferenceTimeout as e:
+                logger.error(f"第 {page_num + 1} 页识别超时: {str(e)}")
+                return self._timeout_record(page_num, page_width, page_height)
+            except Exception as e:
+                logger.error(f"第 {page_num + 1} 页识别失败: {str(e)}")
+                import traceback
+                logger.debug(f"完整错误堆栈: {traceback.format_exc()}")
+                return None
+            
+            # 文本框坐标从识别图像映射回页面渲染坐标（加回裁剪偏移）
+            scale_x = img_cv.shape[1] / content_width
+            scale_y = img_cv.shape[0] / content_height
+            for item in items:
+                item['box'] = [[round(x / scale_x + crop_x, 2), round(y / scale_y + crop_y, 2)] for x, y in item['box']]
+            
+            record = {
+                'page': page_num + 1,
+                'width': page_width,
+                'height': page_height,
+                'lines': page_text,
+                'items': items
+            }
+            if markdown:
+                record['markdown'] = markdown
+            if route:
+                record['route'] = route
+            
+            # 图像归还缓冲池，供下一页复用
+            self.buffer_pool.release(img_cv)
+            img_cv = None
+            
+            # 自适应精细识别：只对低置信度区域以更高分辨率重新渲染识别
+            if self.adaptive_mode:
+                self._refine_low_confidence(page, page_num, record)
+            
+            if self.dedup_index is not None:
+                self.dedup_index.add(page_hash, thumbnail, page_shape, record, self._current_source)
+            
+            return record
+            
+        except Exception as e:
+            logger.error(f"处理第 {page_num + 1} 页时出错: {str(e)}")
+            return None
+        finally:
+            # 及时关闭页面，不依赖垃圾回收释放pdfium资源
+            if img_cv is not None:
+                self.buffer_pool.release(img_cv)
+            if page is not None:
+                page.close()
+            if reserved_memory:
+                self.memory_budget.release(reserved_memory)
+    
+    def _prepare_page_image(self, page, page_num, page_log_level):
+        """
+        渲染（或直接解码）页面并裁剪空白边距、缩放到像素预算内，得到送入模型的图像
+        
+        Returns:
+            tuple: (缓冲池中的图像, 版面信息)，版面信息包含页面图像尺寸、裁剪偏移与内容区域尺寸，
+                用于把文本框坐标映射回页面，随图像一起写入渲染缓存
+        """
+        img_cv = None
+        try:
+            # 将页面转换为图像：只包含一张整页图像的扫描页直接以原始分辨率解码，跳过光栅化；其余页面整页渲染
+            img_cv = decode_page_image(page, self.buffer_pool, self.grayscale) if self.direct_image else None
+            direct = img_cv is not None
+            if direct:
+                self.last_direct_pages += 1
+                logger.log(page_log_level, "第 %d 页为扫描页，直接解码内嵌图像 (%dx%d)",
+                           page_num + 1, img_cv.shape[1], img_cv.shape[0])
+            else:
+                img_cv = self._render_page(page)
+            
+            # 裁掉空白边距：只把有墨迹的区域送入识别，文本框坐标再加回偏移
+            page_height, page_width = img_cv.shape[:2]
+            content = img_cv
+            crop_x, crop_y = 0, 0
+            if self.crop_margins:
+                bbox = find_content_bbox(img_cv)
+                if bbox is not None:
+                    crop_x, crop_y, crop_right, crop_bottom = bbox
+                    content = img_cv[crop_y:crop_bottom, crop_x:crop_right]
+                    logger.log(page_log_level, "第 %d 页裁剪空白边距 (%dx%d)，保留内容区域 %dx%d",
+                               page_num + 1, page_width, page_height, content.shape[1], content.shape[0])
+            
+            # 检查图像尺寸，如果过大则进行缩放
+            max_size = 6000  # 降低最大尺寸以提高处理速度
+            target_resolution = 300  # 设置目标分辨率
             
-            # 将日志行追加到文件
-            with open(log_md_path, 'a', encoding='utf-8') as f:
-                f.write(log_row)
+            height, width = content.shape[:2]
+            content_height, content_width = height, width
             
-            logger.info(f"日志已记录到Markdown文件: {log_md_path}")
+            if height > max_size or width > max_size:
+                # 计算缩放比例
+                scale_factor = max_size / max(height, width)
+                new_width = int(width * scale_factor)
+                new_height = int(height * scale_factor)
+                
+                logger.log(page_log_level, "图像尺寸过大 (%dx%d)，将缩放到 %dx%d", width, height, new_width, new_height)
+                height, width = new_height, new_width
+            
+            # 检查分辨率，如果过高则进一步降低
+            desired_max_resolution = 2000 * 2000  # 400万像素
+            if width * height > desired_max_resolution:
+                resolution_scale = (desired_max_resolution / (width * height)) ** 0.5
+                new_width = int(width * resolution_scale)
+                new_height = int(height * resolution_scale)
+                
+                logger.log(page_log_level, "图像分辨率过高 (%dx%d)，将缩放到 %dx%d", width, height, new_width, new_height)
+                height, width = new_height, new_width
+            
+            if (width, height) != (page_width, page_height):
+                # 裁剪与两步缩放合并为一次，直接写入缓冲池数组
+                resized = self.buffer_pool.acquire((height, width, 3))
+                if (width, height) == (content_width, content_height):
+                    np.copyto(resized, content)
+                else:
+                    cv2.resize(content, (width, height), dst=resized, interpolation=cv2.INTER_AREA)
+                content = None
+                self.buffer_pool.release(img_cv)
+                img_cv = resized
+        except BaseException:
+            if img_cv is not None:
+                self.buffer_pool.release(img_cv)
+            raise
+        layout = {
+            'width': page_width,
+            'height': page_height,
+            'crop_x': crop_x,
+            'crop_y': crop_y,
+            'content_width': content_width,
+            'content_height': content_height,
+            'direct': direct
+        }
+        return img_cv, layout
+    
+    def _start_render_cache(self, pdf_path):
+        """开始处理新文档：定位该文档的渲染缓存，并重置命中计数"""
+        self.last_cache_hits = 0
+        if self.render_cache is not None:
+            self._render_cache_doc = self.render_cache.document_key(pdf_path)
+    
+    def _page_log_level(self, page_num):
+        """逐页日志的级别：采样到的页为info，其余为debug（page_log_sample为0时全部为debug）"""
+        if self.page_log_sample == 1 or (self.page_log_sample and page_num % self.page_log_sample == 0):
+            return logging.INFO
+        return logging.DEBUG
+    
+    def _reserve_page_memory(self, page, page_num):
+        """按页面尺寸估算本页的峰值内存并向内存预算申请额度，返回占用的额度"""
+        page_width_pt, page_height_pt = page.get_size()
+        estimate = estimate_page_memory(page_width_pt, page_height_pt, self.model, self.render_scale, self.grayscale,
+                                        self.tile_mode, self.tile_size, self.tile_batch_size)
+        if estimate > self.memory_budget.limit:
+            logger.warning(f"第 {page_num + 1} 页预估内存 {estimate / (1024 * 1024):.0f}MB 超出内存预算 "
+                           f"{self.memory_budget.limit / (1024 * 1024):.0f}MB，将在其他页面完成后单独处理")
+        else:
+            logger.debug("第 %d 页预估内存: %.0fMB", page_num + 1, estimate / (1024 * 1024))
+        return self.memory_budget.acquire(estimate)
+    
+    def _create_engine(self, model):
+        """创建推理引擎：设置了时间预算时在受监管的子进程中推理，超时可终止并重建"""
+        logger.info(f"正在初始化{model}模型...")
+        if self.page_timeout or self.doc_timeout:
+            engine = SupervisedOCREngine(model, **self.engine_options)
+        else:
+            engine = LocalOCREngine(model, **self.engine_options)
+        logger.info(f"{model}模型初始化完成")
+        return engine
+    
+    def _get_structure_engine(self):
+        """自动路由使用的PP-StructureV3引擎（按需加载）"""
+        if self.structure_engine is None:
+            self.structure_engine = self._create_engine(AUTO_STRUCTURE_MODEL)
+        return self.structure_engine
+    
+    def _route_page(self, image):
+        """
+        自动路由的第一阶段：按表格框线判断页面是否需要PP-StructureV3
+        
+        Returns:
+            dict: 路由决定（模型、原因与检测到的框线数），写入页面记录的 route 字段
+        """
+        horizontal_lines, vertical_lines = detect_ruling_lines(image)
+        is_table = horizontal_lines >= 3 and vertical_lines >= 2
+        return {
+            'model': AUTO_STRUCTURE_MODEL if is_table else AUTO_BASE_MODEL,
+            'reason': 'rulings' if is_table else 'plain',
+            'h_lines': horizontal_lines,
+            'v_lines': vertical_lines
+        }
+    
+    def _infer(self, images, page_num, text_fallback=True, engine=None):
+        """在本页剩余的时间预算内识别一批图像（默认使用主引擎）"""
+        timeout = None
+        if self._page_deadline is not None:
+            timeout = self._page_deadline - time.time()
+        try:
+            return (engine or self.engine).infer(images, page_num, timeout=timeout, text_fallback=text_fallback)
+        except InferenceTimeout:
+            # 超时后推理可能仍在使用这些图像（如共享的微批引擎），不能再归还缓冲池复用
+            for image in images:
+                self.buffer_pool.discard(image)
+            raise
+    
+    def _release_images(self, images):
+        """识别完成后将图像归还缓冲池"""
+        for image in images:
+            self.buffer_pool.release(image)
+    
+    @staticmethod
+    def _timeout_record(page_num, width=None, height=None):
+        """识别超时的页面记录，在输出中标记而不是阻塞后续页面"""
+        return {
+            'page': page_num + 1,
+            'width': width,
+            'height': height,
+            'lines': [],
+            'items': [],
+            'status': 'timeout'
+        }
+    
+    def close(self):
+        """释放推理引擎（受监管模式下回收推理子进程）与图像缓冲池，共享引擎不在此关闭"""
+        if self._owns_engine:
+            self.engine.close()
+        if self._owns_structure_engine and self.structure_engine is not None:
+            self.structure_engine.close()
+            self.structure_engine = None
+        if self.search_index is not None:
+            self.search_index.close()
+            self.search_index = None
+        self.buffer_pool.clear()
+    
+    def _render_page(self, page, crop=(0, 0, 0, 0), scale=None):
+        """将页面（或其中一块区域）渲染为OpenCV图像"""
+        # 降低初始渲染分辨率，减少内存占用；使用灰度渲染可以进一步减少内存使用
+        bitmap = page.render(
+            scale=scale or self.render_scale,
+            rotation=0,
+            crop=crop,
+            grayscale=self.grayscale
+        )
+        try:
+            # 按位图模式转换为OpenCV格式（BGR），结果写入缓冲池数组，用完后需归还
+            return bitmap_to_bgr(bitmap, self.buffer_pool)
+        finally:
+            bitmap.close()
+    
+    def _render_region(self, page, region, scale=None):
+        """只渲染页面中的一块像素区域（按给定缩放比例下的像素坐标），避免整页高分辨率渲染占用内存"""
+        scale = scale or self.render_scale
+        page_width_pt, page_height_pt = page.get_size()
+        full_width = math.ceil(page_width_pt * scale)
+        full_height = math.ceil(page_height_pt * scale)
+        x0, y0, x1, y1 = region
+        # pypdfium2以画布单位指定裁剪量（左、下、右、上），并对 裁剪量×缩放比例 向上取整，
+        # 减去半个像素可保证取整后恰好落在目标像素边界上
+        crop = tuple((pixels - 0.5) / scale for pixels in
+                     (x0, full_height - y1, full_width - x1, y0))
+        return self._render_page(page, crop=crop, scale=scale)
+    
+    def _process_page_tiled(self, page, page_num, full_width, full_height):
+        """按重叠分块识别超大页面，合并各块结果并去除重叠区域中的重复文本框"""
+        tiles = compute_tile_grid(full_width, full_height, self.tile_size, self.tile_overlap)
+        logger.log(self._page_log_level(page_num), "第 %d 页尺寸 (%dx%d) 超出像素预算，分为 %d 块识别",
+                   page_num + 1, full_width, full_height, len(tiles))
+        
+        start_ocr_time = time.time()
+        items = []
+        # 分批渲染与识别，同一时刻最多只有一批分块在内存中
+        for batch_start in range(0, len(tiles), self.tile_batch_size):
+            batch = tiles[batch_start:batch_start + self.tile_batch_size]
+            images = [self._render_region(page, tile) for tile in batch]
+            try:
+                results = self._infer(images, page_num, text_fallback=False)
+            except InferenceTimeout as e:
+                logger.error(f"第 {page_num + 1} 页分块识别超时: {str(e)}")
+                return self._timeout_record(page_num, full_width, full_height)
+            except Exception as e:
+                logger.error(f"第 {page_num + 1} 页分块识别失败: {str(e)}")
+                return None
+            finally:
+                self._release_images(images)
+            for (x0, y0, x1, y1), (_, tile_items, _) in zip(batch, results):
+                for item in tile_items:
+                    # 标记被分块内部边界截断的文本框，供合并时拼接
+                    xs = [x for x, _ in item['box']]
+                    item['_cut_left'] = x0 > 0 and min(xs) <= 2
+                    item['_cut_right'] = x1 < full_width and max(xs) >= x1 - x0 - 2
+                    # 分块内坐标平移回整页坐标
+                    item['box'] = [[round(x + x0, 2), round(y + y0, 2)] for x, y in item['box']]
+                    items.append(item)
+        
+        items = merge_tile_items(items)
+        logger.log(self._page_log_level(page_num), "第 %d 页识别完成，耗时: %.2f秒", page_num + 1, time.time() - start_ocr_time)
+        return {
+            'page': page_num + 1,
+            'width': full_width,
+            'height': full_height,
+            'lines': [item['text'] for item in items],
+            'items': items
+        }
+    
+    def _refine_low_confidence(self, page, page_num, record):
+        """
+        对置信度低于阈值的文本行所在区域，按更高缩放比例只渲染该区域并重新识别
 
+        精细识别结果的平均置信度高于原结果时替换原文本行，结果直接更新到页面记录中。
+        """
+        items = record['items']
+        low_items = [item for item in items if item['score'] is not None and item['score'] < self.adaptive_threshold]
+        if not low_items:
+            return
+        
+        # 低置信度文本框外扩半个行高后合并为若干区域（页面渲染坐标）
+        bounds = get_item_bounds(low_items)
+        pad = max(float(np.median(bounds[:, 3] - bounds[:, 1])) / 2, 4.0)
+        regions = merge_regions([
+            (max(0.0, x0 - pad), max(0.0, y0 - pad), min(float(record['width']), x1 + pad), min(float(record['height']), y1 + pad))
+            for x0, y0, x1, y1 in bounds
+        ])
+        
+        ratio = self.adaptive_scale / self.render_scale
+        refined_pixels = 0
+        replaced_count = 0
+        all_bounds = get_item_bounds(items)
+        replaced = np.zeros(len(items), dtype=bool)
+        new_items = []
+        for batch_start in range(0, len(regions), self.tile_batch_size):
+            batch = regions[batch_start:batch_start + self.tile_batch_size]
+            # 区域坐标换算到高分辨率像素坐标
+            hi_regions = [(int(x0 * ratio), int(y0 * ratio), math.ceil(x1 * ratio), math.ceil(y1 * ratio))
+                          for x0, y0, x1, y1 in batch]
+            images = [self._render_region(page, hi_region, scale=self.adaptive_scale) for hi_region in hi_regions]
+            refined_pixels += sum(image.shape[0] * image.shape[1] for image in images)
+            try:
+                results = self._infer(images, page_num, text_fallback=False)
+            except Exception as e:
+                # 包括超时：第一轮结果已可用，保留原结果而不是阻塞
+                logger.warning(f"第 {page_num + 1} 页精细识别失败，保留原结果: {str(e)}")
+                return
+            finally:
+                self._release_images(images)
+            for (x0, y0, x1, y1), (hx0, hy0, _, _), (_, region_items, _) in zip(batch, hi_regions, results):
+                # 高分辨率区域坐标映射回页面渲染坐标
+                for item in region_items:
+                    item['box'] = [[round((x + hx0) / ratio, 2), round((y + hy0) / ratio, 2)] for x, y in item['box']]
+                # 中心落在区域内的低置信度文本行为候选替换对象
+                centers_x = (all_bounds[:, 0] + all_bounds[:, 2]) / 2
+                centers_y = (all_bounds[:, 1] + all_bounds[:, 3]) / 2
+                in_region = (centers_x >= x0) & (centers_x <= x1) & (centers_y >= y0) & (centers_y <= y1)
+                candidates = in_region & np.array([item['score'] is not None and item['score'] < self.adaptive_threshold
+                                                   for item in items])
+                old_scores = [items[idx]['score'] for idx in np.flatnonzero(candidates)]
+                new_scores = [item['score'] for item in region_items if item['score'] is not None]
+                if not old_scores or not new_scores or np.mean(new_scores) <= np.mean(old_scores):
+                    continue
+                replaced |= candidates
+                replaced_count += len(old_scores)
+                # 区域外扩部分可能覆盖相邻文本行，丢弃与区域外文本行重复的精细识别结果
+                kept_bounds = all_bounds[~candidates]
+                for item, (bx0, by0, bx1, by1) in zip(region_items, get_item_bounds(region_items)):
+                    if len(kept_bounds):
+                        inter_w = np.clip(np.minimum(bx1, kept_bounds[:, 2]) - np.maximum(bx0, kept_bounds[:, 0]), 0, None)
+                        inter_h = np.clip(np.minimum(by1, kept_bounds[:, 3]) - np.maximum(by0, kept_bounds[:, 1]), 0, None)
+                        kept_areas = (kept_bounds[:, 2] - kept_bounds[:, 0]) * (kept_bounds[:, 3] - kept_bounds[:, 1])
+                        area = max((bx1 - bx0) * (by1 - by0), 1e-6)
+                        if np.any(inter_w * inter_h / np.maximum(np.minimum(area, kept_areas), 1e-6) > 0.5):
+                            continue
+                    new_items.append(item)
+        
+        if replaced_count:
+            # 相邻区域的精细识别结果之间也可能重复
+            merged_items = [item for idx, item in enumerate(items) if not replaced[idx]] + merge_tile_items(new_items)
+            order = reading_order(get_item_bounds(merged_items), list(range(len(merged_items))))
+            record['items'] = [merged_items[idx] for idx in order]
+            record['lines'] = [item['text'] for item in record['items']]
+        
+        full_pixels = math.ceil(record['width'] * ratio) * math.ceil(record['height'] * ratio)
+        logger.log(self._page_log_level(page_num), "第 %d 页精细识别 %d 个低置信度区域，替换 %d 行，高分辨率像素占整页的 %.1f%%",
+                   page_num + 1, len(regions), replaced_count, refined_pixels / max(full_pixels, 1) * 100)
+    
 class PDFFileHandler(FileSystemEventHandler):
     """监控目录中的新PDF文件（同步处理）"""
-    def __init__(self, output_dir, model='pp-ocrv5', optimize_pdf=False, optimize_level='medium', grayscale=False):
+    def __init__(self, output_dir, model='pp-ocrv5', **handler_options):
         self.output_dir = output_dir
         self.model = model
-        self.optimize_pdf_flag = optimize_pdf
-        self.optimize_level = optimize_level
-        self.grayscale = grayscale
+        # 透传给PDFOCRHandler的处理选项（优化、灰度、推理线程数等）
+        self.handler_options = handler_options
+        # 常驻的OCR处理器：模型只加载一次，各文件复用（推理超时由受监管引擎自行重建子进程），
+        # 处理时抛出异常才关闭，下一个文件前重新创建
+        self._ocr_handler = None
+        self._lock = threading.Lock()
         logger.info(f"初始化守护模式处理器，使用模型: {model}")
     
     def on_created(self, event):
@@ -661,35 +3080,182 @@ class PDFFileHandler(FileSystemEventHandler):
             # 直接同步处理
             self.process_pdf_task(event.src_path)
     
-    def process_pdf_task(self, pdf_path):
+    def process_pdf_task(self, pdf_path, source_path=None):
         """处理单个PDF文件的任务"""
         logger.info(f"开始处理文件: {os.path.basename(pdf_path)}")
         
-        # 每个任务创建自己的OCR处理器
-        ocr_handler = PDFOCRHandler(
-            self.output_dir, 
-            self.model,
-            optimize_pdf=self.optimize_pdf_flag,
-            optimize_level=self.optimize_level,
-            grayscale=self.grayscale
-        )
-        try:
-            result = ocr_handler.process_pdf(pdf_path)
-            logger.info(f"完成处理文件: {os.path.basename(pdf_path)}, 结果: {'成功' if result else '失败'}")
-            return result
-        except Exception as e:
-            logger.error(f"处理文件 {os.path.basename(pdf_path)} 时出错: {str(e)}")
-            import traceback
-            logger.debug(f"完整错误堆栈: {traceback.format_exc()}")
-            return False
+        with self._lock:
+            try:
+                if self._ocr_handler is None:
+                    self._ocr_handler = PDFOCRHandler(
+                        self.output_dir, 
+                        self.model,
+                        **self.handler_options
+                    )
+                result = self._ocr_handler.process_pdf(pdf_path, source_path=source_path)
+                result_str = '成功' if result is True else ('部分超时' if result == PROCESS_PARTIAL else '失败')
+                logger.info(f"完成处理文件: {os.path.basename(pdf_path)}, 结果: {result_str}")
+                return result
+            except Exception as e:
+                logger.error(f"处理文件 {os.path.basename(pdf_path)} 时出错: {str(e)}")
+                import traceback
+                logger.debug(f"完整错误堆栈: {traceback.format_exc()}")
+                self._close_ocr_handler()
+                return False
+    
+    def _close_ocr_handler(self):
+        """关闭常驻的OCR处理器（下一个文件前重新创建）"""
+        if self._ocr_handler is not None:
+            try:
+                self._ocr_handler.close()
+            except Exception as e:
+                logger.warning(f"关闭OCR处理器失败: {str(e)}")
+            self._ocr_handler = None
     
     def shutdown(self):
         """关闭处理器"""
         logger.info("正在关闭守护模式处理器...")
+        with self._lock:
+            self._close_ocr_handler()
         logger.info("守护模式处理器已关闭")
 
-def run_manual_mode(input_dir, output_dir, model='pp-ocrv5', optimize_pdf=False, optimize_level='medium', grayscale=False):
-    """手动模式：处理输入目录中已存在的所有PDF文件（同步处理）"""
+# 多进程手动模式下，每个工作进程持有一个常驻的OCR处理器（模型只加载一次）
+_worker_handler = None
+
+def _init_manual_worker(output_dir, model, handler_options, log_config=(None, logging.INFO)):
+    """工作进程初始化：日志发回父进程统一写入，限制线程数并加载模型"""
+    global _worker_handler
+    setup_logging(*log_config)
+    cpu_threads = handler_options.get('cpu_threads') or resolve_engine_options(
+        handler_options.get('profile'), handler_options.get('engine_options'), model).get('cpu_threads')
+    if cpu_threads:
+        # 限制底层数学库线程数，避免多个进程争抢CPU
+        for env_name in ['OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS']:
+            os.environ[env_name] = str(cpu_threads)
+        cv2.setNumThreads(1)
+    _worker_handler = PDFOCRHandler(output_dir, model, **handler_options)
+
+def _process_pdf_in_worker(pdf_path):
+    """在工作进程中处理单个PDF文件，返回可序列化的结果摘要"""
+    start_time = time.time()
+    try:
+        result = _worker_handler.process_pdf(pdf_path)
+        error = None
+    except Exception as e:
+        result = False
+        error = str(e)
+    return {
+        'path': pdf_path,
+        'success': result is True,
+        'partial': result == PROCESS_PARTIAL,
+        'error': error,
+        'elapsed': time.time() - start_time,
+        'pid': os.getpid(),
+        'dedup_hits': _worker_handler.last_dedup_hits
+    }
+
+def _log_manual_summary(summary):
+    """输出手动模式的汇总统计"""
+    logger.info("=" * 50)
+    logger.info("手动模式处理汇总")
+    logger.info(f"工作进程数: {summary['workers']}")
+    logger.info(f"文件总数: {summary['total']}")
+    logger.info(f"成功: {summary['success']} 个")
+    logger.info(f"失败: {summary['failed']} 个")
+    if summary['partial']:
+        logger.info(f"部分页面超时: {summary['partial']} 个（结果已保存，再次运行时只重新识别超时页面）")
+    logger.info(f"跳过（结果已是最新）: {summary['skipped']} 个")
+    if summary['dedup_hits']:
+        logger.info(f"重复页面（复用已有结果）: {summary['dedup_hits']} 页")
+    logger.info(f"总耗时: {summary['elapsed']:.2f}秒")
+    if summary['elapsed'] > 0:
+        logger.info(f"吞吐量: {summary['total'] / summary['elapsed'] * 60:.2f} 个文件/分钟")
+    for failed_file in summary['failed_files']:
+        logger.info(f"失败文件: {failed_file}")
+    logger.info("=" * 50)
+
+# 同一文件所在的进程池崩溃（工作进程被OOM等终止）的次数达到上限时标记为失败，不再重试
+MANUAL_MAX_POOL_CRASHES = 2
+
+def _run_manual_pool(pdf_paths, workers, document_memory, record_result, summary, initargs, memory_budget=None):
+    """
+    使用进程池并行处理文件
+    
+    同时在途的文档数不超过进程数；设置了内存预算时，只在最大页的估算内存能放入预算时才提交文档。
+    工作进程异常退出后进程池不可再用：在途文件重新排队（从进度日志继续），重建进程池后继续处理，
+    同一文件累计遇到 MANUAL_MAX_POOL_CRASHES 次崩溃时标记为失败。
+    """
+    pending = list(pdf_paths)
+    crashes = {}
+    while pending:
+        executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_manual_worker,
+            initargs=initargs
+        )
+        futures = {}
+        interrupted = []
+        try:
+            while (pending or futures) and not interrupted:
+                while pending and len(futures) < workers:
+                    index = 0
+                    if memory_budget is not None:
+                        # 按大文件优先的顺序，选第一个放得下的文档
+                        index = next((i for i, pdf_path in enumerate(pending)
+                                      if memory_budget.fits(document_memory[pdf_path])), None)
+                        if index is None:
+                            break
+                    pdf_path = pending.pop(index)
+                    reserved = memory_budget.acquire(document_memory[pdf_path]) if memory_budget is not None else 0
+                    try:
+                        futures[executor.submit(_process_pdf_in_worker, pdf_path)] = (pdf_path, reserved)
+                    except BrokenProcessPool:
+                        if reserved:
+                            memory_budget.release(reserved)
+                        interrupted.append(pdf_path)
+                        break
+                if not futures:
+                    break
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    pdf_path, reserved = futures.pop(future)
+                    if reserved:
+                        memory_budget.release(reserved)
+                    try:
+                        outcome = future.result()
+                    except BrokenProcessPool:
+                        interrupted.append(pdf_path)
+                        continue
+                    except Exception as e:
+                        logger.error(f"工作进程处理文件 {os.path.basename(pdf_path)} 时出错: {str(e)}")
+                        record_result(pdf_path, False)
+                        continue
+                    if outcome['error']:
+                        logger.error(f"处理文件 {os.path.basename(pdf_path)} 时出错: {outcome['error']}")
+                    record_result(pdf_path, outcome['success'], outcome['partial'])
+                    summary['dedup_hits'] += outcome['dedup_hits']
+        finally:
+            # 进程池崩溃时其余在途文件也已中断
+            for pdf_path, reserved in futures.values():
+                if reserved:
+                    memory_budget.release(reserved)
+                interrupted.append(pdf_path)
+            executor.shutdown(wait=True, cancel_futures=True)
+        
+        if interrupted:
+            logger.error(f"工作进程异常退出（如被OOM终止），进程池已重建，中断的文件: "
+                         f"{', '.join(os.path.basename(pdf_path) for pdf_path in interrupted)}")
+        for pdf_path in reversed(interrupted):
+            crashes[pdf_path] = crashes.get(pdf_path, 0) + 1
+            if crashes[pdf_path] >= MANUAL_MAX_POOL_CRASHES:
+                logger.error(f"文件 {os.path.basename(pdf_path)} 所在的工作进程已 {crashes[pdf_path]} 次异常退出，标记为失败")
+                record_result(pdf_path, False)
+            else:
+                pending.insert(0, pdf_path)
+
+def run_manual_mode(input_dir, output_dir, model='pp-ocrv5', workers=1, force=False, **handler_options):
+    """手动模式：处理输入目录中已存在的所有PDF文件（支持多进程并行，默认跳过结果已是最新的文件）"""
     logger.info(f"手动模式启动，处理目录: {input_dir}")
     
     # 获取输入目录中的所有PDF文件
@@ -699,56 +3265,454 @@ def run_manual_mode(input_dir, output_dir, model='pp-ocrv5', optimize_pdf=False,
     
     if not pdf_files:
         logger.info(f"目录中没有找到PDF文件: {input_dir}")
-        return
+        return None
     
     logger.info(f"找到 {len(pdf_files)} 个PDF文件")
     
-    # 初始化OCR处理器
-    ocr_handler = PDFOCRHandler(
-        output_dir, 
-        model,
-        optimize_pdf=optimize_pdf,
-        optimize_level=optimize_level,
-        grayscale=grayscale
-    )
+    # 大文件优先调度，缩短整体完成时间
+    pdf_paths = sorted((os.path.join(input_dir, f) for f in pdf_files),
+                       key=os.path.getsize, reverse=True)
     
-    # 同步处理所有PDF文件
-    success_count = 0
-    failed_count = 0
+    # 根据输出清单跳过源文件与处理选项均未变化的文件
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = OutputManifest(output_dir)
+    output_options = get_output_options(model, handler_options)
+    output_format = output_options['output_format']
+    skipped_count = 0
+    if not force:
+        pending_paths = [pdf_path for pdf_path in pdf_paths
+                         if not manifest.is_up_to_date(pdf_path, get_output_path(output_dir, pdf_path, output_format), output_options)]
+        skipped_count = len(pdf_paths) - len(pending_paths)
+        pdf_paths = pending_paths
+        if skipped_count:
+            logger.info(f"跳过 {skipped_count} 个结果已是最新的文件（使用 --force 强制重新处理）")
     
-    for pdf_file in pdf_files:
-        pdf_path = os.path.join(input_dir, pdf_file)
-        logger.info(f"开始处理文件: {pdf_file}")
-        
+    workers = max(1, min(workers or 1, max(len(pdf_paths), 1)))
+    engine_threads = resolve_engine_options(handler_options.get('profile'), handler_options.get('engine_options'), model).get('cpu_threads')
+    if workers > 1 and not handler_options.get('cpu_threads') and not engine_threads:
+        # 按进程数切分CPU核心，每个进程的推理线程数之和不超过核心数
+        handler_options['cpu_threads'] = max(1, (os.cpu_count() or 1) // workers)
+    
+    summary = {
+        'workers': workers,
+        'total': len(pdf_paths),
+        'success': 0,
+        'failed': 0,
+        'partial': 0,
+        'skipped': skipped_count,
+        'failed_files': [],
+        'dedup_hits': 0,
+        'elapsed': 0.0
+    }
+    start_time = time.time()
+    
+    def record_result(pdf_path, success, partial=False):
+        if success:
+            summary['success'] += 1
+            manifest.record(pdf_path, get_output_path(output_dir, pdf_path, output_format), output_options)
+        elif partial:
+            # 部分页面超时：不记入输出清单，再次运行时从进度日志续跑超时页面
+            summary['partial'] += 1
+        else:
+            summary['failed'] += 1
+            summary['failed_files'].append(os.path.basename(pdf_path))
+        result_str = '成功' if success else ('部分超时' if partial else '失败')
+        logger.info(f"完成处理文件: {os.path.basename(pdf_path)}, 结果: {result_str} "
+                    f"({summary['success'] + summary['failed'] + summary['partial']}/{summary['total']})")
+    
+    try:
+        if not pdf_paths:
+            logger.info("所有文件的识别结果均已是最新，无需处理")
+        elif workers == 1:
+            # 单进程：复用一个OCR处理器顺序处理
+            ocr_handler = PDFOCRHandler(output_dir, model, **handler_options)
+            try:
+                for pdf_path in pdf_paths:
+                    logger.info(f"开始处理文件: {os.path.basename(pdf_path)}")
+                    try:
+                        result = ocr_handler.process_pdf(pdf_path)
+                    except Exception as e:
+                        logger.error(f"处理文件 {os.path.basename(pdf_path)} 时出错: {str(e)}")
+                        import traceback
+                        logger.debug(f"完整错误堆栈: {traceback.format_exc()}")
+                        result = False
+                    record_result(pdf_path, result is True, result == PROCESS_PARTIAL)
+                    summary['dedup_hits'] += ocr_handler.last_dedup_hits
+            finally:
+                ocr_handler.close()
+        else:
+            # 多进程：每个进程持有一个常驻模型，使用spawn避免继承父进程的推理线程状态
+            logger.info(f"使用 {workers} 个工作进程并行处理，每个进程推理线程数: {handler_options.get('cpu_threads') or engine_threads}")
+            memory_budget_mb = handler_options.get('memory_budget_mb')
+            document_memory = {}
+            if memory_budget_mb:
+                for pdf_path in pdf_paths:
+                    document_memory[pdf_path] = estimate_pdf_file_memory(pdf_path, model, handler_options)
+                logger.info(f"内存预算: {memory_budget_mb}MB，文档峰值内存估算: "
+                            f"{max(document_memory.values()) / (1024 * 1024):.0f}MB（最大）")
+            _run_manual_pool(pdf_paths, workers, document_memory, record_result, summary,
+                             initargs=(output_dir, model, handler_options, get_worker_log_config()),
+                             memory_budget=MemoryBudget(memory_budget_mb * 1024 * 1024) if memory_budget_mb else None)
+    finally:
+        # 批处理中途异常或被中断时，已成功文件的清单与汇总同样保存
+        manifest.save()
+        summary['elapsed'] = time.time() - start_time
+        _log_manual_summary(summary)
+    return summary
+
+def normalize_benchmark_text(text):
+    """去除页码分隔行、超时标记与所有空白字符，便于与标准文本逐字比较"""
+    lines = [line for line in text.splitlines()
+             if not (line.startswith('=== 第 ') and line.endswith(' 页 ===')) and line != TIMEOUT_MARKER]
+    return ''.join(''.join(lines).split())
+
+def character_error_rate(reference, hypothesis):
+    """字符错误率：编辑距离除以标准文本长度"""
+    if not reference:
+        return 0.0 if not hypothesis else 1.0
+    previous = list(range(len(hypothesis) + 1))
+    for i, ref_char in enumerate(reference, 1):
+        current = [i]
+        for j, hyp_char in enumerate(hypothesis, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref_char != hyp_char)))
+        previous = current
+    return previous[-1] / len(reference)
+
+def write_query_result(output_dir, pdf_path, result):
+    """将查询结果原子写入 输出目录/<文件名>.query.json"""
+    output_path = os.path.join(output_dir, os.path.splitext(os.path.basename(pdf_path))[0] + '.query.json')
+    tmp_path = output_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, output_path)
+    return output_path
+
+
+def run_query_mode(input_path, output_dir, model='pp-ocrv5', targets=None, page_order=DEFAULT_QUERY_ORDER,
+                   max_pages=None, **handler_options):
+    """查询模式：在单个PDF文件或目录中的所有PDF文件中查找目标，每个文件找齐后立即停止识别"""
+    if os.path.isfile(input_path):
+        pdf_paths = [input_path]
+    else:
+        pdf_paths = sorted(os.path.join(input_path, f) for f in os.listdir(input_path) if f.lower().endswith('.pdf'))
+    if not pdf_paths:
+        logger.info(f"目录中没有找到PDF文件: {input_path}")
+        return []
+    
+    # 查询只读取识别结果，不生成结果文件与进度日志
+    query_options = {key: value for key, value in handler_options.items()
+                     if key not in ('output_format', 'resume', 'index_path')}
+    ocr_handler = PDFOCRHandler(output_dir, model, **query_options)
+    results = []
+    try:
+        for pdf_path in pdf_paths:
+            try:
+                result = ocr_handler.query_pdf(pdf_path, targets, page_order, max_pages)
+            except Exception as e:
+                logger.error(f"查询PDF文件时出错: {pdf_path}，错误信息: {str(e)}")
+                continue
+            output_path = write_query_result(output_dir, pdf_path, result)
+            for name, match in result['matches'].items():
+                logger.info(f"{result['file']} 第 {match['page']} 页 {name}: {match['value']}")
+            logger.info(f"查询结果已保存至: {output_path}")
+            results.append(result)
+    finally:
+        ocr_handler.close()
+    
+    total_pages = sum(result['total_pages'] for result in results)
+    processed_pages = sum(len(result['pages_processed']) for result in results)
+    logger.info(f"查询完成: {len(results)}/{len(pdf_paths)} 个文件，其中 {sum(result['complete'] for result in results)} 个找齐全部目标，"
+                f"识别 {processed_pages}/{total_pages} 页")
+    return results
+
+
+def run_benchmark_mode(input_dir, output_dir, model='pp-ocrv5', profiles=None, **handler_options):
+    """
+    基准测试模式：用各性能档位识别参考集，对比速度与准确率
+
+    参考集为输入目录中的PDF文件，同名的 .txt 文件作为标准文本（没有标准文本的文件只统计速度）。
+    各档位的识别结果保存在 输出目录/benchmark/<档位> 下，对比表格写入 输出目录/benchmark.md。
+    """
+    profiles = profiles or list(ENGINE_PROFILES)
+    pdf_paths = sorted(os.path.join(input_dir, f) for f in os.listdir(input_dir) if f.lower().endswith('.pdf'))
+    if not pdf_paths:
+        logger.info(f"目录中没有找到PDF文件: {input_dir}")
+        return None
+    
+    references = {}
+    for pdf_path in pdf_paths:
+        reference_path = os.path.splitext(pdf_path)[0] + '.txt'
+        if os.path.exists(reference_path):
+            with open(reference_path, 'r', encoding='utf-8') as f:
+                references[pdf_path] = normalize_benchmark_text(f.read())
+    logger.info(f"基准测试: {len(pdf_paths)} 个PDF文件，其中 {len(references)} 个有标准文本，档位: {', '.join(profiles)}")
+    
+    page_counts = {}
+    for pdf_path in pdf_paths:
+        pdf = pdfium.PdfDocument(pdf_path)
+        page_counts[pdf_path] = len(pdf)
+        pdf.close()
+    total_pages = sum(page_counts.values())
+    
+    # 基准测试固定输出纯文本、不续跑、不使用渲染缓存（各档位的耗时都包含渲染），其余处理选项与命令行一致
+    benchmark_options = {key: value for key, value in handler_options.items()
+                         if key not in ('profile', 'output_format', 'resume', 'index_path', 'render_cache_dir')}
+    results = []
+    for profile in profiles:
+        profile_dir = os.path.join(output_dir, 'benchmark', profile)
+        ocr_handler = PDFOCRHandler(profile_dir, model, profile=profile, output_format='txt', resume=False,
+                                    **benchmark_options)
         try:
-            result = ocr_handler.process_pdf(pdf_path)
-            if result:
-                success_count += 1
-                logger.info(f"完成处理文件: {pdf_file}, 结果: 成功")
-            else:
-                failed_count += 1
-                logger.info(f"完成处理文件: {pdf_file}, 结果: 失败")
-        except Exception as e:
-            logger.error(f"处理文件 {pdf_file} 时出错: {str(e)}")
-            import traceback
-            logger.debug(f"完整错误堆栈: {traceback.format_exc()}")
-            failed_count += 1
+            # 预热一次推理，避免首次推理的初始化开销计入耗时
+            ocr_handler.engine.infer([np.full((64, 256, 3), 255, dtype=np.uint8)], text_fallback=False)
+            elapsed = 0.0
+            error_rates = []
+            failed = 0
+            for pdf_path in pdf_paths:
+                start_time = time.time()
+                success = ocr_handler.process_pdf(pdf_path)
+                elapsed += time.time() - start_time
+                output_path = get_output_path(profile_dir, pdf_path, 'txt')
+                if success is not True or not os.path.exists(output_path):
+                    failed += 1
+                    continue
+                if pdf_path in references:
+                    with open(output_path, 'r', encoding='utf-8') as f:
+                        error_rates.append(character_error_rate(references[pdf_path], normalize_benchmark_text(f.read())))
+        finally:
+            ocr_handler.close()
+        results.append({
+            'profile': profile,
+            'elapsed': elapsed,
+            'pages_per_minute': total_pages / elapsed * 60 if elapsed > 0 else 0.0,
+            'cer': sum(error_rates) / len(error_rates) if error_rates else None,
+            'failed': failed
+        })
     
-    logger.info(f"手动模式处理完成，成功: {success_count} 个，失败: {failed_count} 个，总计: {len(pdf_files)} 个")
+    table = [
+        f"# OCR性能档位基准测试\n",
+        f"- 日期时间: {time.strftime('%Y-%m-%d %H:%M:%S')}",
+        f"- 模型: {model}",
+        f"- 参考集: {input_dir}（{len(pdf_paths)} 个文件，{total_pages} 页，{len(references)} 个有标准文本）\n",
+        '| 档位 | 总耗时 | 页/分钟 | 平均字符错误率 | 失败文件数 |',
+        '|------|-------|--------|--------------|-----------|'
+    ]
+    for result in results:
+        cer_str = f"{result['cer'] * 100:.2f}%" if result['cer'] is not None else 'N/A'
+        table.append(f"| {result['profile']} | {result['elapsed']:.2f}秒 | {result['pages_per_minute']:.2f} | "
+                     f"{cer_str} | {result['failed']} |")
+    table_path = os.path.join(output_dir, 'benchmark.md')
+    with open(table_path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(table) + '\n')
+    for line in table:
+        logger.info(line)
+    logger.info(f"基准测试结果已保存至: {table_path}")
+    return results
+
+class SpoolCoordinator:
+    """
+    共享投递目录的多节点协调（基于共享文件系统的租约协议）
+
+    多个守护进程（可位于不同主机）监控同一个投递目录（如NFS）时：
+    - 认领：节点空闲时把一个待处理文件原子重命名到 .spool/inprogress/<节点ID>/，重命名成功者获得该文件；
+    - 租约：节点定期刷新 .spool/nodes/<节点ID>.lease，超过租约时长未刷新即视为节点失效；
+    - 回收：存活节点把失效节点正在处理的文件移回投递目录，由各节点重新认领；
+    - 拉取：节点只在空闲时认领下一个文件，处理快的节点自然处理更多文件。
+    处理成功的文件移至 .spool/done/，失败的移至 .spool/failed/。
+    租约是否过期以本节点租约文件的mtime为当前时间来判断（均由文件服务器写入），不受节点间时钟偏差影响。
+    """
+
+    def __init__(self, input_dir, node_id=None, lease_timeout=60):
+        self.input_dir = input_dir
+        self.node_id = self.sanitize_node_id(node_id or f"{socket.gethostname()}-{os.getpid()}")
+        self.lease_timeout = lease_timeout
+        self.spool_dir = os.path.join(input_dir, '.spool')
+        self.nodes_dir = os.path.join(self.spool_dir, 'nodes')
+        self.inprogress_root = os.path.join(self.spool_dir, 'inprogress')
+        self.inprogress_dir = os.path.join(self.inprogress_root, self.node_id)
+        self.done_dir = os.path.join(self.spool_dir, 'done')
+        self.failed_dir = os.path.join(self.spool_dir, 'failed')
+        self.lease_path = os.path.join(self.nodes_dir, f"{self.node_id}.lease")
+        self.processed = 0
+        self.current = None
+        # 上一次扫描时各文件的大小与修改时间，两次扫描一致才认领（文件已写完）
+        self._seen = {}
+        self._stop_event = threading.Event()
+        self._heartbeat_thread = None
+
+    @staticmethod
+    def sanitize_node_id(node_id):
+        """节点ID用作目录名，替换路径分隔符等不安全字符"""
+        return ''.join(c if c.isalnum() or c in '-_.' else '_' for c in node_id)
+
+    def start(self):
+        """写入租约并启动心跳线程（先写租约再创建认领目录，避免被其他节点误回收）"""
+        for dir_path in [self.nodes_dir, self.inprogress_root, self.done_dir, self.failed_dir]:
+            os.makedirs(dir_path, exist_ok=True)
+        self.heartbeat()
+        os.makedirs(self.inprogress_dir, exist_ok=True)
+        self._heartbeat_thread = threading.Thread(target=self._run_heartbeat, name='spool-heartbeat', daemon=True)
+        self._heartbeat_thread.start()
+        logger.info(f"共享投递目录协调已启动: 节点ID={self.node_id}, 租约时长={self.lease_timeout}秒, 目录={self.spool_dir}")
+
+    def stop(self):
+        """停止心跳，把未完成的文件放回投递目录并释放租约"""
+        self._stop_event.set()
+        if self._heartbeat_thread is not None:
+            self._heartbeat_thread.join()
+        self._return_files(self.inprogress_dir)
+        try:
+            os.remove(self.lease_path)
+        except FileNotFoundError:
+            pass
+        try:
+            os.rmdir(self.inprogress_dir)
+        except OSError:
+            pass
+        logger.info(f"节点 {self.node_id} 已释放租约，共处理 {self.processed} 个文件")
+
+    def heartbeat(self):
+        """刷新租约文件，返回其mtime（作为共享文件系统上的当前时间）"""
+        info = {
+            'node': self.node_id,
+            'host': socket.gethostname(),
+            'pid': os.getpid(),
+            'processed': self.processed,
+            'current': self.current
+        }
+        tmp_path = self.lease_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(info, f, ensure_ascii=False)
+        os.replace(tmp_path, self.lease_path)
+        return os.stat(self.lease_path).st_mtime
+
+    def reap_expired(self, now):
+        """回收租约过期（或没有租约）的节点正在处理的文件"""
+        node_ids = set(os.listdir(self.inprogress_root))
+        node_ids.update(name[:-len('.lease')] for name in os.listdir(self.nodes_dir) if name.endswith('.lease'))
+        node_ids.discard(self.node_id)
+        for node_id in node_ids:
+            lease_path = os.path.join(self.nodes_dir, f"{node_id}.lease")
+            try:
+                if now - os.stat(lease_path).st_mtime <= self.lease_timeout:
+                    continue
+            except FileNotFoundError:
+                # 没有租约：节点已退出或租约已被回收
+                pass
+            node_dir = os.path.join(self.inprogress_root, node_id)
+            returned = self._return_files(node_dir)
+            if returned:
+                logger.warning(f"节点 {node_id} 租约已过期，回收 {returned} 个文件")
+            try:
+                os.rmdir(node_dir)
+            except OSError:
+                pass
+            try:
+                os.remove(lease_path)
+            except FileNotFoundError:
+                pass
+
+    def _return_files(self, node_dir):
+        """把认领目录中的文件移回投递目录，返回移回的文件数"""
+        if not os.path.isdir(node_dir):
+            return 0
+        returned = 0
+        for name in os.listdir(node_dir):
+            try:
+                os.rename(os.path.join(node_dir, name), os.path.join(self.input_dir, name))
+                returned += 1
+            except FileNotFoundError:
+                # 已被其他节点回收
+                pass
+        return returned
+
+    def _run_heartbeat(self):
+        """心跳线程：每隔租约时长的三分之一刷新租约并回收失效节点"""
+        interval = max(self.lease_timeout / 3, 0.1)
+        while not self._stop_event.wait(interval):
+            try:
+                now = self.heartbeat()
+                self.reap_expired(now)
+            except OSError as e:
+                logger.warning(f"刷新租约失败: {str(e)}")
+
+    def claim(self):
+        """
+        认领下一个待处理文件（优先处理本节点上次退出时遗留的文件，然后按修改时间从早到晚）
+
+        Returns:
+            tuple: (认领后的路径, 投递目录中的原路径)，没有可认领的文件时返回None
+        """
+        for name in sorted(os.listdir(self.inprogress_dir)):
+            if name.lower().endswith('.pdf'):
+                self.current = name
+                return os.path.join(self.inprogress_dir, name), os.path.join(self.input_dir, name)
+
+        candidates = []
+        seen = {}
+        for name in os.listdir(self.input_dir):
+            path = os.path.join(self.input_dir, name)
+            if not name.lower().endswith('.pdf') or not os.path.isfile(path):
+                continue
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            seen[name] = (stat.st_size, stat.st_mtime)
+            if self._seen.get(name) == seen[name]:
+                candidates.append((stat.st_mtime, name))
+        self._seen = seen
+
+        for _, name in sorted(candidates):
+            claimed_path = os.path.join(self.inprogress_dir, name)
+            try:
+                os.rename(os.path.join(self.input_dir, name), claimed_path)
+            except FileNotFoundError:
+                # 已被其他节点认领
+                continue
+            self.current = name
+            logger.info(f"节点 {self.node_id} 认领文件: {name}")
+            return claimed_path, os.path.join(self.input_dir, name)
+        return None
+
+    def complete(self, claimed_path, success):
+        """处理结束后把文件移至 done/ 或 failed/"""
+        name = os.path.basename(claimed_path)
+        target_path = os.path.join(self.done_dir if success else self.failed_dir, name)
+        self.current = None
+        try:
+            os.replace(claimed_path, target_path)
+        except FileNotFoundError:
+            logger.warning(f"文件 {name} 已被其他节点回收（本节点租约曾过期），结果可能被重复生成")
+            return
+        self.processed += 1
+
 
-def run_daemon_mode(input_dir, output_dir, model='pp-ocrv5', optimize_pdf=False, optimize_level='medium', grayscale=False):
-    """守护模式：持续监控输入目录，处理新的PDF文件"""
+def run_daemon_mode(input_dir, output_dir, model='pp-ocrv5', spool=False, node_id=None, lease_timeout=60,
+                    poll_interval=2.0, **handler_options):
+    """守护模式：持续监控输入目录，处理新的PDF文件；spool=True时与其他节点通过共享投递目录协调"""
     logger.info(f"守护模式启动，监控目录: {input_dir}")
     
     # 创建事件处理器
     event_handler = PDFFileHandler(
         output_dir, 
         model,
-        optimize_pdf=optimize_pdf,
-        optimize_level=optimize_level,
-        grayscale=grayscale
+        **handler_options
     )
     
+    if spool:
+        run_spool_loop(event_handler, input_dir, node_id, lease_timeout, poll_interval)
+        event_handler.shutdown()
+        return
+    
+    # 积压扫描：续跑上次退出时未完成的文档
+    if handler_options.get('resume', True):
+        unfinished = find_unfinished_documents(input_dir, output_dir)
+        if unfinished:
+            logger.info(f"发现 {len(unfinished)} 个未完成的文档，开始续跑")
+            for pdf_path in unfinished:
+                event_handler.process_pdf_task(pdf_path)
+    
     # 创建观察者
     observer = Observer()
     observer.schedule(event_handler, input_dir, recursive=False)
@@ -769,22 +3733,135 @@ def run_daemon_mode(input_dir, output_dir, model='pp-ocrv5', optimize_pdf=False,
     # 关闭处理器
     event_handler.shutdown()
 
+def run_spool_loop(event_handler, input_dir, node_id=None, lease_timeout=60, poll_interval=2.0):
+    """
+    共享投递目录模式的拉取循环：空闲时认领一个文件并处理，没有文件时按轮询间隔等待
+
+    共享文件系统（如NFS）上其他主机写入的文件不会触发本机的文件系统事件，因此使用轮询而不是watchdog。
+    收到SIGTERM（如容器停止）时与Ctrl+C一样退出，并把未完成的文件放回投递目录。
+    """
+    def handle_sigterm(signum, frame):
+        raise KeyboardInterrupt()
+    signal.signal(signal.SIGTERM, handle_sigterm)
+    
+    coordinator = SpoolCoordinator(input_dir, node_id, lease_timeout)
+    coordinator.start()
+    try:
+        while True:
+            claimed = coordinator.claim()
+            if claimed is None:
+                time.sleep(poll_interval)
+                continue
+            claimed_path, source_path = claimed
+            result = event_handler.process_pdf_task(claimed_path, source_path=source_path)
+            if result == PROCESS_PARTIAL:
+                # 文件移出投递目录后不会再被认领，部分超时的结果按完成处理，丢弃保留的进度日志
+                filename = os.path.splitext(os.path.basename(claimed_path))[0]
+                PageJournal(PageJournal.path_for(event_handler.output_dir, filename)).remove()
+            coordinator.complete(claimed_path, result is True or result == PROCESS_PARTIAL)
+    except KeyboardInterrupt:
+        logger.info("守护模式停止")
+    finally:
+        coordinator.stop()
+
 def main():
     """主函数"""
     # 解析命令行参数
     parser = argparse.ArgumentParser(description='PDF文字识别工具')
     parser.add_argument('-i', '--input', required=True, help='输入路径（支持单个PDF文件或目录）')
     parser.add_argument('-o', '--output', required=True, help='输出目录路径')
-    parser.add_argument('-m', '--mode', choices=['manual', 'daemon'], default='manual', 
-                       help='工作模式：manual（手动模式）或 daemon（守护模式）')
-    parser.add_argument('-model', '--model', choices=['paddleocr-vl', 'pp-ocrv5', 'pp-structurev3', 'pp-chatocrv4'], 
-                       default='pp-ocrv5', help='OCR模型选择：paddleocr-vl（多模态文档解析）、pp-ocrv5（全场景文字识别）、pp-structurev3（复杂文档解析）、pp-chatocrv4（智能信息抽取）')
+    parser.add_argument('-m', '--mode', choices=['manual', 'daemon', 'benchmark', 'query'], default='manual', 
+                       help='工作模式：manual（手动模式）、daemon（守护模式）、benchmark（性能档位基准测试）或 query（查询模式，找齐目标后停止识别）')
+    parser.add_argument('-model', '--model', choices=['paddleocr-vl', 'pp-ocrv5', 'pp-structurev3', 'pp-chatocrv4', 'auto'], 
+                       default='pp-ocrv5', help='OCR模型选择：paddleocr-vl（多模态文档解析）、pp-ocrv5（全场景文字识别）、pp-structurev3（复杂文档解析）、pp-chatocrv4（智能信息抽取）、auto（按页路由：表格与复杂版面用pp-structurev3，其余用pp-ocrv5）')
     parser.add_argument('-l', '--log-level', choices=LOG_LEVELS.keys(), default='info', 
                        help='日志输出级别：debug、info、warning、error、critical，默认：info')
     parser.add_argument('--optimize-pdf', action='store_true', help='是否优化PDF文件，默认：False')
     parser.add_argument('--optimize-level', choices=['low', 'medium', 'high'], default='medium', 
                        help='PDF优化级别，可选值：low、medium、high，默认：medium')
     parser.add_argument('--grayscale', action='store_true', help='是否使用灰度渲染，默认：False')
+    parser.add_argument('-f', '--output-format', choices=list(OUTPUT_FORMATS.keys()), default='txt',
+                       help='输出格式：txt（纯文本）、jsonl（逐页记录，含文本框多边形、置信度与页面尺寸）、md（Markdown，适合结构化模型），默认：txt')
+    parser.add_argument('--render-scale', type=float, default=1.0,
+                       help='页面渲染缩放比例（1.0对应72DPI），默认：1.0')
+    parser.add_argument('--tile', action='store_true',
+                       help='分块模式（仅pp-ocrv5）：超出像素预算的页面按重叠分块以原始分辨率识别，而不是整页缩小，默认：False')
+    parser.add_argument('--tile-size', type=int, default=2000,
+                       help='分块边长（像素），每块不超过 边长×边长 的像素预算，默认：2000')
+    parser.add_argument('--tile-overlap', type=int, default=200,
+                       help='相邻分块的重叠宽度（像素），应大于单行文字高度，默认：200')
+    parser.add_argument('--tile-batch-size', type=int, default=4,
+                       help='每次送入推理的分块数量，默认：4')
+    parser.add_argument('--adaptive', action='store_true',
+                       help='自适应精细识别（仅pp-ocrv5）：先按 --render-scale 低分辨率识别，只对低置信度区域以更高分辨率重新识别，默认：False')
+    parser.add_argument('--adaptive-threshold', type=float, default=0.85,
+                       help='触发精细识别的置信度阈值，默认：0.85')
+    parser.add_argument('--adaptive-scale', type=float, default=3.0,
+                       help='精细识别时的渲染缩放比例，默认：3.0')
+    parser.add_argument('-w', '--workers', type=int, default=None,
+                       help='手动模式下并行处理的工作进程数，每个进程常驻一个模型，默认：自动调优结果或1')
+    parser.add_argument('--cpu-threads', type=int, default=None,
+                       help='每个进程的Paddle推理线程数，默认：单进程使用Paddle默认值，多进程按CPU核心数均分')
+    parser.add_argument('--force', action='store_true',
+                       help='手动模式下强制重新处理所有文件，忽略输出清单中已是最新的结果，默认：False')
+    parser.add_argument('--no-resume', action='store_true',
+                       help='忽略已有的逐页进度日志，从第一页重新处理，默认：自动断点续跑')
+    parser.add_argument('--page-timeout', type=float, default=None,
+                       help='单页识别时间预算（秒），超时的页面在结果中标记后继续处理下一页，默认：不限制')
+    parser.add_argument('--doc-timeout', type=float, default=None,
+                       help='单个文档识别时间预算（秒），超时后剩余页面标记为超时，默认：不限制')
+    parser.add_argument('--profile', choices=list(ENGINE_PROFILES.keys()), default=None,
+                       help='推理引擎性能档位：fast、balanced、accurate，默认：环境变量 OCR_PROFILE 或 balanced')
+    parser.add_argument('--engine-option', action='append', default=[], metavar='KEY=VALUE',
+                       help=f"覆盖单个推理引擎选项，可重复指定，可选项：{', '.join(ENGINE_OPTION_TYPES)}")
+    parser.add_argument('--benchmark-profiles', default=','.join(ENGINE_PROFILES),
+                       help='基准测试模式下对比的档位（逗号分隔），默认：fast,balanced,accurate')
+    parser.add_argument('--dedup', action='store_true',
+                       help='检测与已识别页面近似重复的页面并复用其结果，默认：False')
+    parser.add_argument('--dedup-threshold', type=int, default=4,
+                       help='重复页面判定的感知哈希汉明距离阈值（0-64），默认：4')
+    parser.add_argument('--verify-models', action='store_true',
+                       help='启动时按校验清单检查模型文件完整性（不加载paddle），校验失败则退出，默认：False')
+    parser.add_argument('--memory-budget', type=int,
+                       default=int(os.environ['OCR_MEMORY_BUDGET_MB']) if os.environ.get('OCR_MEMORY_BUDGET_MB') else None,
+                       help='页面工作内存预算（MB），按页面尺寸、渲染比例、通道数与模型估算，在途总量不超过预算，'
+                            '默认：环境变量 OCR_MEMORY_BUDGET_MB 或不限制')
+    parser.add_argument('--index', action='store_true',
+                       help='每完成一个文档即写入全文索引（按页粒度，使用 search_index.py 或API的 /search 检索），默认：False')
+    parser.add_argument('--index-path', default=os.environ.get('OCR_INDEX_PATH'),
+                       help='全文索引文件路径（指定后自动开启索引），默认：环境变量 OCR_INDEX_PATH 或 输出目录/.ocr_index.db')
+    parser.add_argument('--no-direct-image', action='store_true',
+                       help='关闭扫描页直接解码：只包含一张整页图像的页面也按 --render-scale 整页渲染，默认：自动直接解码')
+    parser.add_argument('--no-crop-margins', action='store_true',
+                       help='关闭空白边距裁剪：整页送入识别，默认：识别前裁掉空白边距')
+    parser.add_argument('--render-cache', default=os.environ.get('OCR_RENDER_CACHE'),
+                       help='渲染缓存目录：保存预处理后的页面图像，同一批文件换模型或参数重跑时跳过渲染与缩放，'
+                            '默认：环境变量 OCR_RENDER_CACHE 或不缓存')
+    parser.add_argument('--render-cache-size', type=int, default=int(os.environ.get('OCR_RENDER_CACHE_MB', '4096')),
+                       help='渲染缓存大小上限（MB），超出时淘汰最久未用的页面，默认：环境变量 OCR_RENDER_CACHE_MB 或 4096')
+    parser.add_argument('--render-cache-hash', action='store_true', default=os.environ.get('OCR_RENDER_CACHE_HASH') == '1',
+                       help='渲染缓存按文件内容哈希（SHA-256）标识文档，文件移动或复制后仍可命中，'
+                            '默认：环境变量 OCR_RENDER_CACHE_HASH=1 时开启，否则按路径、大小与修改时间标识')
+    parser.add_argument('--page-log-sample', type=int, default=int(os.environ.get('OCR_PAGE_LOG_SAMPLE', '1')),
+                       help='逐页日志采样：每N页输出一次逐页info日志，其余页降为debug，0表示逐页日志全部为debug，'
+                            '默认：环境变量 OCR_PAGE_LOG_SAMPLE 或 1（每页都输出）')
+    parser.add_argument('--pattern', action='append', default=[], metavar='REGEX',
+                       help='查询模式下查找的正则表达式或关键字，可重复指定')
+    parser.add_argument('--field', action='append', default=[], metavar='NAME=REGEX',
+                       help='查询模式下提取的字段，表达式含分组时取第一个分组作为字段值，可重复指定')
+    parser.add_argument('--query-order', default=DEFAULT_QUERY_ORDER,
+                       help=f'查询模式下的页序：逗号分隔的页码，负数从最后一页倒数，* 为其余页面顺序、~ 为其余页面倒序，'
+                            f'默认：{DEFAULT_QUERY_ORDER}')
+    parser.add_argument('--query-max-pages', type=int, default=None,
+                       help='查询模式下每个文件最多识别的页数，默认：不限制')
+    parser.add_argument('--spool', action='store_true',
+                       help='守护模式下与其他节点共享投递目录：按租约认领文件，避免重复处理，默认：False')
+    parser.add_argument('--node-id', default=None,
+                       help='共享投递目录模式下的节点ID，默认：主机名-进程号')
+    parser.add_argument('--lease-timeout', type=float, default=60,
+                       help='共享投递目录模式下的节点租约时长（秒），超时未续约的节点的文件会被回收，默认：60')
+    parser.add_argument('--poll-interval', type=float, default=2.0,
+                       help='共享投递目录模式下没有待处理文件时的轮询间隔（秒），默认：2.0')
     
     args = parser.parse_args()
     
@@ -796,9 +3873,75 @@ def main():
         logging.getLogger(logger_name).setLevel(log_level)
     logger.info(f"日志级别已设置为：{args.log_level}")
     
+    # 启动时校验模型文件
+    if args.verify_models:
+        from download_models import PIPELINE_MODELS, verify_models
+        pipelines = [AUTO_BASE_MODEL, AUTO_STRUCTURE_MODEL] if args.model == AUTO_MODEL else [args.model]
+        if any(pipeline not in PIPELINE_MODELS for pipeline in pipelines):
+            logger.warning(f"{args.model}模型没有校验信息，跳过模型校验")
+        else:
+            problems = verify_models(pipelines, custom_cache_module.CACHE_DIR)
+            for problem in problems:
+                logger.error(f"模型校验失败: {problem}")
+            if problems:
+                logger.error("模型文件不完整，请先运行 download_models.py 下载或解压离线模型归档")
+                return
+            logger.info(f"{args.model}模型校验通过")
+    
     # 确保输出目录存在
     os.makedirs(args.output, exist_ok=True)
     
+    # 各模式共用的OCR处理器选项
+    handler_options = {
+        'optimize_pdf': args.optimize_pdf,
+        'optimize_level': args.optimize_level,
+        'grayscale': args.grayscale,
+        'cpu_threads': args.cpu_threads,
+        'resume': not args.no_resume,
+        'output_format': args.output_format,
+        'render_scale': args.render_scale,
+        'tile_mode': args.tile,
+        'tile_size': args.tile_size,
+        'tile_overlap': args.tile_overlap,
+        'tile_batch_size': args.tile_batch_size,
+        'adaptive_mode': args.adaptive,
+        'adaptive_threshold': args.adaptive_threshold,
+        'adaptive_scale': args.adaptive_scale,
+        'page_timeout': args.page_timeout,
+        'doc_timeout': args.doc_timeout,
+        'dedup': args.dedup,
+        'dedup_threshold': args.dedup_threshold,
+        'profile': args.profile,
+        'memory_budget_mb': args.memory_budget,
+        'page_log_sample': max(0, args.page_log_sample),
+        'direct_image': not args.no_direct_image,
+        'crop_margins': not args.no_crop_margins,
+        'render_cache_dir': args.render_cache,
+        'render_cache_mb': max(1, args.render_cache_size),
+        'render_cache_hash': args.render_cache_hash,
+        'index_path': args.index_path or (os.path.join(args.output, DEFAULT_INDEX_FILENAME) if args.index else None)
+    }
+    try:
+        handler_options['engine_options'] = parse_engine_option_args(args.engine_option)
+    except ValueError as e:
+        logger.error(str(e))
+        return
+    
+    # 查询模式同时支持单个文件与目录
+    if args.mode == 'query':
+        if not os.path.exists(args.input):
+            logger.error(f"输入路径不存在: {args.input}")
+            return
+        try:
+            targets = compile_query_targets(args.pattern, dict(parse_query_field(field) for field in args.field))
+            resolve_page_order(1, args.query_order)
+        except ValueError as e:
+            logger.error(str(e))
+            return
+        run_query_mode(args.input, args.output, args.model, targets=targets, page_order=args.query_order,
+                       max_pages=args.query_max_pages, **handler_options)
+        return
+    
     # 判断输入是文件还是目录
     if os.path.isfile(args.input):
         # 输入是单个PDF文件
@@ -810,32 +3953,55 @@ def main():
         ocr_handler = PDFOCRHandler(
             args.output, 
             args.model,
-            optimize_pdf=args.optimize_pdf,
-            optimize_level=args.optimize_level,
-            grayscale=args.grayscale
+            **handler_options
         )
-        ocr_handler.process_pdf(args.input)
+        try:
+            ocr_handler.process_pdf(args.input)
+        finally:
+            ocr_handler.close()
         logger.info("单个文件处理完成")
     elif os.path.isdir(args.input):
         # 输入是目录
         # 根据模式运行
-        if args.mode == 'manual':
+        if args.mode == 'benchmark':
+            profiles = [profile.strip() for profile in args.benchmark_profiles.split(',') if profile.strip()]
+            unknown = [profile for profile in profiles if profile not in ENGINE_PROFILES]
+            if unknown:
+                logger.error(f"不支持的性能档位: {', '.join(unknown)}，可选值: {', '.join(ENGINE_PROFILES)}")
+                return
+            run_benchmark_mode(
+                args.input,
+                args.output,
+                args.model,
+                profiles=profiles,
+                **handler_options
+            )
+        elif args.mode == 'manual':
+            workers = args.workers
+            if workers is None:
+                # 未指定进程数时使用自动调优结果（同时使用调优得到的每进程线程数）
+                tuning = load_tuning_config(args.model)
+                workers = tuning['workers'] if tuning else 1
+                if tuning and not handler_options['cpu_threads']:
+                    handler_options['cpu_threads'] = tuning['cpu_threads']
             run_manual_mode(
                 args.input, 
                 args.output, 
                 args.model,
-                optimize_pdf=args.optimize_pdf,
-                optimize_level=args.optimize_level,
-                grayscale=args.grayscale
+                workers=workers,
+                force=args.force,
+                **handler_options
             )
         else:
             run_daemon_mode(
                 args.input, 
                 args.output, 
                 args.model,
-                optimize_pdf=args.optimize_pdf,
-                optimize_level=args.optimize_level,
-                grayscale=args.grayscale
+                spool=args.spool,
+                node_id=args.node_id,
+                lease_timeout=args.lease_timeout,
+                poll_interval=args.poll_interval,
+                **handler_options
             )
     else:
         logger.error(f"输入路径不存在: {args.input}")
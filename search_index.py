@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------
+# 模块信息
+# ----------------------------------------------------------------------
+# @Time    : 2026-10-19
+# @FileName: search_index.py
+# @Version : 1.0.0
+# ----------------------------------------------------------------------
+# 功能描述
+# ----------------------------------------------------------------------
+# 本模块为OCR识别结果维护按页粒度的全文索引（SQLite FTS5，trigram分词，
+# 中文按子串匹配）：
+#   - ocr_pdf.py 每完成一个文档即写入该文档的所有页面（--index）
+#   - 按输出清单（.ocr_manifest.json）增量重建：结果文件未变化的文档直接跳过
+#   - 命令行检索与 api.py 的 /search 接口共用同一个索引文件
+# 索引文件默认位于 输出目录/.ocr_index.db，可通过环境变量 OCR_INDEX_PATH 指定。
+# ----------------------------------------------------------------------
+# 使用示例
+# ----------------------------------------------------------------------
+# 按输出清单增量更新索引：
+#   python search_index.py -o ./test_output --reindex
+#
+# 检索（多个词之间为“且”关系）：
+#   python search_index.py -o ./test_output "发票号码 2026"
+# ----------------------------------------------------------------------
+
+import os
+import re
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import logging
+import threading
+
+# 配置日志级别映射
+LOG_LEVELS = {
+    'debug': logging.DEBUG,
+    'info': logging.INFO,
+    'warning': logging.WARNING,
+    'error': logging.ERROR,
+    'critical': logging.CRITICAL
+}
+
+logger = logging.getLogger(__name__)
+
+# 索引文件默认名称（位于输出目录下）与输出清单文件名（与 ocr_pdf.py 一致）
+DEFAULT_INDEX_FILENAME = '.ocr_index.db'
+MANIFEST_FILENAME = '.ocr_manifest.json'
+
+# 页面记录的rowid为 文档ID << PAGE_ROWID_BITS | 页码，按rowid区间即可删除一个文档的所有页面
+PAGE_ROWID_BITS = 20
+
+# trigram分词至少需要3个字符，更短的检索词退化为逐页子串扫描
+MIN_MATCH_TERM_LENGTH = 3
+
+# 各格式结果文件的分页标记
+PAGE_MARKERS = {
+    '.txt': re.compile(r'^=== 第 (\d+) 页 ===$', re.M),
+    '.md': re.compile(r'^<!-- 第 (\d+) 页.*?-->$', re.M)
+}
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    output_path TEXT UNIQUE NOT NULL,
+    source_path TEXT,
+    model TEXT,
+    page_count INTEGER NOT NULL,
+    output_size INTEGER NOT NULL,
+    output_mtime REAL NOT NULL,
+    indexed_at TEXT NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS pages USING fts5(text, tokenize='trigram');
+'''
+
+
+def get_index_path(output_dir=None):
+    """索引文件路径：环境变量 OCR_INDEX_PATH，否则为 输出目录/.ocr_index.db"""
+    if os.environ.get('OCR_INDEX_PATH'):
+        return os.environ['OCR_INDEX_PATH']
+    return os.path.join(output_dir, DEFAULT_INDEX_FILENAME) if output_dir else None
+
+
+def read_output_pages(output_path):
+    """
+    从结果文件中读取逐页文本
+
+    Returns:
+        list: [(页码, 文本)]
+    """
+    extension = os.path.splitext(output_path)[1].lower()
+    with open(output_path, 'r', encoding='utf-8') as f:
+        if extension == '.jsonl':
+            pages = []
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if record.get('status') != 'timeout':
+                    pages.append((record['page'], '\n'.join(record.get('lines') or [])))
+            return pages
+        content = f.read()
+    marker = PAGE_MARKERS.get(extension)
+    if marker is None:
+        raise ValueError(f"不支持的结果文件格式: {output_path}")
+    matches = list(marker.finditer(content))
+    pages = []
+    for index, match in enumerate(matches):
+        end = matches[index + 1].start() if index + 1 < len(matches) else len(content)
+        pages.append((int(match.group(1)), content[match.end():end].strip()))
+    return pages
+
+
+def build_match_query(query):
+    """
+    将检索词拆分为FTS5匹配表达式与短词
+
+    每个词按短语匹配（不解析FTS5语法），多个词之间为“且”关系。
+
+    Returns:
+        tuple: (MATCH表达式或None, 不足3个字符的短词列表)
+    """
+    terms = query.split()
+    long_terms = [term for term in terms if len(term) >= MIN_MATCH_TERM_LENGTH]
+    short_terms = [term for term in terms if len(term) < MIN_MATCH_TERM_LENGTH]
+    match_expression = ' AND '.join('"' + term.replace('"', '""') + '"' for term in long_terms)
+    return match_expression or None, short_terms
+
+
+def make_snippet(text, term, context=24):
+    """在文本中截取第一个命中位置附近的片段，命中部分用[]标出"""
+    position = text.lower().find(term.lower())
+    if position < 0:
+        return text[:context * 2]
+    start = max(0, position - context)
+    end = min(len(text), position + len(term) + context)
+    return ('…' if start > 0 else '') + text[start:position] + '[' + text[position:position + len(term)] + ']' + \
+        text[position + len(term):end] + ('…' if end < len(text) else '')
+
+
+class SearchIndex:
+    """
+    按页粒度的全文索引
+
+    连接可在线程间共享（内部加锁）；多个进程同时写入时依靠WAL与忙等待超时串行化。
+    """
+    def __init__(self, index_path, timeout=30.0):
+        self.index_path = index_path
+        index_dir = os.path.dirname(os.path.abspath(index_path))
+        os.makedirs(index_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(index_path, timeout=timeout, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def is_current(self, output_path):
+        """结果文件自上次索引以来未变化（大小与修改时间相同）"""
+        stat = os.stat(output_path)
+        with self._lock:
+            row = self._conn.execute('SELECT output_size, output_mtime FROM documents WHERE output_path = ?',
+                                     (os.path.abspath(output_path),)).fetchone()
+        return row is not None and row[0] == stat.st_size and row[1] == stat.st_mtime
+
+    def index_document(self, output_path, pages, source_path=None, model=None):
+        """
+        写入（或替换）一个文档的所有页面
+
+        Args:
+            output_path (str): 结果文件路径（文档的唯一标识）
+            pages (list): [(页码, 文本)]
+            source_path (str): 源PDF文件路径
+            model (str): 识别使用的模型
+        """
+        output_path = os.path.abspath(output_path)
+        stat = os.stat(output_path)
+        with self._lock, self._conn:
+            row = self._conn.execute('SELECT id FROM documents WHERE output_path = ?', (output_path,)).fetchone()
+            values = (source_path and os.path.abspath(source_path), model, len(pages), stat.st_size, stat.st_mtime,
+                      time.strftime('%Y-%m-%d %H:%M:%S'))
+            if row is None:
+                doc_id = self._conn.execute(
+                    'INSERT INTO documents (source_path, model, page_count, output_size, output_mtime, indexed_at, output_path) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?)', values + (output_path,)).lastrowid
+            else:
+                doc_id = row[0]
+                self._conn.execute(
+                    'UPDATE documents SET source_path = ?, model = ?, page_count = ?, output_size = ?, output_mtime = ?, '
+                    'indexed_at = ? WHERE id = ?', values + (doc_id,))
+                self._delete_pages(doc_id)
+            self._conn.executemany('INSERT INTO pages (rowid, text) VALUES (?, ?)',
+                                   [((doc_id << PAGE_ROWID_BITS) | page, text) for page, text in pages if text])
+
+    def remove_document(self, output_path):
+        """从索引中删除一个文档"""
+        with self._lock, self._conn:
+            row = self._conn.execute('SELECT id FROM documents WHERE output_path = ?',
+                                     (os.path.abspath(output_path),)).fetchone()
+            if row is not None:
+                self._delete_pages(row[0])
+                self._conn.execute('DELETE FROM documents WHERE id = ?', (row[0],))
+
+    def _delete_pages(self, doc_id):
+        self._conn.execute('DELETE FROM pages WHERE rowid BETWEEN ? AND ?',
+                           (doc_id << PAGE_ROWID_BITS, ((doc_id + 1) << PAGE_ROWID_BITS) - 1))
+
+    def search(self, query, limit=20, offset=0):
+        """
+        检索页面
+
+        Returns:
+            list: 按相关度排序的命中页面（源文件、结果文件、页码、片段、得分）
+        """
+        match_expression, short_terms = build_match_query(query)
+        if match_expression is None and not short_terms:
+            return []
+        conditions = []
+        params = []
+        if match_expression is not None:
+            conditions.append('pages MATCH ?')
+            params.append(match_expression)
+        for term in short_terms:
+            conditions.append('instr(lower(pages.text), lower(?)) > 0')
+            params.append(term)
+        if match_expression is not None:
+            columns = "snippet(pages, 0, '[', ']', '…', 16), bm25(pages)"
+            order = 'bm25(pages)'
+        else:
+            # 只有短词时无法使用倒排索引，逐页扫描
+            columns = 'pages.text, 0.0'
+            order = 'pages.rowid'
+        sql = (f'SELECT documents.source_path, documents.output_path, pages.rowid, {columns} '
+               f'FROM pages JOIN documents ON documents.id = (pages.rowid >> {PAGE_ROWID_BITS}) '
+               f'WHERE {" AND ".join(conditions)} ORDER BY {order} LIMIT ? OFFSET ?')
+        with self._lock:
+            rows = self._conn.execute(sql, params + [limit, offset]).fetchall()
+        return [{
+            'file': os.path.basename(source_path or output_path),
+            'source': source_path,
+            'output': output_path,
+            'page': rowid & ((1 << PAGE_ROWID_BITS) - 1),
+            'snippet': (snippet if match_expression is not None else make_snippet(snippet, short_terms[0])).replace('\n', ' '),
+            'score': round(-score, 4)
+        } for source_path, output_path, rowid, snippet, score in rows]
+
+    def reindex(self, output_dir, force=False):
+        """
+        按输出清单增量重建索引
+
+        清单中结果文件未变化的文档跳过，已变化或未索引的重新读取结果文件写入；
+        该输出目录下结果文件已不存在的文档从索引中删除。
+
+        Returns:
+            dict: 统计信息（indexed、skipped、removed、failed）
+        """
+        stats = {'indexed': 0, 'skipped': 0, 'removed': 0, 'failed': 0}
+        manifest_path = os.path.join(output_dir, MANIFEST_FILENAME)
+        entries = {}
+        if os.path.exists(manifest_path):
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                entries = json.load(f).get('entries', {})
+        else:
+            logger.warning(f"输出目录中没有输出清单: {manifest_path}")
+
+        for source_path, entry in entries.items():
+            output_path = entry['output']
+            if not os.path.exists(output_path):
+                continue
+            try:
+                if not force and self.is_current(output_path):
+                    stats['skipped'] += 1
+                    continue
+                self.index_document(output_path, read_output_pages(output_path), source_path,
+                                    entry.get('options', {}).get('model'))
+                stats['indexed'] += 1
+                logger.debug(f"已索引: {output_path}")
+            except (OSError, ValueError) as e:
+                stats['failed'] += 1
+                logger.error(f"索引结果文件失败: {output_path}，错误信息: {str(e)}")
+
+        prefix = os.path.join(os.path.abspath(output_dir), '')
+        with self._lock:
+            indexed_outputs = [row[0] for row in self._conn.execute('SELECT output_path FROM documents')]
+        for output_path in indexed_outputs:
+            if output_path.startswith(prefix) and not os.path.exists(output_path):
+                self.remove_document(output_path)
+                stats['removed'] += 1
+        return stats
+
+    def stats(self):
+        with self._lock:
+            documents, pages = self._conn.execute('SELECT COUNT(*), COALESCE(SUM(page_count), 0) FROM documents').fetchone()
+        return {'documents': documents, 'pages': pages}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='OCR识别结果全文检索工具')
+    parser.add_argument('query', nargs='?', default=None, help='检索词，多个词用空格分隔（且关系）')
+    parser.add_argument('-o', '--output', default=None, help='OCR输出目录（索引默认位置与重建索引的数据来源）')
+    parser.add_argument('-x', '--index', default=None,
+                        help='索引文件路径，默认：环境变量 OCR_INDEX_PATH 或 输出目录/.ocr_index.db')
+    parser.add_argument('--reindex', action='store_true', help='按输出目录的输出清单增量更新索引')
+    parser.add_argument('--force', action='store_true', help='重建索引时忽略未变化判断，重新索引所有文档')
+    parser.add_argument('-n', '--limit', type=int, default=20, help='返回的最大结果数，默认：20')
+    parser.add_argument('--offset', type=int, default=0, help='结果偏移量（分页），默认：0')
+    parser.add_argument('--json', action='store_true', help='以JSON Lines格式输出检索结果')
+    parser.add_argument('-l', '--log-level', choices=LOG_LEVELS.keys(), default='info',
+                        help='日志输出级别：debug、info、warning、error、critical，默认：info')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=LOG_LEVELS[args.log_level], format='%(asctime)s - %(levelname)s - %(message)s')
+    index_path = args.index or get_index_path(args.output)
+    if not index_path:
+        logger.error("请通过 -o/--output、-x/--index 或环境变量 OCR_INDEX_PATH 指定索引位置")
+        return 1
+    if args.reindex and not args.output:
+        logger.error("重建索引需要通过 -o/--output 指定OCR输出目录")
+        return 1
+    if not args.reindex and not args.query:
+        parser.print_usage()
+        return 1
+
+    search_index = SearchIndex(index_path)
+    try:
+        if args.reindex:
+            start_time = time.time()
+            stats = search_index.reindex(args.output, force=args.force)
+            logger.info(f"索引更新完成: 新增或更新 {stats['indexed']} 个，未变化 {stats['skipped']} 个，"
+                        f"删除 {stats['removed']} 个，失败 {stats['failed']} 个，耗时: {time.time() - start_time:.2f}秒")
+            total = search_index.stats()
+            logger.info(f"索引共 {total['documents']} 个文档，{total['pages']} 页: {index_path}")
+        if args.query:
+            start_time = time.time()
+            results = search_index.search(args.query, limit=args.limit, offset=args.offset)
+            for result in results:
+                if args.json:
+                    print(json.dumps(result, ensure_ascii=False))
+                else:
+                    print(f"{result['file']} 第 {result['page']} 页: {result['snippet']}")
+            logger.info(f"共 {len(results)} 条结果，耗时: {(time.time() - start_time) * 1000:.1f}毫秒")
+    finally:
+        search_index.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,61 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+# 导入 ocr_pdf 时会在当前目录下创建 logs/ 与 .paddlex/，并读取当前目录下的调优结果，
+# 测试在临时目录中运行，不影响仓库目录
+os.chdir(tempfile.mkdtemp(prefix='ocr_pdf_tests_'))
+
+
+def write_pdf(path, pages=1, size=(200, 300), scanned=True):
+    """
+    生成测试用PDF
+
+    scanned 为True时每页是一张铺满页面的内嵌JPEG（模拟扫描页，图像为页面尺寸的2倍），否则为空白页。
+    """
+    import cv2
+    import numpy as np
+    import pypdfium2 as pdfium
+
+    width, height = size
+    pdf = pdfium.PdfDocument.new()
+    for page_index in range(pages):
+        page = pdf.new_page(width, height)
+        if scanned:
+            image = np.full((height * 2, width * 2, 3), 255, dtype=np.uint8)
+            cv2.putText(image, f'page {page_index + 1}', (20, 60), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (0, 0, 0), 2)
+            jpeg_path = f"{path}.{page_index}.jpg"
+            cv2.imwrite(jpeg_path, image)
+            pdf_image = pdfium.PdfImage.new(pdf)
+            pdf_image.load_jpeg(jpeg_path, inline=True)
+            pdf_image.set_matrix(pdfium.PdfMatrix().scale(width, height))
+            page.insert_obj(pdf_image)
+            page.gen_content()
+            os.remove(jpeg_path)
+        page.close()
+    pdf.save(str(path))
+    pdf.close()
+    return str(path)
+
+
+@pytest.fixture
+def make_pdf(tmp_path):
+    """返回生成测试PDF的函数，默认写入临时目录下的 input/"""
+    def make(name='doc.pdf', pages=1, size=(200, 300), scanned=True, directory=None):
+        directory = directory or tmp_path / 'input'
+        os.makedirs(directory, exist_ok=True)
+        return write_pdf(os.path.join(directory, name), pages, size, scanned)
+    return make
+
+
+@pytest.fixture
+def stub_engine(monkeypatch):
+    """本进程内创建的PDFOCRHandler使用桩推理引擎（不加载paddle）"""
+    import ocr_pdf
+    monkeypatch.setattr(ocr_pdf.PDFOCRHandler, '_create_engine',
+                        lambda self, model: ocr_pdf.StubOCREngine(model))
@@ -0,0 +1,58 @@
+import threading
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+import api
+from api import JobScheduler, OCRJob
+
+
+class ClosingEngine:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def test_shutdown_closes_engines_and_scheduler(monkeypatch):
+    monkeypatch.setattr(api, 'scheduler', JobScheduler(max_running=1))
+    engine = ClosingEngine()
+    monkeypatch.setitem(api._engines, ('pp-ocrv5', ()), engine)
+
+    with TestClient(api.app) as client:
+        assert client.get('/health').json()['queue'] == {'running': 0, 'waiting': 0}
+        assert not engine.closed
+
+    assert engine.closed
+    assert api._engines == {}
+    # 停止流程在lifespan中完成，没有已弃用的 on_event 回调
+    assert api.app.router.on_shutdown == []
+    assert api.scheduler._closed
+
+
+def test_closed_scheduler_rejects_waiting_jobs():
+    scheduler = JobScheduler(max_running=1)
+    running = OCRJob('running', 'a', 1)
+    scheduler.acquire(running)
+    errors = []
+
+    def wait_for_slot():
+        try:
+            scheduler.acquire(OCRJob('waiting', 'b', 1))
+        except HTTPException as e:
+            errors.append(e.status_code)
+
+    thread = threading.Thread(target=wait_for_slot)
+    thread.start()
+    while scheduler.stats()['waiting'] == 0:
+        pass
+    scheduler.close()
+    thread.join(timeout=5)
+
+    assert errors == [503]
+    assert scheduler.stats() == {'running': 1, 'waiting': 0}
+    with pytest.raises(HTTPException):
+        scheduler.acquire(OCRJob('late', 'c', 1))
+    scheduler.release(running, 1)
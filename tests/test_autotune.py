@@ -0,0 +1,20 @@
+import pytest
+
+from autotune import candidate_workers, candidate_threads
+
+
+@pytest.mark.parametrize('cpu_count, max_workers, expected', [
+    (8, None, [1, 2, 4, 8]),
+    (6, None, [1, 2, 4, 6]),
+    (16, 4, [1, 2, 4]),
+    (12, 3, [1, 2, 3]),
+    (4, 32, [1, 2, 4]),
+    (1, None, [1]),
+])
+def test_candidate_workers(cpu_count, max_workers, expected):
+    assert candidate_workers(cpu_count, max_workers) == expected
+
+
+def test_candidate_threads_split_all_or_half_of_the_cores():
+    assert candidate_threads(8, 2) == [4, 2]
+    assert candidate_threads(8, 8) == [1]
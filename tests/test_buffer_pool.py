@@ -0,0 +1,37 @@
+import numpy as np
+
+from ocr_pdf import PageBufferPool
+
+
+def test_buffer_pool_reuses_smallest_fitting_buffer():
+    pool = PageBufferPool()
+    small = pool.acquire((10, 10, 3))
+    large = pool.acquire((100, 100, 3))
+    medium = pool.acquire((50, 50, 3))
+    small_base, medium_base = small.base, medium.base
+    for view in (small, large, medium):
+        pool.release(view)
+
+    # 空闲缓冲区多于一个时按下标取出（曾因 list.remove 比较数组而出错）
+    view = pool.acquire((40, 40, 3))
+    assert view.shape == (40, 40, 3)
+    assert np.shares_memory(view, medium_base)
+    view = pool.acquire((5, 5))
+    assert np.shares_memory(view, small_base)
+
+
+def test_buffer_pool_release_ignores_foreign_arrays_and_discarded_views():
+    pool = PageBufferPool()
+    pool.release(np.zeros((4, 4), dtype=np.uint8))
+    view = pool.acquire((4, 4))
+    pool.discard(view)
+    pool.release(view)
+    assert pool._free == []
+
+
+def test_buffer_pool_keeps_at_most_max_free_buffers():
+    pool = PageBufferPool(max_free=2)
+    views = [pool.acquire((size, size)) for size in (10, 20, 30)]
+    for view in views:
+        pool.release(view)
+    assert sorted(buffer.size for buffer in pool._free) == [400, 900]
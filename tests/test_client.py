@@ -0,0 +1,108 @@
+import os
+import socket
+import threading
+import time
+
+import httpx
+import pytest
+import uvicorn
+
+import api
+import ocr_client
+from ocr_client import OCRClient, OCRClientError, submit_files
+
+
+@pytest.fixture
+def server_url(monkeypatch):
+    """在后台线程中以桩推理引擎运行API服务，返回服务地址"""
+    monkeypatch.setattr(api, 'STUB_ENGINE_DELAY', '0')
+    monkeypatch.setattr(api, '_engines', {})
+    monkeypatch.setattr(api, 'scheduler', api.JobScheduler(max_running=2))
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    server = uvicorn.Server(uvicorn.Config(api.app, log_level='warning'))
+    thread = threading.Thread(target=server.run, kwargs={'sockets': [sock]}, daemon=True)
+    thread.start()
+    deadline = time.time() + 10
+    while not server.started:
+        assert time.time() < deadline and thread.is_alive(), 'API服务启动失败'
+        time.sleep(0.01)
+    yield f'http://127.0.0.1:{sock.getsockname()[1]}'
+    server.should_exit = True
+    thread.join(timeout=10)
+    sock.close()
+
+
+class BusyOnceTransport(httpx.HTTPTransport):
+    """第一次上传请求返回429（带Retry-After），之后正常转发，记录收到的请求"""
+    def __init__(self, retry_after='2'):
+        super().__init__()
+        self.retry_after = retry_after
+        self.requests = []
+
+    def handle_request(self, request):
+        self.requests.append((request.method, request.url.path, request.headers.get('content-type', '')))
+        if request.method == 'POST' and len(self.requests) == 1:
+            return httpx.Response(429, headers={'Retry-After': self.retry_after},
+                                  json={'detail': '服务繁忙'}, request=request)
+        return super().handle_request(request)
+
+
+def test_submit_pdf_through_api(server_url, make_pdf):
+    pdf_path = make_pdf(pages=2)
+    with OCRClient(server_url, api_key='team-a') as client:
+        assert client.health()['status'] == 'healthy'
+        response = client.ocr_pdf(pdf_path)
+
+    assert response['status'] == 'success'
+    assert response['filename'] == 'doc.pdf'
+    assert 'stub page 1' in response['result'] and 'stub page 2' in response['result']
+
+
+def test_retry_after_429_resends_streamed_upload(server_url, make_pdf, monkeypatch):
+    pdf_path = make_pdf(pages=1)
+    sleeps = []
+    monkeypatch.setattr(ocr_client.time, 'sleep', sleeps.append)
+    transport = BusyOnceTransport(retry_after='2')
+
+    with OCRClient(server_url, transport=transport) as client:
+        response = client.ocr_pdf(pdf_path, output_format='jsonl')
+
+    # 按Retry-After等待后重试，重试时重新打开文件从头上传
+    assert sleeps == [2.0]
+    assert [path for _, path, _ in transport.requests] == ['/ocr/pdf', '/ocr/pdf']
+    assert all(content_type.startswith('multipart/form-data') for _, _, content_type in transport.requests)
+    assert response['status'] == 'success'
+    assert [record['page'] for record in response['result']] == [1]
+
+
+def test_retries_exhausted_raise_client_error(make_pdf, monkeypatch):
+    pdf_path = make_pdf()
+    monkeypatch.setattr(ocr_client.time, 'sleep', lambda seconds: None)
+    transport = httpx.MockTransport(lambda request: httpx.Response(503, json={'detail': '服务正在停止'}))
+
+    with OCRClient('http://ocr.test', max_retries=2, transport=transport) as client:
+        with pytest.raises(OCRClientError) as error:
+            client.ocr_pdf(pdf_path)
+    assert error.value.status_code == 503
+
+
+def test_submit_files_writes_outputs_and_stats(server_url, make_pdf, tmp_path):
+    pdf_paths = [make_pdf(f'doc{index}.pdf', pages=index + 1) for index in range(3)]
+    bad_path = tmp_path / 'input' / 'broken.pdf'
+    bad_path.write_bytes(b'not a pdf')
+    output_dir = tmp_path / 'results'
+    output_dir.mkdir()
+    (output_dir / 'doc0.txt').write_text('existing', encoding='utf-8')
+
+    with OCRClient(server_url) as client:
+        stats = submit_files(client, pdf_paths + [str(bad_path)], str(output_dir), concurrency=2, skip_existing=True)
+
+    assert stats['total'] == 4
+    assert stats['skipped'] == 1 and stats['success'] == 2 and stats['failed'] == 1
+    assert stats['bytes'] == sum(os.path.getsize(path) for path in pdf_paths[1:])
+    assert (output_dir / 'doc0.txt').read_text(encoding='utf-8') == 'existing'
+    text = (output_dir / 'doc2.txt').read_text(encoding='utf-8')
+    assert [line.split(' (')[0] for line in text.splitlines() if line.startswith('stub page')] == \
+        ['stub page 1', 'stub page 2', 'stub page 3']
+    assert not (output_dir / 'broken.txt').exists()
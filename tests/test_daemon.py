@@ -0,0 +1,50 @@
+import ocr_pdf
+from ocr_pdf import PDFFileHandler, StubOCREngine
+
+
+class CountingEngine(StubOCREngine):
+    created = 0
+    closed = 0
+
+    def __init__(self, model):
+        super().__init__(model)
+        CountingEngine.created += 1
+
+    def close(self):
+        CountingEngine.closed += 1
+
+
+def use_counting_engine(monkeypatch):
+    monkeypatch.setattr(CountingEngine, 'created', 0)
+    monkeypatch.setattr(CountingEngine, 'closed', 0)
+    monkeypatch.setattr(ocr_pdf.PDFOCRHandler, '_create_engine', lambda self, model: CountingEngine(model))
+
+
+def test_daemon_handler_reuses_engine_across_files(tmp_path, make_pdf, monkeypatch):
+    use_counting_engine(monkeypatch)
+    handler = PDFFileHandler(str(tmp_path / 'output'), journal_fsync=False)
+
+    for index in range(3):
+        assert handler.process_pdf_task(make_pdf(f'doc{index}.pdf')) is True
+    assert CountingEngine.created == 1 and CountingEngine.closed == 0
+
+    handler.shutdown()
+    assert CountingEngine.closed == 1
+    assert sorted(path.name for path in (tmp_path / 'output').glob('*.txt')) == ['doc0.txt', 'doc1.txt', 'doc2.txt']
+
+
+def test_daemon_handler_recreated_after_error(tmp_path, make_pdf, monkeypatch):
+    use_counting_engine(monkeypatch)
+    handler = PDFFileHandler(str(tmp_path / 'output'), journal_fsync=False)
+    assert handler.process_pdf_task(make_pdf('first.pdf')) is True
+
+    def fail(self, pdf_path, should_yield=None, source_path=None):
+        raise RuntimeError('推理子进程无法重建')
+    with monkeypatch.context() as patch:
+        patch.setattr(ocr_pdf.PDFOCRHandler, 'process_pdf', fail)
+        assert handler.process_pdf_task(make_pdf('broken.pdf')) is False
+    assert CountingEngine.closed == 1
+
+    assert handler.process_pdf_task(make_pdf('second.pdf')) is True
+    assert CountingEngine.created == 2
+    handler.shutdown()
@@ -0,0 +1,67 @@
+import cv2
+import numpy as np
+
+from ocr_pdf import PageDedupIndex
+
+
+def make_page(text, seed=0):
+    image = np.full((600, 400, 3), 255, dtype=np.uint8)
+    rng = np.random.default_rng(seed)
+    for row in range(12):
+        width = int(rng.integers(150, 360))
+        cv2.rectangle(image, (20, 30 + row * 45), (20 + width, 50 + row * 45), (0, 0, 0), -1)
+    cv2.putText(image, text, (20, 580), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 0), 2)
+    return image
+
+
+def flip_bits(value, count):
+    for bit in range(count):
+        value ^= 1 << (bit * 3)
+    return value
+
+
+def test_lookup_accepts_hashes_within_threshold():
+    index = PageDedupIndex(threshold=4)
+    thumbnail = np.zeros((16, 12), dtype=np.uint8)
+    page_hash = 0x0123456789abcdef
+    index.add(page_hash, thumbnail, (600, 400, 3), {'page': 1}, 'a.pdf')
+
+    entry = index.lookup(flip_bits(page_hash, 4), thumbnail, (600, 400, 3))
+    assert entry is not None and entry['record'] == {'page': 1}
+    assert index.lookup(flip_bits(page_hash, 5), thumbnail, (600, 400, 3)) is None
+
+
+def test_lookup_rejects_different_shape_or_thumbnail():
+    index = PageDedupIndex(threshold=4, max_pixel_diff=40)
+    thumbnail = np.zeros((16, 12), dtype=np.uint8)
+    index.add(7, thumbnail, (600, 400, 3), {'page': 1}, 'a.pdf')
+
+    assert index.lookup(7, thumbnail, (400, 600, 3)) is None
+    changed = thumbnail.copy()
+    changed[3, 3] = 41
+    assert index.lookup(7, changed, (600, 400, 3)) is None
+    changed[3, 3] = 40
+    assert index.lookup(7, changed, (600, 400, 3)) is not None
+
+
+def test_fingerprint_matches_noisy_copy_but_not_other_page():
+    index = PageDedupIndex()
+    page = make_page('form 1')
+    page_hash, thumbnail = index.fingerprint(page)
+    index.add(page_hash, thumbnail, page.shape, {'page': 1}, 'a.pdf')
+
+    noise = np.random.default_rng(1).integers(-8, 9, page.shape)
+    noisy = np.clip(page.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+    assert index.lookup(*index.fingerprint(noisy), noisy.shape) is not None
+
+    other = make_page('form 2', seed=5)
+    assert index.lookup(*index.fingerprint(other), other.shape) is None
+
+
+def test_index_keeps_at_most_max_entries():
+    index = PageDedupIndex(threshold=0, max_entries=2)
+    thumbnail = np.zeros((4, 4), dtype=np.uint8)
+    for page_hash in (1, 2, 3):
+        index.add(page_hash, thumbnail, (4, 4, 3), {'page': page_hash}, 'a.pdf')
+    assert index.lookup(1, thumbnail, (4, 4, 3)) is None
+    assert index.lookup(3, thumbnail, (4, 4, 3))['record'] == {'page': 3}
@@ -0,0 +1,66 @@
+import numpy as np
+import pypdfium2 as pdfium
+
+from ocr_pdf import PageBufferPool, find_page_image, decode_page_image
+
+
+def open_page(pdf_path, rotation=0):
+    pdf = pdfium.PdfDocument(pdf_path)
+    page = pdf[0]
+    if rotation:
+        page.set_rotation(rotation)
+    return pdf, page
+
+
+def ink_quadrant(image):
+    """墨迹（测试页左上角的文字）所在的象限"""
+    ys, xs = np.nonzero(image.min(axis=2) < 128)
+    height, width = image.shape[:2]
+    return ('top' if ys.mean() < height / 2 else 'bottom') + '-' + ('left' if xs.mean() < width / 2 else 'right')
+
+
+def test_scanned_page_decodes_at_embedded_resolution(make_pdf):
+    pdf, page = open_page(make_pdf(size=(200, 300)))
+    pool = PageBufferPool()
+    try:
+        assert find_page_image(page) is not None
+        image = decode_page_image(page, pool)
+        assert image.shape == (600, 400, 3) and image.dtype == np.uint8
+        assert ink_quadrant(image) == 'top-left'
+        assert id(image) in pool._in_use
+    finally:
+        page.close()
+        pdf.close()
+
+
+def test_rotated_page_is_decoded_in_display_orientation(make_pdf):
+    pdf, page = open_page(make_pdf(size=(200, 300)), rotation=90)
+    try:
+        image = decode_page_image(page, PageBufferPool())
+        assert image.shape == (400, 600, 3)
+        # 顺时针旋转90度后原左上角位于右上角
+        assert ink_quadrant(image) == 'top-right'
+    finally:
+        page.close()
+        pdf.close()
+
+
+def test_grayscale_decode_keeps_three_equal_channels(make_pdf):
+    pdf, page = open_page(make_pdf())
+    try:
+        image = decode_page_image(page, PageBufferPool(), grayscale=True)
+        assert image.shape[2] == 3
+        assert np.array_equal(image[..., 0], image[..., 1]) and np.array_equal(image[..., 1], image[..., 2])
+    finally:
+        page.close()
+        pdf.close()
+
+
+def test_page_without_image_falls_back_to_rendering(make_pdf):
+    pdf, page = open_page(make_pdf(scanned=False))
+    try:
+        assert find_page_image(page) is None
+        assert decode_page_image(page, PageBufferPool()) is None
+    finally:
+        page.close()
+        pdf.close()
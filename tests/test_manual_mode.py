@@ -0,0 +1,42 @@
+from ocr_pdf import run_manual_mode
+
+# 假的paddleocr：在工作进程中导入时直接退出，模拟模型加载时进程崩溃（如被OOM终止）
+CRASHING_PADDLEOCR = '''
+import multiprocessing
+import os
+
+if multiprocessing.parent_process() is not None:
+    os._exit(3)
+raise ImportError('paddleocr is not available in tests')
+'''
+
+
+def test_single_worker_processes_all_files(tmp_path, make_pdf, stub_engine):
+    make_pdf('small.pdf', pages=1)
+    make_pdf('large.pdf', pages=3)
+    output_dir = tmp_path / 'output'
+
+    summary = run_manual_mode(str(tmp_path / 'input'), str(output_dir), workers=1)
+
+    assert summary['success'] == 2 and summary['failed'] == 0
+    text = (output_dir / 'large.txt').read_text(encoding='utf-8')
+    assert [line for line in text.splitlines() if line.startswith('===')] == \
+        ['=== 第 1 页 ===', '=== 第 2 页 ===', '=== 第 3 页 ===']
+    assert (output_dir / 'small.txt').exists()
+
+
+def test_crashed_worker_pool_marks_files_failed_and_saves_summary(tmp_path, make_pdf, monkeypatch):
+    fake_dir = tmp_path / 'fake_modules'
+    fake_dir.mkdir()
+    (fake_dir / 'paddleocr.py').write_text(CRASHING_PADDLEOCR, encoding='utf-8')
+    # spawn的子进程沿用父进程的sys.path
+    monkeypatch.syspath_prepend(str(fake_dir))
+    for index in range(3):
+        make_pdf(f'doc{index}.pdf')
+
+    summary = run_manual_mode(str(tmp_path / 'input'), str(tmp_path / 'output'), workers=2)
+
+    assert summary['total'] == 3
+    assert summary['success'] == 0 and summary['failed'] == 3
+    assert sorted(summary['failed_files']) == ['doc0.pdf', 'doc1.pdf', 'doc2.pdf']
+    assert summary['elapsed'] > 0
@@ -0,0 +1,35 @@
+import numpy as np
+
+from ocr_pdf import find_content_bbox, CROP_MIN_PADDING
+
+
+def test_content_bbox_adds_padding_around_ink():
+    image = np.full((1000, 800, 3), 255, dtype=np.uint8)
+    image[300:500, 200:400] = 0
+    padding = max(CROP_MIN_PADDING, int(1000 * 0.01))
+    assert find_content_bbox(image) == (200 - padding, 300 - padding, 400 + padding, 500 + padding)
+
+
+def test_content_bbox_accepts_grayscale_images():
+    image = np.full((1000, 800), 255, dtype=np.uint8)
+    image[100:200, 100:300] = 0
+    bbox = find_content_bbox(image)
+    assert bbox is not None
+    x0, y0, x1, y1 = bbox
+    assert x0 < 100 and y0 < 100 and x1 > 300 and y1 > 200
+
+
+def test_content_bbox_ignores_isolated_noise():
+    image = np.full((1000, 800), 255, dtype=np.uint8)
+    image[300:500, 200:400] = 0
+    image[20, 20] = 0
+    image[980, 780] = 0
+    x0, y0, x1, y1 = find_content_bbox(image)
+    assert x0 > 20 and y0 > 20 and x1 < 780 and y1 < 980
+
+
+def test_content_bbox_returns_none_for_blank_or_full_pages():
+    assert find_content_bbox(np.full((500, 400), 255, dtype=np.uint8)) is None
+    full = np.full((500, 400), 255, dtype=np.uint8)
+    full[5:495, 5:395] = 0
+    assert find_content_bbox(full) is None
@@ -0,0 +1,57 @@
+import threading
+
+from ocr_pdf import MemoryBudget, estimate_page_memory
+
+
+def test_acquire_blocks_until_memory_is_released():
+    budget = MemoryBudget(100)
+    first = budget.acquire(60)
+    admitted = threading.Event()
+
+    def acquire_second():
+        budget.acquire(60)
+        admitted.set()
+
+    thread = threading.Thread(target=acquire_second)
+    thread.start()
+    assert not admitted.wait(0.2)
+    assert not budget.fits(60)
+
+    budget.release(first)
+    assert admitted.wait(5)
+    thread.join()
+
+
+def test_oversized_request_runs_alone():
+    budget = MemoryBudget(100)
+    assert budget.fits(500)
+    assert budget.acquire(500) == 100
+    assert not budget.fits(1)
+    budget.release(100)
+    assert budget.fits(100)
+
+
+def test_fits_counts_memory_in_use():
+    budget = MemoryBudget(100)
+    held = budget.acquire(30)
+    assert budget.fits(70)
+    assert not budget.fits(71)
+    budget.release(held)
+    assert budget.stats() == {'limit_mb': 0, 'in_use_mb': 0}
+
+
+def test_page_estimate_grows_with_page_size_and_scale():
+    small = estimate_page_memory(595, 842)
+    assert estimate_page_memory(1190, 1684) > small
+    assert estimate_page_memory(595, 842, render_scale=2.0) > small
+    assert estimate_page_memory(595, 842, grayscale=True) < small
+
+
+def test_tile_mode_bounds_estimate_for_large_pages():
+    full = estimate_page_memory(8000, 8000, render_scale=2.0)
+    tiled = estimate_page_memory(8000, 8000, render_scale=2.0, tile_mode=True)
+    assert tiled < full
+    # 分块模式的估算只取决于一批分块，与页面大小无关
+    assert estimate_page_memory(12000, 12000, render_scale=2.0, tile_mode=True) == tiled
+    # 不超过一个分块的页面按整页估算
+    assert estimate_page_memory(500, 500, tile_mode=True) == estimate_page_memory(500, 500)
@@ -0,0 +1,124 @@
+import threading
+
+import numpy as np
+import pytest
+
+from ocr_pdf import InferenceTimeout, MicroBatchEngine, PDFOCRHandler, StubOCREngine
+
+
+class BatchRecordingEngine(StubOCREngine):
+    """记录每次批量推理的页码"""
+    def __init__(self, fail=False):
+        super().__init__('pp-ocrv5')
+        self.fail = fail
+        self.batches = []
+        self.closed = False
+
+    def infer(self, images, page_num=0, timeout=None, text_fallback=True):
+        self.batches.append(list(page_num) if isinstance(page_num, list) else [page_num])
+        if self.fail:
+            raise RuntimeError('模拟推理失败')
+        return super().infer(images, page_num, timeout, text_fallback)
+
+    def close(self):
+        self.closed = True
+
+
+def run_concurrently(engine, callers):
+    """各调用方在各自线程中同时调用 infer，返回 调用方下标 -> 结果或异常"""
+    barrier = threading.Barrier(len(callers))
+    results = {}
+
+    def call(index, images, page_num):
+        barrier.wait()
+        try:
+            results[index] = engine.infer(images, page_num)
+        except Exception as e:
+            results[index] = e
+
+    threads = [threading.Thread(target=call, args=(index, images, page_num))
+               for index, (images, page_num) in enumerate(callers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_concurrent_callers_get_their_own_pages():
+    inner = BatchRecordingEngine()
+    engine = MicroBatchEngine(inner, max_batch_size=16, max_wait=0.2)
+    # 每个调用方的图像宽度不同，页码不同，可据此核对结果的归属
+    callers = [([np.zeros((10, 20 + index, 3), dtype=np.uint8)] * 2, [index * 10, index * 10 + 1])
+               for index in range(6)]
+    try:
+        results = run_concurrently(engine, callers)
+    finally:
+        engine.close()
+
+    for index in range(6):
+        texts = [lines[0] for lines, _, _ in results[index]]
+        assert texts == [f'stub page {index * 10 + 1} ({20 + index}x10)', f'stub page {index * 10 + 2} ({20 + index}x10)']
+    # 并发请求被合并到同一批次
+    assert len(inner.batches) < len(callers)
+    assert sorted(page for batch in inner.batches for page in batch) == \
+        sorted(index * 10 + offset for index in range(6) for offset in (0, 1))
+    assert inner.closed
+
+
+def test_batch_is_capped_at_max_batch_size():
+    inner = BatchRecordingEngine()
+    engine = MicroBatchEngine(inner, max_batch_size=4, max_wait=0.2)
+    callers = [([np.zeros((10, 10, 3), dtype=np.uint8)], index) for index in range(8)]
+    try:
+        run_concurrently(engine, callers)
+    finally:
+        engine.close()
+    assert max(len(batch) for batch in inner.batches) <= 4
+
+
+def test_batch_failure_is_raised_in_every_caller():
+    engine = MicroBatchEngine(BatchRecordingEngine(fail=True), max_batch_size=8, max_wait=0.2)
+    callers = [([np.zeros((10, 10, 3), dtype=np.uint8)], index) for index in range(3)]
+    try:
+        results = run_concurrently(engine, callers)
+    finally:
+        engine.close()
+    assert all(isinstance(result, RuntimeError) for result in results.values())
+
+
+def test_shared_engine_serves_concurrent_documents(tmp_path, make_pdf):
+    pdf_paths = [make_pdf(f'doc{index}.pdf', pages=3, size=(200 + index * 10, 300)) for index in range(3)]
+    engine = MicroBatchEngine(BatchRecordingEngine(), max_batch_size=8, max_wait=0.05)
+    results = {}
+
+    def process(index):
+        handler = PDFOCRHandler(str(tmp_path / 'output'), engine=engine, journal_fsync=False, crop_margins=False)
+        try:
+            results[index] = handler.process_pdf(pdf_paths[index])
+        finally:
+            handler.close()
+
+    threads = [threading.Thread(target=process, args=(index,)) for index in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    engine.close()
+
+    assert results == {0: True, 1: True, 2: True}
+    for index in range(3):
+        lines = (tmp_path / 'output' / f'doc{index}.txt').read_text(encoding='utf-8').splitlines()
+        stub_lines = [line for line in lines if line.startswith('stub page')]
+        # 页码与图像宽度（页面宽度的2倍）都属于本文档
+        width = (200 + index * 10) * 2
+        assert stub_lines == [f'stub page {page} ({width}x600)' for page in (1, 2, 3)]
+
+
+def test_expired_budget_is_rejected_before_queueing():
+    engine = MicroBatchEngine(BatchRecordingEngine())
+    try:
+        with pytest.raises(InferenceTimeout):
+            engine.infer([np.zeros((4, 4, 3), dtype=np.uint8)], 0, timeout=0)
+    finally:
+        engine.close()
@@ -0,0 +1,125 @@
+import json
+
+from ocr_pdf import (PDFOCRHandler, PageJournal, StubOCREngine, InferenceTimeout, get_output_options,
+                     PROCESS_PARTIAL, TIMEOUT_MARKER)
+
+
+class RecordingEngine(StubOCREngine):
+    """记录识别过的页码（从0开始），timeout_pages 中的页面抛出 InferenceTimeout"""
+    def __init__(self, timeout_pages=()):
+        super().__init__('pp-ocrv5')
+        self.timeout_pages = set(timeout_pages)
+        self.pages = []
+
+    def infer(self, images, page_num=0, timeout=None, text_fallback=True):
+        if page_num in self.timeout_pages:
+            raise InferenceTimeout('模拟推理超时')
+        self.pages.append(page_num)
+        return super().infer(images, page_num, timeout, text_fallback)
+
+
+def make_header(**options):
+    return {'source': '/data/a.pdf', 'size': 100, 'mtime': 1.0, 'total_pages': 3, 'model': 'pp-ocrv5',
+            'options': get_output_options('pp-ocrv5', options)}
+
+
+def write_journal(path, header, pages):
+    journal = PageJournal(path, fsync=False)
+    journal.load(header)
+    journal.open(header)
+    for page in pages:
+        journal.append({'page': page, 'lines': [f'page {page}']})
+    journal.close()
+
+
+def test_journal_resumes_completed_pages(tmp_path):
+    path = str(tmp_path / '.a.journal')
+    header = make_header()
+    write_journal(path, header, [1, 2])
+
+    journal = PageJournal(path, fsync=False)
+    assert journal.load(header) == {1, 2}
+    assert journal.read_page(2)['lines'] == ['page 2']
+    journal.close()
+
+
+def test_journal_ignores_and_truncates_partial_last_line(tmp_path):
+    path = str(tmp_path / '.a.journal')
+    header = make_header()
+    write_journal(path, header, [1])
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('{"page": 2, "li')
+
+    journal = PageJournal(path, fsync=False)
+    assert journal.load(header) == {1}
+    journal.open(header)
+    journal.append({'page': 2, 'lines': ['page 2']})
+    journal.close()
+
+    journal = PageJournal(path, fsync=False)
+    assert journal.load(header) == {1, 2}
+    journal.close()
+
+
+def test_journal_discarded_when_header_differs(tmp_path):
+    path = str(tmp_path / '.a.journal')
+    write_journal(path, make_header(), [1, 2])
+
+    changed = dict(make_header(), mtime=2.0)
+    assert PageJournal(path, fsync=False).load(changed) == set()
+    assert not tmp_path.joinpath('.a.journal').exists()
+
+
+def test_journal_discarded_when_processing_options_differ(tmp_path):
+    path = str(tmp_path / '.a.journal')
+    write_journal(path, make_header(), [1, 2])
+
+    assert PageJournal(path, fsync=False).load(make_header(render_scale=2.0)) == set()
+    assert not tmp_path.joinpath('.a.journal').exists()
+
+
+def test_journal_with_incomplete_header_is_discarded(tmp_path):
+    path = tmp_path / '.a.journal'
+    path.write_text(json.dumps(make_header())[:20], encoding='utf-8')
+    assert PageJournal(str(path), fsync=False).load(make_header()) == set()
+    assert not path.exists()
+
+
+def run_document(tmp_path, pdf_path, engine, **options):
+    handler = PDFOCRHandler(str(tmp_path / 'output'), engine=engine, journal_fsync=False, **options)
+    try:
+        return handler.process_pdf(pdf_path)
+    finally:
+        handler.close()
+
+
+def test_timed_out_pages_return_partial_and_keep_journal(tmp_path, make_pdf):
+    pdf_path = make_pdf(pages=3)
+
+    assert run_document(tmp_path, pdf_path, RecordingEngine(timeout_pages={1})) == PROCESS_PARTIAL
+
+    text = (tmp_path / 'output' / 'doc.txt').read_text(encoding='utf-8')
+    assert TIMEOUT_MARKER in text
+    journal_path = tmp_path / 'output' / '.doc.journal'
+    records = [json.loads(line) for line in journal_path.read_text(encoding='utf-8').splitlines()[1:]]
+    assert [record['page'] for record in records] == [1, 3]
+
+
+def test_partial_document_resumes_only_timed_out_pages(tmp_path, make_pdf):
+    pdf_path = make_pdf(pages=3)
+    run_document(tmp_path, pdf_path, RecordingEngine(timeout_pages={1}))
+
+    engine = RecordingEngine()
+    assert run_document(tmp_path, pdf_path, engine) is True
+    assert engine.pages == [1]
+    assert TIMEOUT_MARKER not in (tmp_path / 'output' / 'doc.txt').read_text(encoding='utf-8')
+    assert not (tmp_path / 'output' / '.doc.journal').exists()
+
+
+def test_changed_processing_options_restart_document(tmp_path, make_pdf):
+    pdf_path = make_pdf(pages=3)
+    run_document(tmp_path, pdf_path, RecordingEngine(timeout_pages={1}))
+
+    engine = RecordingEngine()
+    assert run_document(tmp_path, pdf_path, engine, render_scale=1.5) is True
+    assert engine.pages == [0, 1, 2]
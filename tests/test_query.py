@@ -0,0 +1,81 @@
+import pytest
+
+from ocr_pdf import (PDFOCRHandler, StubOCREngine, compile_query_targets, match_query_targets,
+                     resolve_page_order)
+
+
+class RecordingEngine(StubOCREngine):
+    """记录识别过的页码（从0开始）"""
+    def __init__(self):
+        super().__init__('pp-ocrv5')
+        self.pages = []
+
+    def infer(self, images, page_num=0, timeout=None, text_fallback=True):
+        self.pages.append(page_num)
+        return super().infer(images, page_num, timeout, text_fallback)
+
+
+def test_default_page_order_reads_first_and_last_pages_first():
+    assert resolve_page_order(6) == [0, 1, 5, 4, 2, 3]
+    assert resolve_page_order(2) == [0, 1]
+
+
+def test_page_order_variants():
+    assert resolve_page_order(5, '1,-1') == [0, 4]
+    assert resolve_page_order(5, '2,~') == [1, 4, 3, 2, 0]
+    # 越界、0与重复的页码被忽略
+    assert resolve_page_order(3, '0,1,1,9,-9,*') == [0, 1, 2]
+    with pytest.raises(ValueError):
+        resolve_page_order(3, '1,x')
+
+
+def test_compile_query_targets_validates_patterns():
+    targets = compile_query_targets(['invoice'], {'total': r'Total:\s*(\d+)'})
+    assert list(targets) == ['invoice', 'total']
+    with pytest.raises(ValueError):
+        compile_query_targets(['('])
+    with pytest.raises(ValueError):
+        compile_query_targets()
+
+
+def test_match_query_targets_keeps_first_match_and_group_value():
+    targets = compile_query_targets(['invoice'], {'total': r'Total:\s*(\d+)'})
+    found = {}
+    match_query_targets(targets, {'page': 2, 'lines': ['Invoice', 'Total: 42 EUR']}, found)
+    assert found == {'total': {'page': 2, 'value': '42', 'text': 'Total: 42 EUR'}}
+
+    match_query_targets(targets, {'page': 3, 'lines': ['invoice no. 7', 'Total: 99']}, found)
+    assert found['total']['page'] == 2
+    assert found['invoice'] == {'page': 3, 'value': 'invoice', 'text': 'invoice no. 7'}
+
+
+def run_query(tmp_path, pdf_path, engine, patterns, **kwargs):
+    handler = PDFOCRHandler(str(tmp_path / 'output'), engine=engine, journal_fsync=False)
+    try:
+        return handler.query_pdf(pdf_path, compile_query_targets(patterns), **kwargs)
+    finally:
+        handler.close()
+
+
+def test_query_stops_at_first_matching_page(tmp_path, make_pdf):
+    pdf_path = make_pdf(pages=6)
+    engine = RecordingEngine()
+
+    result = run_query(tmp_path, pdf_path, engine, [r'stub page 6 '])
+
+    # 默认页序：第1、2页之后是最后一页
+    assert engine.pages == [0, 1, 5]
+    assert result['pages_processed'] == [1, 2, 6]
+    assert result['complete'] and result['missing'] == []
+    assert result['matches'][r'stub page 6 ']['page'] == 6
+
+
+def test_query_reads_all_pages_when_target_is_missing(tmp_path, make_pdf):
+    pdf_path = make_pdf(pages=4)
+    engine = RecordingEngine()
+
+    result = run_query(tmp_path, pdf_path, engine, ['not present'], page_order='*', max_pages=3)
+
+    assert engine.pages == [0, 1, 2]
+    assert not result['complete'] and result['missing'] == ['not present']
+    assert not (tmp_path / 'output' / 'doc.txt').exists()
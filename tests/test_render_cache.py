@@ -0,0 +1,97 @@
+import os
+
+import numpy as np
+
+from ocr_pdf import PDFOCRHandler, RenderCache, StubOCREngine
+
+
+class InspectingEngine(StubOCREngine):
+    """记录送入模型的图像是否可写、是否来自页面缓冲池"""
+    def __init__(self):
+        super().__init__('pp-ocrv5')
+        self.handler = None
+        self.images = []
+
+    def infer(self, images, page_num=0, timeout=None, text_fallback=True):
+        for image in images:
+            self.images.append((image.flags.writeable, id(image) in self.handler.buffer_pool._in_use))
+        return super().infer(images, page_num, timeout, text_fallback)
+
+
+def run_document(tmp_path, pdf_path, cache):
+    engine = InspectingEngine()
+    handler = PDFOCRHandler(str(tmp_path / 'output'), engine=engine, journal_fsync=False, render_cache=cache)
+    engine.handler = handler
+    try:
+        assert handler.process_pdf(pdf_path) is True
+        return handler.last_cache_hits, engine.images
+    finally:
+        handler.close()
+
+
+def test_cache_hit_feeds_writable_pooled_image(tmp_path, make_pdf):
+    pdf_path = make_pdf(pages=2)
+    cache = RenderCache(str(tmp_path / 'cache'), 64 * 1024 * 1024)
+
+    hits, _ = run_document(tmp_path, pdf_path, cache)
+    assert hits == 0
+    hits, images = run_document(tmp_path, pdf_path, cache)
+    assert hits == 2
+    assert images == [(True, True), (True, True)]
+
+
+def test_modified_source_file_misses(tmp_path, make_pdf):
+    pdf_path = make_pdf(pages=2)
+    cache = RenderCache(str(tmp_path / 'cache'), 64 * 1024 * 1024)
+    run_document(tmp_path, pdf_path, cache)
+    old_key = cache.document_key(pdf_path)
+
+    # 同名文件被替换为新内容（大小与修改时间都变化）
+    make_pdf(pages=3)
+    stat = os.stat(pdf_path)
+    os.utime(pdf_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert cache.document_key(pdf_path) != old_key
+    hits, _ = run_document(tmp_path, pdf_path, cache)
+    assert hits == 0
+
+
+def test_touched_source_file_misses(tmp_path):
+    path = tmp_path / 'a.pdf'
+    path.write_bytes(b'%PDF-1.4')
+    cache = RenderCache(str(tmp_path / 'cache'), 1024)
+    key = cache.document_key(str(path))
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert cache.document_key(str(path)) != key
+
+
+def test_load_returns_read_only_image_with_meta(tmp_path):
+    cache = RenderCache(str(tmp_path / 'cache'), 1024 * 1024)
+    image = np.arange(60, dtype=np.uint8).reshape(5, 4, 3)
+    cache.store('ab' * 32, 0, 'params', image, {'width': 4})
+
+    loaded, meta = cache.load('ab' * 32, 0, 'params')
+    assert np.array_equal(loaded, image) and not loaded.flags.writeable
+    assert meta == {'width': 4, 'shape': [5, 4, 3]}
+    assert cache.load('ab' * 32, 1, 'params') is None
+    assert cache.load('ab' * 32, 0, RenderCache.params_key(render_scale=2.0)) is None
+
+
+def cache_size(cache_dir):
+    return sum(os.path.getsize(os.path.join(root, name))
+               for root, _, files in os.walk(cache_dir) for name in files if name.endswith('.npy'))
+
+
+def test_eviction_keeps_cache_under_byte_limit(tmp_path):
+    image = np.zeros((100, 100, 3), dtype=np.uint8)
+    page_bytes = image.nbytes + 128
+    cache = RenderCache(str(tmp_path / 'cache'), 5 * page_bytes)
+
+    for doc in range(4):
+        for page in range(5):
+            cache.store(f'{doc:02d}' * 32, page, 'params', image, {})
+            assert cache_size(cache.cache_dir) <= cache.max_bytes
+
+    # 最近写入的页面保留，最早的被淘汰
+    assert cache.load('03' * 32, 4, 'params') is not None
+    assert cache.load('00' * 32, 0, 'params') is None
@@ -0,0 +1,57 @@
+import cv2
+import numpy as np
+
+from ocr_pdf import detect_ruling_lines, detect_grid_layout
+
+
+def make_item(text, x0, y0, x1, y1):
+    return {'text': text, 'score': 0.9, 'box': [[x0, y0], [x1, y0], [x1, y1], [x0, y1]]}
+
+
+def make_text_page(lines=20):
+    image = np.full((1400, 1000, 3), 255, dtype=np.uint8)
+    for row in range(lines):
+        cv2.putText(image, f'line {row} of plain paragraph text', (60, 80 + row * 60),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1.0, (0, 0, 0), 2)
+    return image
+
+
+def test_ruled_table_has_horizontal_and_vertical_lines():
+    image = make_text_page(lines=3)
+    for y in range(400, 1201, 200):
+        cv2.line(image, (100, y), (900, y), (0, 0, 0), 3)
+    for x in (100, 366, 633, 900):
+        cv2.line(image, (x, 400), (x, 1200), (0, 0, 0), 3)
+
+    horizontal, vertical = detect_ruling_lines(image)
+    assert horizontal >= 3 and vertical >= 2
+
+
+def test_plain_text_has_no_ruling_lines():
+    horizontal, vertical = detect_ruling_lines(make_text_page())
+    assert horizontal < 3 and vertical < 2
+
+
+def test_ruling_lines_accept_grayscale_images():
+    image = np.full((800, 600), 255, dtype=np.uint8)
+    for y in (100, 300, 500, 700):
+        cv2.line(image, (50, y), (550, y), 0, 2)
+    assert detect_ruling_lines(image) == (4, 0)
+
+
+def test_grid_layout_detected_for_aligned_columns():
+    items = [make_item(f'{row}-{col}', 50 + col * 200, 40 + row * 50, 150 + col * 200, 70 + row * 50)
+             for row in range(5) for col in range(4)]
+    assert detect_grid_layout(items)
+
+
+def test_single_column_text_is_not_grid_layout():
+    items = [make_item(f'line {row}', 50, 40 + row * 50, 900, 70 + row * 50) for row in range(30)]
+    assert not detect_grid_layout(items)
+
+
+def test_few_grid_rows_among_paragraphs_are_not_grid_layout():
+    items = [make_item(f'line {row}', 50, 40 + row * 50, 900, 70 + row * 50) for row in range(20)]
+    items += [make_item(f'{row}-{col}', 50 + col * 200, 1100 + row * 50, 150 + col * 200, 1130 + row * 50)
+              for row in range(3) for col in range(3)]
+    assert not detect_grid_layout(items)
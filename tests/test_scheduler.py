@@ -0,0 +1,142 @@
+import threading
+import time
+
+from api import JobScheduler, OCRJob
+from ocr_pdf import PDFOCRHandler, StubOCREngine
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, '等待超时'
+        time.sleep(0.01)
+
+
+def make_waiting(scheduler, job, waited=0.0):
+    """把作业直接放入等待队列（等待时间可指定），用于检查调度顺序"""
+    job.enqueued_at = time.time() - waited
+    scheduler._waiting.append(job)
+    return job
+
+
+def test_shortest_job_starts_first():
+    scheduler = JobScheduler(max_running=1, aging_rate=0, fair=False)
+    blocker = OCRJob('blocker', 'a', 1)
+    scheduler.acquire(blocker)
+
+    order = []
+    def run(job):
+        scheduler.acquire(job)
+        order.append(job.name)
+        scheduler.release(job, job.remaining_pages)
+
+    threads = [threading.Thread(target=run, args=(OCRJob(name, 'a', pages),))
+               for name, pages in (('large', 50), ('small', 2), ('medium', 10))]
+    for thread in threads:
+        thread.start()
+    wait_until(lambda: scheduler.stats()['waiting'] == 3)
+    scheduler.release(blocker, blocker.remaining_pages)
+    for thread in threads:
+        thread.join(timeout=10)
+    assert order == ['small', 'medium', 'large']
+
+
+def test_waiting_time_ages_large_jobs():
+    scheduler = JobScheduler(max_running=1, aging_rate=1.0, fair=False)
+    large = make_waiting(scheduler, OCRJob('large', 'a', 100), waited=120)
+    make_waiting(scheduler, OCRJob('small', 'b', 5))
+    assert scheduler._next_job() is large
+
+    scheduler = JobScheduler(max_running=1, aging_rate=0, fair=False)
+    make_waiting(scheduler, OCRJob('large', 'a', 100), waited=120)
+    small = make_waiting(scheduler, OCRJob('small', 'b', 5))
+    assert scheduler._next_job() is small
+
+
+def test_fair_scheduling_counts_client_running_pages():
+    for fair, expected in ((True, 'other'), (False, 'busy')):
+        scheduler = JobScheduler(max_running=2, aging_rate=0, fair=fair)
+        scheduler.acquire(OCRJob('running', 'busy-client', 50))
+        make_waiting(scheduler, OCRJob('busy', 'busy-client', 5))
+        make_waiting(scheduler, OCRJob('other', 'other-client', 20))
+        assert scheduler._next_job().name == expected
+
+
+def test_release_returns_client_pages():
+    scheduler = JobScheduler(max_running=2)
+    job = OCRJob('a', 'client', 8)
+    scheduler.acquire(job)
+    assert scheduler._client_running_pages['client'] == 8
+    scheduler.release(job, 8)
+    assert 'client' not in scheduler._client_running_pages
+    assert scheduler.stats() == {'running': 0, 'waiting': 0}
+
+
+def test_large_job_yields_to_shorter_waiting_job_after_slice():
+    scheduler = JobScheduler(max_running=1, aging_rate=0, slice_pages=2, fair=False)
+    large = OCRJob('large', 'a', 40)
+    scheduler.acquire(large)
+    make_waiting(scheduler, OCRJob('small', 'b', 3))
+    assert scheduler.should_yield(large, 1) is False
+    assert scheduler.should_yield(large, 2) is True
+    assert large.remaining_pages == 38
+
+
+def test_job_does_not_yield_without_waiting_jobs():
+    scheduler = JobScheduler(max_running=1, slice_pages=1)
+    job = OCRJob('only', 'a', 10)
+    scheduler.acquire(job)
+    assert scheduler.should_yield(job, 1) is False
+
+
+def test_sliced_document_reports_pages_done_across_resumes(tmp_path, make_pdf):
+    scheduler = JobScheduler(max_running=1, aging_rate=0, slice_pages=2, fair=False)
+    job = OCRJob('large', 'a', 6)
+    scheduler.acquire(job)
+    make_waiting(scheduler, OCRJob('small', 'b', 1))
+    handler = PDFOCRHandler(str(tmp_path / 'output'), engine=StubOCREngine('pp-ocrv5'), journal_fsync=False)
+    pdf_path = make_pdf(pages=6)
+
+    remaining = []
+    try:
+        while True:
+            # 重新调度时 acquire 会清零本轮已处理的页数
+            job.slice_pages = 0
+            result = handler.process_pdf(pdf_path, should_yield=lambda done_pages: scheduler.should_yield(job, done_pages))
+            if result is not None:
+                break
+            remaining.append(job.remaining_pages)
+    finally:
+        handler.close()
+
+    assert result is True
+    # 续跑的第一页不经过回调，已处理页数仍按进度日志中完成的页计算
+    assert remaining == [4, 2]
+    assert job.done_pages == 5
+
+
+def test_run_marks_job_done_after_yielding():
+    scheduler = JobScheduler(max_running=1, slice_pages=1)
+    job = OCRJob('large', 'a', 10)
+    calls = []
+
+    def process(should_yield):
+        calls.append(job.remaining_pages)
+        if len(calls) == 1:
+            # 处理了前4页后让出
+            should_yield(4)
+            return None
+        return True
+
+    assert scheduler.run(job, process) is True
+    assert calls == [10, 6]
+    assert job.done_pages == job.total_pages
+    assert scheduler.stats() == {'running': 0, 'waiting': 0}
+
+
+def test_queue_limit():
+    scheduler = JobScheduler(max_running=1, max_waiting=2)
+    make_waiting(scheduler, OCRJob('a', 'a', 1))
+    assert not scheduler.is_full()
+    assert scheduler.is_full(incoming=2)
+    assert not JobScheduler(max_waiting=0).is_full(incoming=100)
@@ -0,0 +1,57 @@
+import pytest
+
+from ocr_pdf import OUTPUT_FORMATS, TIMEOUT_MARKER
+from search_index import build_match_query, read_output_pages
+
+
+def test_build_match_query_quotes_terms_as_phrases():
+    assert build_match_query('invoice total') == ('"invoice" AND "total"', [])
+
+
+def test_build_match_query_escapes_quotes_and_fts_syntax():
+    expression, short_terms = build_match_query('a"bc NEAR(x) OR')
+    assert expression == '"a""bc" AND "NEAR(x)"'
+    assert short_terms == ['OR']
+
+
+def test_build_match_query_separates_short_terms():
+    assert build_match_query('发票 金额合计 ab') == ('"金额合计"', ['发票', 'ab'])
+    assert build_match_query('  ') == (None, [])
+
+
+RECORDS = [
+    {'page': 1, 'width': 100, 'height': 100, 'lines': ['第一行', '第二行'], 'boxes': [], 'scores': []},
+    {'page': 2, 'width': 100, 'height': 100, 'lines': [], 'boxes': [], 'scores': [], 'status': 'timeout'},
+    {'page': 3, 'width': 100, 'height': 100, 'lines': ['最后一页'], 'boxes': [], 'scores': []},
+]
+
+
+def write_output(tmp_path, output_format):
+    writer_class = OUTPUT_FORMATS[output_format]
+    writer = writer_class(str(tmp_path / f'doc{writer_class.extension}'))
+    writer.open()
+    for record in RECORDS:
+        writer.write_page(record)
+    writer.commit()
+    return writer.output_path
+
+
+@pytest.mark.parametrize('output_format', ['txt', 'md'])
+def test_read_output_pages_splits_text_formats_by_page_marker(tmp_path, output_format):
+    pages = read_output_pages(write_output(tmp_path, output_format))
+    assert [page for page, _ in pages] == [1, 2, 3]
+    assert pages[0][1].split() == ['第一行', '第二行']
+    assert pages[1][1] == TIMEOUT_MARKER
+    assert pages[2][1] == '最后一页'
+
+
+def test_read_output_pages_skips_timed_out_jsonl_pages(tmp_path):
+    pages = read_output_pages(write_output(tmp_path, 'jsonl'))
+    assert pages == [(1, '第一行\n第二行'), (3, '最后一页')]
+
+
+def test_read_output_pages_rejects_unknown_format(tmp_path):
+    path = tmp_path / 'doc.csv'
+    path.write_text('x', encoding='utf-8')
+    with pytest.raises(ValueError):
+        read_output_pages(str(path))
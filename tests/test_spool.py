@@ -0,0 +1,137 @@
+import os
+import threading
+import time
+
+from ocr_pdf import SpoolCoordinator
+
+
+def drop_files(input_dir, count):
+    os.makedirs(input_dir, exist_ok=True)
+    for index in range(count):
+        with open(os.path.join(input_dir, f'doc{index:02d}.pdf'), 'wb') as f:
+            f.write(b'%PDF-1.4\n' + b'x' * index)
+    return [f'doc{index:02d}.pdf' for index in range(count)]
+
+
+def claim_next(coordinator, attempts=2):
+    """文件大小与修改时间在两次扫描间不变才会被认领"""
+    for _ in range(attempts):
+        claimed = coordinator.claim()
+        if claimed is not None:
+            return claimed
+    return None
+
+
+def test_each_file_is_claimed_exactly_once(tmp_path):
+    input_dir = str(tmp_path / 'spool')
+    names = drop_files(input_dir, 30)
+    coordinators = [SpoolCoordinator(input_dir, node_id=f'node-{index}') for index in range(4)]
+    for coordinator in coordinators:
+        coordinator.start()
+    claimed = {coordinator.node_id: [] for coordinator in coordinators}
+    barrier = threading.Barrier(len(coordinators))
+
+    def work(coordinator):
+        barrier.wait()
+        idle = 0
+        while idle < 5:
+            result = coordinator.claim()
+            if result is None:
+                idle += 1
+                time.sleep(0.01)
+                continue
+            idle = 0
+            claimed[coordinator.node_id].append(os.path.basename(result[0]))
+            coordinator.complete(result[0], True)
+
+    threads = [threading.Thread(target=work, args=(coordinator,)) for coordinator in coordinators]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for coordinator in coordinators:
+        coordinator.stop()
+
+    all_claimed = [name for names_claimed in claimed.values() for name in names_claimed]
+    assert sorted(all_claimed) == names
+    assert sum(coordinator.processed for coordinator in coordinators) == len(names)
+    assert sorted(os.listdir(os.path.join(input_dir, '.spool', 'done'))) == names
+    assert os.listdir(os.path.join(input_dir, '.spool', 'inprogress')) == []
+
+
+def test_expired_lease_is_reclaimed_by_another_node(tmp_path):
+    input_dir = str(tmp_path / 'spool')
+    drop_files(input_dir, 1)
+    crashed = SpoolCoordinator(input_dir, node_id='crashed', lease_timeout=30)
+    crashed.start()
+    crashed_path, _ = claim_next(crashed)
+    # 节点失效：停止心跳，租约停留在过期前的时间
+    crashed._stop_event.set()
+    crashed._heartbeat_thread.join()
+    expired = time.time() - 120
+    os.utime(crashed.lease_path, (expired, expired))
+
+    survivor = SpoolCoordinator(input_dir, node_id='survivor', lease_timeout=30)
+    survivor.start()
+    try:
+        survivor.reap_expired(survivor.heartbeat())
+        assert not os.path.exists(crashed.inprogress_dir)
+        assert not os.path.exists(crashed.lease_path)
+
+        claimed_path, source_path = claim_next(survivor)
+        assert os.path.basename(claimed_path) == 'doc00.pdf'
+        assert os.path.dirname(claimed_path) == survivor.inprogress_dir
+        assert source_path == os.path.join(input_dir, 'doc00.pdf')
+
+        # 失效节点恢复后完成的文件已被回收，不会覆盖存活节点的处理
+        crashed.complete(crashed_path, True)
+        assert crashed.processed == 0
+        survivor.complete(claimed_path, True)
+        assert survivor.processed == 1
+    finally:
+        survivor.stop()
+
+
+def test_live_lease_is_not_reclaimed(tmp_path):
+    input_dir = str(tmp_path / 'spool')
+    drop_files(input_dir, 1)
+    owner = SpoolCoordinator(input_dir, node_id='owner', lease_timeout=30)
+    other = SpoolCoordinator(input_dir, node_id='other', lease_timeout=30)
+    owner.start()
+    other.start()
+    try:
+        claimed_path, _ = claim_next(owner)
+        other.reap_expired(other.heartbeat())
+        assert os.path.exists(claimed_path)
+        assert claim_next(other) is None
+    finally:
+        owner.stop()
+        other.stop()
+
+
+def test_finished_and_failed_files_leave_inprogress(tmp_path):
+    input_dir = str(tmp_path / 'spool')
+    drop_files(input_dir, 3)
+    coordinator = SpoolCoordinator(input_dir, node_id='node')
+    coordinator.start()
+    try:
+        done_path, _ = claim_next(coordinator)
+        coordinator.complete(done_path, True)
+        failed_path, _ = claim_next(coordinator)
+        coordinator.complete(failed_path, False)
+        pending_path, _ = claim_next(coordinator)
+        assert os.listdir(coordinator.inprogress_dir) == [os.path.basename(pending_path)]
+    finally:
+        coordinator.stop()
+
+    spool_dir = os.path.join(input_dir, '.spool')
+    assert os.listdir(os.path.join(spool_dir, 'done')) == [os.path.basename(done_path)]
+    assert os.listdir(os.path.join(spool_dir, 'failed')) == [os.path.basename(failed_path)]
+    # 停止时未完成的文件放回投递目录，租约与认领目录被删除
+    assert os.path.exists(os.path.join(input_dir, os.path.basename(pending_path)))
+    assert os.listdir(os.path.join(spool_dir, 'inprogress')) == []
+    assert os.listdir(os.path.join(spool_dir, 'nodes')) == []
+
+
+def test_node_id_is_sanitized_for_directory_names():
+    assert SpoolCoordinator.sanitize_node_id('host/1:2 a') == 'host_1_2_a'
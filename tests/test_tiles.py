@@ -0,0 +1,55 @@
+from ocr_pdf import merge_tile_items, compute_tile_grid
+
+
+def make_box(x0, y0, x1, y1):
+    return [[x0, y0], [x1, y0], [x1, y1], [x0, y1]]
+
+
+def make_item(text, x0, y0, x1, y1, score=0.9, **flags):
+    return dict({'text': text, 'score': score, 'box': make_box(x0, y0, x1, y1)}, **flags)
+
+
+def test_merge_tile_items_drops_duplicates_from_overlapping_tiles():
+    items = [
+        make_item('hello world', 10, 10, 200, 40),
+        make_item('hello world', 12, 11, 199, 40),
+        make_item('world', 120, 12, 195, 38),
+    ]
+    merged = merge_tile_items(items)
+    assert [item['text'] for item in merged] == ['hello world']
+
+
+def test_merge_tile_items_keeps_adjacent_lines_in_reading_order():
+    items = [
+        make_item('second', 10, 60, 200, 90),
+        make_item('right', 300, 10, 400, 40),
+        make_item('left', 10, 10, 200, 40),
+    ]
+    assert [item['text'] for item in merge_tile_items(items)] == ['left', 'right', 'second']
+
+
+def test_merge_tile_items_stitches_lines_cut_by_tile_boundary():
+    items = [
+        make_item('abcdefghij', 0, 10, 100, 40, score=0.9, _cut_right=True),
+        make_item('ijklmnopqr', 80, 10, 180, 40, score=0.8, _cut_left=True),
+    ]
+    merged = merge_tile_items(items)
+    assert len(merged) == 1
+    assert merged[0]['text'] == 'abcdefghijklmnopqr'
+    assert merged[0]['score'] == 0.8
+    assert merged[0]['box'] == make_box(0.0, 10.0, 180.0, 40.0)
+    assert not any(key.startswith('_') for key in merged[0])
+
+
+def test_merge_tile_items_handles_empty_input():
+    assert merge_tile_items([]) == []
+
+
+def test_tile_grid_covers_page_with_overlapping_tiles():
+    tiles = compute_tile_grid(5000, 3000, 2000, 200)
+    assert all(x1 - x0 <= 2000 and y1 - y0 <= 2000 for x0, y0, x1, y1 in tiles)
+    assert max(x1 for _, _, x1, _ in tiles) == 5000 and max(y1 for _, _, _, y1 in tiles) == 3000
+    # 相邻分块至少重叠 overlap 像素
+    xs = sorted({x0 for x0, _, _, _ in tiles})
+    rights = sorted({x1 for _, _, x1, _ in tiles})
+    assert all(right - left >= 200 for left, right in zip(xs[1:], rights[:-1]))